@@ -0,0 +1,161 @@
+"""
+Incremental analytics rollups.
+
+Counts are not computed from raw events at read time. Every recorded
+gameplay event increments pre-aggregated counter documents in the `rollups`
+collection: one per level, one per zone and one per day. Increments are
+merged in memory and written periodically as one unordered bulk_write of
+upserting `$inc` updates. A burst of submissions for the same level
+therefore becomes a single update.
+
+Dashboard reads fetch a known, small set of rollup documents by _id, so they
+cost the same however many submissions have been recorded.
+"""
+
+import asyncio
+import logging
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from pymongo import UpdateOne
+
+
+logger = logging.getLogger(__name__)
+
+COUNTERS = ('submissions', 'correct', 'hints', 'skips', 'completions')
+
+# _id of the offline difficulty report in `reports` (see cohort_analysis)
+DIFFICULTY_REPORT_ID = 'difficulty'
+
+
+def level_rollup_id(zone: str, level: int) -> str:
+    return f"level:{zone}:{level}"
+
+
+def zone_rollup_id(zone: str) -> str:
+    return f"zone:{zone}"
+
+
+def day_rollup_id(day: str) -> str:
+    return f"day:{day}"
+
+
+class PeriodicFlusher:
+    """Buffers writes in memory and flushes them every flush_interval, or sooner on request."""
+
+    def __init__(self, flush_interval: float):
+        self.flush_interval = flush_interval
+        self._flush_requested = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    async def flush(self):
+        raise NotImplementedError
+
+    def request_flush(self):
+        self._flush_requested.set()
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        await self.flush()
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._flush_requested.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_requested.clear()
+            await self.flush()
+
+
+class RollupWriter(PeriodicFlusher):
+    def __init__(self, collection, flush_interval: float = 1.0, max_pending: int = 5000):
+        super().__init__(flush_interval)
+        self.collection = collection
+        self.max_pending = max_pending
+        self._pending: Dict[str, Counter] = defaultdict(Counter)
+        self._fields: Dict[str, dict] = {}
+
+    def record(self, zone: str, level: int, counts: Dict[str, int], when: Optional[datetime] = None):
+        """Add counter increments for one event to the level, zone and day rollups."""
+        day = (when or datetime.utcnow()).strftime('%Y-%m-%d')
+        targets = {
+            level_rollup_id(zone, level): {'scope': 'level', 'zone': zone, 'level': level},
+            zone_rollup_id(zone): {'scope': 'zone', 'zone': zone},
+            day_rollup_id(day): {'scope': 'day', 'day': day},
+        }
+        for rollup_id, fields in targets.items():
+            self._pending[rollup_id].update(counts)
+            self._fields[rollup_id] = fields
+        if len(self._pending) >= self.max_pending:
+            self.request_flush()
+
+    def record_submission(self, zone: str, level: int, correct: bool, when: Optional[datetime] = None):
+        self.record(zone, level, {'submissions': 1, 'correct': int(correct)}, when)
+
+    async def flush(self):
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, defaultdict(Counter)
+        fields, self._fields = self._fields, {}
+
+        operations = [
+            UpdateOne(
+                {'_id': rollup_id},
+                {'$inc': dict(counts), '$setOnInsert': fields[rollup_id]},
+                upsert=True,
+            )
+            for rollup_id, counts in pending.items()
+        ]
+        try:
+            await self.collection.bulk_write(operations, ordered=False)
+        except Exception:
+            logger.exception("Rollup flush failed; keeping %d rollups for retry", len(pending))
+            for rollup_id, counts in pending.items():
+                self._pending[rollup_id].update(counts)
+                self._fields.setdefault(rollup_id, fields[rollup_id])
+
+
+async def read_rollups(collection, rollup_ids: List[str]) -> Dict[str, dict]:
+    """Fetch rollups by _id. Missing rollups come back zeroed."""
+    documents = await collection.find({'_id': {'$in': rollup_ids}}).to_list(len(rollup_ids))
+    by_id = {document['_id']: document for document in documents}
+    return {rollup_id: _with_rates(by_id.get(rollup_id, {'_id': rollup_id})) for rollup_id in rollup_ids}
+
+
+async def zone_dashboard(collection, zone: str, level_count: int) -> dict:
+    ids = [zone_rollup_id(zone)] + [level_rollup_id(zone, level) for level in range(1, level_count + 1)]
+    rollups = await read_rollups(collection, ids)
+    return {
+        'zone': rollups[zone_rollup_id(zone)],
+        'levels': [rollups[level_rollup_id(zone, level)] for level in range(1, level_count + 1)],
+    }
+
+
+async def daily_dashboard(collection, start: datetime, days: int) -> List[dict]:
+    ids = [day_rollup_id((start + timedelta(days=offset)).strftime('%Y-%m-%d')) for offset in range(days)]
+    rollups = await read_rollups(collection, ids)
+    return [rollups[rollup_id] for rollup_id in ids]
+
+
+async def difficulty_report(collection) -> Optional[dict]:
+    """Latest report written by the cohort_analysis job, or None if it has not run yet."""
+    report = await collection.find_one({'_id': DIFFICULTY_REPORT_ID})
+    if report is not None:
+        report.pop('_id')
+    return report
+
+
+def _with_rates(document: dict) -> dict:
+    summary = {key: value for key, value in document.items() if key != '_id'}
+    summary['id'] = document['_id']
+    for counter in COUNTERS:
+        summary.setdefault(counter, 0)
+    summary['accuracy'] = summary['correct'] / summary['submissions'] if summary['submissions'] else None
+    return summary
@@ -0,0 +1,203 @@
+"""
+Append-only submission archive.
+
+Every graded submission is kept for auditing and for regrading when a
+task's expectedQuery or the comparison logic changes. Storing each one as
+a MongoDB document costs far more than the submission is worth. Instead,
+submissions are buffered in memory and appended as compressed blocks to
+segment files on disk, partitioned by day:
+
+    <root>/2026-10-19/<segment>.seg   blocks: 4-byte length + zlib(NDJSON)
+    <root>/2026-10-19/<segment>.idx   one JSON line per block
+
+Every index line records the block's offset, length, record count, time
+range and the zone:level keys it contains. A reader that wants one level
+on one day reads that day's small index files and decompresses only the
+matching blocks. Each worker process writes its own segments, so there is
+no locking. A block is indexed only after it has been fully written, so a
+crash mid-append leaves an unindexed tail that readers never see. When a
+flush spans several days and one day's write fails, only that day's
+submissions are kept for the next flush, so days that were written do not
+get a second copy.
+
+Replaying an archive through the grader is done by regrade.py.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import struct
+import time
+import uuid
+import zlib
+from collections import defaultdict
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Iterator, List, NamedTuple, Optional
+
+from analytics import PeriodicFlusher
+
+
+logger = logging.getLogger(__name__)
+
+BLOCK_HEADER = struct.Struct('<I')
+SEGMENT_MAX_BYTES = 64 * 1024 * 1024
+COMPRESSION_LEVEL = 6
+
+
+def archive_day(timestamp_ms: float) -> str:
+    return datetime.fromtimestamp(timestamp_ms / 1000, tz=timezone.utc).strftime('%Y-%m-%d')
+
+
+def level_key(zone: str, level: int) -> str:
+    return f"{zone}:{level}"
+
+
+class BlockRef(NamedTuple):
+    segment: str
+    offset: int
+    length: int
+    count: int
+
+
+class SegmentWriter:
+    """Appends blocks to one day's segment, rotating to a new file when it gets large."""
+
+    def __init__(self, directory: Path, max_bytes: int = SEGMENT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.path: Optional[Path] = None
+        self.size = 0
+
+    def _rotate(self):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        name = f"{int(time.time() * 1000)}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self.path = self.directory / f"{name}.seg"
+        self.size = 0
+
+    def append(self, records: List[dict]) -> int:
+        """Write one block and its index entry. Returns the uncompressed size."""
+        if self.path is None or self.size >= self.max_bytes:
+            self._rotate()
+        raw = b'\n'.join(json.dumps(record, separators=(',', ':')).encode() for record in records)
+        payload = zlib.compress(raw, COMPRESSION_LEVEL)
+        offset = self.size
+        try:
+            with open(self.path, 'ab') as segment:
+                segment.write(BLOCK_HEADER.pack(len(payload)) + payload)
+                segment.flush()
+                os.fsync(segment.fileno())
+        except OSError:
+            # The segment may now end in a torn block; continue in a fresh one
+            self.path = None
+            raise
+        self.size += BLOCK_HEADER.size + len(payload)
+
+        entry = {
+            'offset': offset,
+            'length': len(payload),
+            'count': len(records),
+            'first': min(record['t'] for record in records),
+            'last': max(record['t'] for record in records),
+            'levels': sorted({level_key(record['zone'], record['level']) for record in records}),
+        }
+        with open(self.path.with_suffix('.idx'), 'a') as index:
+            index.write(json.dumps(entry, separators=(',', ':')) + '\n')
+            index.flush()
+            os.fsync(index.fileno())
+        return len(raw)
+
+
+class SubmissionArchive(PeriodicFlusher):
+    def __init__(self, root: Path, flush_interval: float = 1.0, max_pending: int = 5000):
+        super().__init__(flush_interval)
+        self.root = Path(root)
+        self.max_pending = max_pending
+        self._pending: List[dict] = []
+        self._writers: Dict[str, SegmentWriter] = {}
+        self._stats = {'archived': 0, 'blocks': 0, 'raw_bytes': 0, 'compressed_bytes': 0}
+
+    def record(self, zone: str, level: int, query: str, correct: bool, player_id: Optional[str] = None):
+        record = {'t': int(time.time() * 1000), 'zone': zone, 'level': level, 'query': query, 'correct': correct}
+        if player_id:
+            record['player'] = player_id
+        self._pending.append(record)
+        if len(self._pending) >= self.max_pending:
+            self.request_flush()
+
+    async def flush(self):
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, []
+        try:
+            failed = await asyncio.to_thread(self._write, pending)
+        except Exception:
+            logger.exception("Archive flush failed; keeping %d submissions for retry", len(pending))
+            failed = pending
+        self._pending[:0] = failed
+
+    def _write(self, records: List[dict]) -> List[dict]:
+        """Append each day's records as one block. Returns the records of the days that failed."""
+        by_day: Dict[str, List[dict]] = defaultdict(list)
+        for record in records:
+            by_day[archive_day(record['t'])].append(record)
+        failed = []
+        for day, day_records in by_day.items():
+            writer = self._writers.get(day)
+            if writer is None:
+                # Days only move forward, so earlier days' writers are done
+                self._writers = {day: SegmentWriter(self.root / day)}
+                writer = self._writers[day]
+            size_before = writer.size
+            try:
+                raw_bytes = writer.append(day_records)
+            except Exception:
+                logger.exception("Archive write for %s failed; keeping %d submissions for retry", day, len(day_records))
+                failed.extend(day_records)
+                continue
+            self._stats['raw_bytes'] += raw_bytes
+            self._stats['archived'] += len(day_records)
+            self._stats['blocks'] += 1
+            self._stats['compressed_bytes'] += writer.size - size_before - BLOCK_HEADER.size
+        return failed
+
+    def stats(self) -> dict:
+        return {**self._stats, 'pending': len(self._pending)}
+
+
+def find_blocks(
+    root: Path,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    zone: Optional[str] = None,
+    level: Optional[int] = None,
+) -> Iterator[BlockRef]:
+    """Blocks holding submissions for the zone/level (when given) on days in [since, until]."""
+    root = Path(root)
+    if not root.exists():
+        return
+    for day_dir in sorted(path for path in root.iterdir() if path.is_dir()):
+        if (since and day_dir.name < since) or (until and day_dir.name > until):
+            continue
+        for index_path in sorted(day_dir.glob('*.idx')):
+            with open(index_path) as index:
+                for line in index:
+                    entry = json.loads(line)
+                    if zone is not None and not any(
+                        key.split(':')[0] == zone and (level is None or key == level_key(zone, level))
+                        for key in entry['levels']
+                    ):
+                        continue
+                    yield BlockRef(str(index_path.with_suffix('.seg')), entry['offset'], entry['length'], entry['count'])
+
+
+def read_block(block: BlockRef, zone: Optional[str] = None, level: Optional[int] = None) -> List[dict]:
+    with open(block.segment, 'rb') as segment:
+        segment.seek(block.offset + BLOCK_HEADER.size)
+        payload = segment.read(block.length)
+    records = [json.loads(line) for line in zlib.decompress(payload).split(b'\n')]
+    return [
+        record for record in records
+        if (zone is None or record['zone'] == zone) and (level is None or record['level'] == level)
+    ]
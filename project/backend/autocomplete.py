@@ -0,0 +1,139 @@
+"""
+Schema-aware SQL autocomplete.
+
+Each zone gets sorted prefix indexes of its tables and columns. SQL keywords
+and functions come from referenceData.syntaxReference and are shared across
+zones. A lookup is a bisect into a sorted list plus a short scan, so
+answering a keystroke costs microseconds.
+
+The query is parsed only far enough to map aliases to tables
+(`FROM survivors s` makes `s.` complete survivors' columns) and to know
+whether the cursor sits where a table name is expected.
+"""
+
+import re
+from bisect import bisect_left
+from typing import Dict, List, Optional, Tuple
+
+
+NON_FUNCTION_WORDS = {'AS', 'IN', 'EXISTS', 'OVER', 'VALUES', 'ON'}
+
+TABLE_CONTEXT_WORDS = {'FROM', 'JOIN', 'INTO', 'UPDATE', 'TABLE'}
+
+TABLE_REFERENCE_PATTERN = re.compile(
+    r'\b(?:FROM|JOIN)\s+([A-Za-z_]\w*)(?:\s+(?:AS\s+)?([A-Za-z_]\w*))?', re.I
+)
+
+CURRENT_TOKEN_PATTERN = re.compile(r'([A-Za-z_]\w*\.)?([A-Za-z_]\w*)?$')
+
+PREVIOUS_WORD_PATTERN = re.compile(r'([A-Za-z_]+)\s+$')
+
+CLAUSE_WORDS = {
+    'WHERE', 'JOIN', 'INNER', 'LEFT', 'RIGHT', 'FULL', 'CROSS', 'OUTER', 'ON', 'GROUP',
+    'ORDER', 'HAVING', 'LIMIT', 'OFFSET', 'UNION', 'EXCEPT', 'INTERSECT', 'USING', 'NATURAL',
+}
+
+
+class PrefixIndex:
+    """Case-insensitive prefix lookup over a fixed set of labels."""
+
+    def __init__(self, entries: List[Tuple[str, dict]]):
+        entries = sorted(entries, key=lambda entry: entry[0].lower())
+        self._keys = [label.lower() for label, _ in entries]
+        self._items = [item for _, item in entries]
+
+    def search(self, prefix: str, limit: int) -> List[dict]:
+        prefix = prefix.lower()
+        matches = []
+        index = bisect_left(self._keys, prefix)
+        while index < len(self._keys) and len(matches) < limit and self._keys[index].startswith(prefix):
+            matches.append(self._items[index])
+            index += 1
+        return matches
+
+
+def extract_sql_vocabulary(syntax_reference: List[dict]) -> Tuple[List[str], List[str]]:
+    """Collect (keywords, functions) from referenceData.syntaxReference."""
+    keywords, functions = set(), set()
+    for category in syntax_reference:
+        for item in category['items']:
+            if re.fullmatch(r'[A-Z_]+(?: [A-Z_]+)*', item['name']):
+                keywords.add(item['name'])
+            for word in re.findall(r'\b([A-Z][A-Z_]+)\s*\(', item['syntax']):
+                if word not in NON_FUNCTION_WORDS:
+                    functions.add(word)
+            keywords.update(re.findall(r'\b([A-Z][A-Z_]+)\b', item['syntax']))
+    return sorted(keywords - functions), sorted(functions)
+
+
+class ZoneCompleter:
+    def __init__(self, schema: Dict[str, List[str]], keywords: PrefixIndex, functions: PrefixIndex):
+        self.schema = schema
+        self._tables_by_name = {table.lower(): table for table in schema}
+        self.tables = PrefixIndex([
+            (table, {'label': table, 'kind': 'table', 'detail': ', '.join(columns)})
+            for table, columns in schema.items()
+        ])
+        self.columns = {
+            table: PrefixIndex([(column, {'label': column, 'kind': 'column', 'detail': table}) for column in columns])
+            for table, columns in schema.items()
+        }
+        self.all_columns = PrefixIndex([
+            (column, {'label': column, 'kind': 'column', 'detail': table})
+            for table, columns in schema.items() for column in columns
+        ])
+        self.keywords = keywords
+        self.functions = functions
+
+    def complete(self, query: str, cursor: Optional[int] = None, limit: int = 20) -> dict:
+        """Suggestions for the token ending at `cursor` (defaults to the end of the query)."""
+        before_cursor = query[:len(query) if cursor is None else cursor]
+        match = CURRENT_TOKEN_PATTERN.search(before_cursor)
+        qualifier = (match.group(1) or '')[:-1]
+        prefix = match.group(2) or ''
+        aliases = self._resolve_aliases(query)
+
+        if qualifier:
+            table = aliases.get(qualifier.lower()) or self._tables_by_name.get(qualifier.lower())
+            suggestions = self.columns[table].search(prefix, limit) if table else []
+            return {'prefix': prefix, 'qualifier': qualifier, 'suggestions': suggestions}
+
+        previous = PREVIOUS_WORD_PATTERN.search(before_cursor[:len(before_cursor) - len(prefix)])
+        if previous and previous.group(1).upper() in TABLE_CONTEXT_WORDS:
+            return {'prefix': prefix, 'qualifier': None, 'suggestions': self.tables.search(prefix, limit)}
+
+        columns = []
+        for table in dict.fromkeys(aliases.values()):
+            columns.extend(self.columns[table].search(prefix, limit))
+        if not prefix:
+            # Nothing typed yet: only the columns of tables already in the query.
+            return {'prefix': prefix, 'qualifier': None, 'suggestions': columns[:limit]}
+        if not columns:
+            columns = self.all_columns.search(prefix, limit)
+
+        suggestions = (
+            columns
+            + self.tables.search(prefix, limit)
+            + self.keywords.search(prefix, limit)
+            + self.functions.search(prefix, limit)
+        )
+        return {'prefix': prefix, 'qualifier': None, 'suggestions': suggestions[:limit]}
+
+    def _resolve_aliases(self, query: str) -> Dict[str, str]:
+        """Map lowercase table names and aliases to the tables they refer to."""
+        aliases = {}
+        for table_name, alias in TABLE_REFERENCE_PATTERN.findall(query):
+            table = self._tables_by_name.get(table_name.lower())
+            if table is None:
+                continue
+            aliases[table.lower()] = table
+            if alias and alias.upper() not in CLAUSE_WORDS:
+                aliases[alias.lower()] = table
+        return aliases
+
+
+def build_completers(schemas: Dict[str, Dict[str, List[str]]], syntax_reference: List[dict]) -> Dict[str, ZoneCompleter]:
+    keywords, functions = extract_sql_vocabulary(syntax_reference)
+    keyword_index = PrefixIndex([(word, {'label': word, 'kind': 'keyword', 'detail': None}) for word in keywords])
+    function_index = PrefixIndex([(word, {'label': f"{word}()", 'kind': 'function', 'detail': None}) for word in functions])
+    return {zone: ZoneCompleter(schema, keyword_index, function_index) for zone, schema in schemas.items()}
@@ -0,0 +1,129 @@
+"""
+Versioned content catalog.
+
+Compiles gameData.js, lessonsData.js and referenceData.js into small JSON
+artifacts: one per zone's tasks, one per lesson, a lesson index and the
+reference library. Each artifact is named by a hash of its content, so it
+can be served with an immutable cache policy. A player entering The Beach
+fetches only tasks-beach, and lesson theory loads when a lesson is opened.
+
+Every artifact is pre-compressed once at build time: gzip always, and
+brotli when the optional `brotli` package is installed. The manifest is the
+only response that changes between deployments. It is served with an ETag
+and `no-cache`, so clients revalidate it cheaply and pick up new hashes.
+
+Each encoding of an artifact is a different representation, so it gets its
+own strong ETag ("<hash>", "<hash>-gzip", "<hash>-br"), and every response
+carries `Vary: Accept-Encoding`. A cache can then never answer a gzip
+request with a brotli body whose ETag it has already seen.
+
+Run `python catalog.py <output_dir>` to write the artifacts to disk for a
+CDN or static host.
+"""
+
+import gzip
+import hashlib
+import json
+import sys
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+MANIFEST_CACHE_CONTROL = 'no-cache'
+
+
+class Artifact:
+    def __init__(self, name: str, payload):
+        self.name = name
+        self.body = json.dumps(payload, separators=(',', ':'), ensure_ascii=False, sort_keys=True).encode('utf-8')
+        self.hash = hashlib.sha256(self.body).hexdigest()[:16]
+        self.filename = f"{name}.{self.hash}.json"
+        self.etags = {None: f'"{self.hash}"', 'gzip': f'"{self.hash}-gzip"', 'br': f'"{self.hash}-br"'}
+        self.encodings = {'gzip': gzip.compress(self.body, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            self.encodings['br'] = brotli.compress(self.body, quality=11)
+
+    def negotiate(self, accept_encoding: str) -> Tuple[bytes, Optional[str]]:
+        """Pick the smallest pre-compressed body the client accepts."""
+        accepted = {part.split(';')[0].strip() for part in (accept_encoding or '').split(',')}
+        for encoding in ('br', 'gzip'):
+            if encoding in accepted and encoding in self.encodings:
+                return self.encodings[encoding], encoding
+        return self.body, None
+
+
+class ContentCatalog:
+    def __init__(self, content: dict):
+        artifacts = [
+            Artifact(f"tasks-{zone}", tasks) for zone, tasks in content['gameTasks'].items()
+        ]
+        artifacts.extend(Artifact(f"lesson-{lesson['id']}", lesson) for lesson in content['lessons'])
+        artifacts.append(Artifact('lessons', [
+            {'id': lesson['id'], 'title': lesson['title'], 'description': lesson['description'],
+             'taskIds': [task['id'] for task in lesson['tasks']]}
+            for lesson in content['lessons']
+        ]))
+        artifacts.append(Artifact('reference', {
+            'syntaxReference': content['syntaxReference'],
+            'examplesLibrary': content['examplesLibrary'],
+            'commonPatterns': content['commonPatterns'],
+        }))
+
+        self.artifacts: Dict[str, Artifact] = {artifact.filename: artifact for artifact in artifacts}
+        version = hashlib.sha256(''.join(sorted(self.artifacts)).encode('utf-8')).hexdigest()[:16]
+        self.manifest = Artifact('manifest', {
+            'version': version,
+            'artifacts': {artifact.name: artifact.filename for artifact in artifacts},
+        })
+        self.version = version
+
+    def respond(self, filename: Optional[str], accept_encoding: str = '', if_none_match: str = '') -> Tuple[int, bytes, dict]:
+        """Return (status, body, headers) for an artifact, or for the manifest when filename is None."""
+        artifact = self.manifest if filename is None else self.artifacts.get(filename)
+        if artifact is None:
+            return 404, b'', {}
+
+        body, encoding = artifact.negotiate(accept_encoding)
+        etag = artifact.etags[encoding]
+        headers = {
+            'ETag': etag,
+            'Cache-Control': MANIFEST_CACHE_CONTROL if filename is None else IMMUTABLE_CACHE_CONTROL,
+            'Vary': 'Accept-Encoding',
+        }
+        # If-None-Match uses weak comparison, so a W/ prefix added by a proxy still matches
+        requested = {tag.strip().removeprefix('W/') for tag in (if_none_match or '').split(',')}
+        if etag in requested or '*' in requested:
+            return 304, b'', headers
+
+        headers['Content-Type'] = 'application/json'
+        if encoding:
+            headers['Content-Encoding'] = encoding
+        return 200, body, headers
+
+    def write(self, output_dir: Path):
+        """Write every artifact, its compressed variants and the manifest to a directory."""
+        output_dir.mkdir(parents=True, exist_ok=True)
+        for artifact in [*self.artifacts.values(), self.manifest]:
+            filename = 'manifest.json' if artifact is self.manifest else artifact.filename
+            (output_dir / filename).write_bytes(artifact.body)
+            for encoding, body in artifact.encodings.items():
+                suffix = {'gzip': '.gz', 'br': '.br'}[encoding]
+                (output_dir / f"{filename}{suffix}").write_bytes(body)
+
+
+if __name__ == '__main__':
+    from content import load_game_content
+
+    if len(sys.argv) != 2:
+        print("Usage: python catalog.py <output_dir>")
+        sys.exit(1)
+
+    catalog = ContentCatalog(load_game_content())
+    catalog.write(Path(sys.argv[1]))
+    print(f"Wrote {len(catalog.artifacts)} artifacts (version {catalog.version}) to {sys.argv[1]}")
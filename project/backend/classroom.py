@@ -0,0 +1,293 @@
+"""
+Live classroom dashboards over server-sent events.
+
+A teacher creates a class with POST /api/classes. That returns a class ID
+for the students and a teacher token for the dashboard. Both are HMACs
+under CLASSROOM_SECRET (see ClassKeys), so every worker can check them
+without shared state:
+
+- class IDs are unguessable. Events tagged with an ID the server did not
+  mint are dropped, so nobody can write into a class they were not given.
+- the snapshot and the stream show player IDs and their error text, so
+  they require the class's teacher token. The stream takes it as a
+  `token` query parameter, because EventSource cannot set headers.
+
+Students tag their activity with a class: telemetry events carry a
+`class_id` field, and graded submissions an X-Class-Id header. Attempts
+come only from graded submissions and telemetry adds completions and
+skips, so no attempt is counted twice. Each class has one ClassBroadcaster
+holding incrementally updated aggregates per student:
+
+- levels completed
+- the level they are on now
+- attempts and failures
+
+It also holds the class's most recent failed attempts. Recording an event
+updates one student in place and marks them dirty. Nothing is recomputed
+from the whole class.
+
+Dashboards subscribe with GET /api/classes/{class_id}/stream. A new
+subscriber first gets a snapshot of the whole class. After that, once per
+tick, every class that changed encodes one diff holding only the changed
+students and the new failures. The encoded frame is put on every
+subscriber's queue as is. Per tick the work is proportional to the
+classes and students that changed, plus one queue put per viewer. It does
+not grow with viewers × students. Events between ticks coalesce, so a
+student who fails five times in a second shows up in one diff.
+
+A subscriber that falls behind by MAX_QUEUED_FRAMES is not buffered
+further. Its queue is dropped and it is sent a fresh snapshot. Aggregates
+live in the process, like the leaderboard, and classes nobody has
+touched or watched for CLASS_IDLE_SECONDS are forgotten.
+"""
+
+import asyncio
+import hashlib
+import hmac
+import json
+import secrets
+import time
+from collections import OrderedDict, deque
+from datetime import timezone
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from analytics import PeriodicFlusher
+
+
+CLASS_HEADER = 'x-class-id'
+
+MAX_CLASSES = 10_000
+MAX_STUDENTS_PER_CLASS = 500
+RECENT_FAILURES = 20
+MAX_QUEUED_FRAMES = 16
+KEEPALIVE_SECONDS = 15.0
+CLASS_IDLE_SECONDS = 6 * 60 * 60
+
+KEEPALIVE_FRAME = b': keepalive\n\n'
+
+
+class ClassKeys:
+    """Mints and checks class IDs (`<nonce>.<signature>`) and their teacher tokens."""
+
+    def __init__(self, secret: bytes):
+        self.secret = secret
+
+    def _sign(self, purpose: str, value: str, length: int) -> str:
+        return hmac.new(self.secret, f"{purpose}:{value}".encode(), hashlib.sha256).hexdigest()[:length]
+
+    def mint(self) -> Tuple[str, str]:
+        """A new (class_id, teacher_token) pair."""
+        nonce = secrets.token_urlsafe(12)
+        class_id = f"{nonce}.{self._sign('class', nonce, 16)}"
+        return class_id, self._sign('teacher', class_id, 32)
+
+    def is_class_id(self, class_id: str) -> bool:
+        nonce, _, signature = class_id.partition('.')
+        return hmac.compare_digest(signature.encode(), self._sign('class', nonce, 16).encode())
+
+    def is_teacher(self, class_id: str, token: Optional[str]) -> bool:
+        return bool(token) and self.is_class_id(class_id) and hmac.compare_digest(
+            token.encode(), self._sign('teacher', class_id, 32).encode()
+        )
+
+
+def sse_frame(event: str, seq: int, data: dict) -> bytes:
+    return f"id: {seq}\nevent: {event}\ndata: {json.dumps(data, separators=(',', ':'), default=str)}\n\n".encode()
+
+
+class Subscription:
+    def __init__(self):
+        self.queue: asyncio.Queue = asyncio.Queue(MAX_QUEUED_FRAMES)
+        self.resync = False
+
+    def offer(self, frame: bytes):
+        try:
+            self.queue.put_nowait(frame)
+        except asyncio.QueueFull:
+            # Too far behind for diffs to be worth sending; start over from a snapshot
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.resync = True
+            self.queue.put_nowait(KEEPALIVE_FRAME)
+
+
+class ClassBroadcaster:
+    def __init__(self, class_id: str):
+        self.class_id = class_id
+        self.students: Dict[str, dict] = {}
+        self.recent_failures: deque = deque(maxlen=RECENT_FAILURES)
+        self.subscribers: Set[Subscription] = set()
+        self.seq = 0
+        self.last_activity = time.monotonic()
+        self._completed: Dict[str, Set[str]] = {}
+        self._dirty: Set[str] = set()
+        self._new_failures: List[dict] = []
+        self._snapshot: Optional[bytes] = None
+
+    def record(self, player_id: str, zone: str, level: int, outcome: str, at: float, error: Optional[str] = None):
+        """Apply one attempt ('correct', 'failed', 'skipped' or 'completed') to the student's aggregate."""
+        student = self.students.get(player_id)
+        if student is None:
+            if len(self.students) >= MAX_STUDENTS_PER_CLASS:
+                return
+            student = self.students[player_id] = {
+                'player_id': player_id,
+                'levels_completed': 0,
+                'current': None,
+                'attempts': 0,
+                'failures': 0,
+                'last_seen': at,
+            }
+            self._completed[player_id] = set()
+
+        current = f"{zone}-{level}"
+        student['current'] = current
+        student['last_seen'] = max(student['last_seen'], at)
+        if outcome in ('correct', 'failed'):
+            student['attempts'] += 1
+        if outcome == 'failed':
+            student['failures'] += 1
+            failure = {'player_id': player_id, 'level': current, 'at': at}
+            if error:
+                failure['error'] = error[:200]
+            self.recent_failures.append(failure)
+            self._new_failures.append(failure)
+        elif outcome in ('correct', 'completed'):
+            completed = self._completed[player_id]
+            completed.add(current)
+            student['levels_completed'] = len(completed)
+
+        self._dirty.add(player_id)
+        self._snapshot = None
+        self.last_activity = time.monotonic()
+
+    def snapshot(self) -> dict:
+        return {
+            'class_id': self.class_id,
+            'students': list(self.students.values()),
+            'recent_failures': list(self.recent_failures),
+        }
+
+    def snapshot_frame(self) -> bytes:
+        # Shared by every viewer that connects before the next change
+        if self._snapshot is None:
+            self._snapshot = sse_frame('snapshot', self.seq, self.snapshot())
+        return self._snapshot
+
+    def tick(self) -> int:
+        """Send the changes since the last tick to every subscriber. Returns the frames queued."""
+        if not self._dirty:
+            return 0
+        self.seq += 1
+        frame = sse_frame('diff', self.seq, {
+            'students': [self.students[player_id] for player_id in self._dirty],
+            'failures': self._new_failures,
+        })
+        self._dirty = set()
+        self._new_failures = []
+        for subscription in self.subscribers:
+            subscription.offer(frame)
+        return len(self.subscribers)
+
+    async def stream(self, is_disconnected: Callable[[], Awaitable[bool]]) -> AsyncIterator[bytes]:
+        """SSE frames for one dashboard: a snapshot, then coalesced diffs until the client goes away."""
+        subscription = Subscription()
+        self.subscribers.add(subscription)
+        try:
+            yield self.snapshot_frame()
+            while not await is_disconnected():
+                try:
+                    frame = await asyncio.wait_for(subscription.queue.get(), KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    frame = KEEPALIVE_FRAME
+                if subscription.resync:
+                    subscription.resync = False
+                    frame = self.snapshot_frame()
+                yield frame
+        finally:
+            self.subscribers.discard(subscription)
+            self.last_activity = time.monotonic()
+
+
+class ClassroomHub(PeriodicFlusher):
+    def __init__(self, keys: ClassKeys, tick: float = 1.0, max_classes: int = MAX_CLASSES):
+        super().__init__(tick)
+        self.keys = keys
+        self.max_classes = max_classes
+        self._classes: "OrderedDict[str, ClassBroadcaster]" = OrderedDict()
+        self._changed: Set[str] = set()
+        self._stats = {'events': 0, 'ticks': 0, 'diffs': 0, 'frames': 0}
+
+    def watch(self, class_id: str) -> Optional[ClassBroadcaster]:
+        """The class's broadcaster, created if needed. None when every slot is taken by a watched class."""
+        broadcaster = self._classes.get(class_id)
+        if broadcaster is not None:
+            self._classes.move_to_end(class_id)
+            return broadcaster
+        if len(self._classes) >= self.max_classes:
+            oldest_id, oldest = next(iter(self._classes.items()))
+            if oldest.subscribers:
+                return None
+            del self._classes[oldest_id]
+            self._changed.discard(oldest_id)
+        broadcaster = self._classes[class_id] = ClassBroadcaster(class_id)
+        return broadcaster
+
+    def record(self, class_id: str, player_id: str, zone: str, level: int, outcome: str,
+               at: Optional[float] = None, error: Optional[str] = None):
+        if not self.keys.is_class_id(class_id):
+            return
+        broadcaster = self.watch(class_id)
+        if broadcaster is None:
+            return
+        broadcaster.record(player_id, zone, level, outcome, at if at is not None else time.time(), error)
+        self._changed.add(class_id)
+        self._stats['events'] += 1
+
+    def record_events(self, documents: List[dict]):
+        """Feed parsed telemetry events (see telemetry.parse_events) that name a class and a player."""
+        for document in documents:
+            class_id = document['data'].get('class_id')
+            player_id = document['player_id']
+            if type(class_id) is not str or not class_id or len(class_id) > 64 or not player_id:
+                continue
+            meta = document['meta']
+            if meta['type'] == 'completion':
+                outcome = 'completed'
+            elif meta['type'] == 'skip':
+                outcome = 'skipped'
+            else:
+                continue
+            at = document['ts'].replace(tzinfo=timezone.utc).timestamp()
+            self.record(class_id, player_id, meta['zone'], meta['level'], outcome, at)
+
+    def snapshot(self, class_id: str) -> Optional[dict]:
+        broadcaster = self._classes.get(class_id)
+        return broadcaster.snapshot() if broadcaster is not None else None
+
+    async def flush(self):
+        self._stats['ticks'] += 1
+        changed, self._changed = self._changed, set()
+        for class_id in changed:
+            broadcaster = self._classes.get(class_id)
+            if broadcaster is not None:
+                self._stats['diffs'] += 1
+                self._stats['frames'] += broadcaster.tick()
+
+        # The least recently active classes are at the front
+        idle_before = time.monotonic() - CLASS_IDLE_SECONDS
+        for _ in range(len(self._classes)):
+            class_id, broadcaster = next(iter(self._classes.items()))
+            if broadcaster.subscribers:
+                self._classes.move_to_end(class_id)
+            elif broadcaster.last_activity > idle_before:
+                break
+            else:
+                del self._classes[class_id]
+
+    def stats(self) -> dict:
+        return {
+            **self._stats,
+            'classes': len(self._classes),
+            'subscribers': sum(len(broadcaster.subscribers) for broadcaster in self._classes.values()),
+        }
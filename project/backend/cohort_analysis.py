@@ -0,0 +1,354 @@
+#!/usr/bin/env python3
+"""
+Offline cohort and difficulty analysis.
+
+Streams every player's progress document and every submission event from
+MongoDB in large batches into flat NumPy arrays, one element per
+player-level record. Packed progress is decoded a whole batch at a time
+with vectorized varint reads over the concatenated blobs. All statistics are then computed with vectorized
+grouping (bincount and a single lexsort per quantile family), with no
+per-player Python loops:
+
+- per-level reach, completion and skip rates
+- per-level attempt histograms and attempt percentiles
+- per-level median bestTime, and median time between completing the
+  previous level and this one (from completedAt)
+- the beach -> jungle -> ruins funnel with drop-off per zone
+- per-level submission counts and accuracy from telemetry
+
+The report is written to the `reports` collection (_id "difficulty"), which
+GET /api/analytics/difficulty serves.
+
+Usage: python cohort_analysis.py [--batch-size 100000]
+"""
+
+import argparse
+import os
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import List
+
+import numpy as np
+from dotenv import load_dotenv
+from pymongo import MongoClient
+
+from analytics import DIFFICULTY_REPORT_ID
+from progress import (
+    MAX_VARINT_BYTES,
+    PACKED_FORMAT_VERSION,
+    STATUS_RANKS,
+    TOTAL_LEVELS,
+    ZONE_LEVEL_COUNTS,
+    ZONES,
+    document_levels,
+    flat_level_labels,
+)
+from telemetry import EVENTS_COLLECTION, LEGACY_EVENTS_COLLECTION, iter_bucket_events
+
+
+LEVEL_INDEX = {label: index for index, label in enumerate(flat_level_labels())}
+
+LEVEL_ZONE = np.repeat(np.arange(len(ZONES)), list(ZONE_LEVEL_COUNTS.values()))
+
+# Upper-exclusive attempt bucket edges: 0, 1, 2, 3, 4-5, 6-8, 9-13, 14-20, 21+
+ATTEMPT_BUCKETS = np.array([1, 2, 3, 4, 6, 9, 14, 21])
+
+# Every packed document written by encode_levels starts with these two bytes
+PACKED_HEADER = bytes([PACKED_FORMAT_VERSION, TOTAL_LEVELS])
+BITMAP_BYTES = (TOTAL_LEVELS + 7) // 8
+
+
+def _read_varints(data: np.ndarray, ends_seen: np.ndarray, starts: np.ndarray, counts: np.ndarray):
+    """Decode counts[i] consecutive varints at starts[i] for every i at once.
+
+    ends_seen is the running count of bytes below 0x80, so the k-th varint
+    after a position ends where that count has gone up by k. Returns the
+    values in order and the position after each run.
+    """
+    total = int(counts.sum())
+    run = np.repeat(np.arange(len(counts)), counts)
+    first = np.cumsum(counts) - counts
+    k = np.arange(total) - first[run]
+    ends = np.searchsorted(ends_seen, ends_seen[starts - 1][run] + k + 1)
+    begins = np.where(k == 0, starts[run], np.concatenate(([0], ends[:-1] + 1)))
+    lengths = ends - begins + 1
+    if total and lengths.max() > MAX_VARINT_BYTES:
+        raise ValueError("Packed varint is too long")
+
+    values = np.zeros(total, dtype=np.int64)
+    for shift in range(int(lengths.max()) if total else 0):
+        more = lengths > shift
+        values[more] |= (data[begins[more] + shift] & 0x7F).astype(np.int64) << (7 * shift)
+    after = starts.copy()
+    filled = counts > 0
+    after[filled] = ends[first[filled] + counts[filled] - 1] + 1
+    return values, after
+
+
+def decode_packed_levels(blobs: List[bytes]) -> dict:
+    """decode_levels for many documents at once, as flat per-record arrays.
+
+    Every blob must start with PACKED_HEADER. `player` in the result is the
+    blob's position in the list.
+    """
+    lengths = np.fromiter(map(len, blobs), dtype=np.int64, count=len(blobs))
+    offsets = np.cumsum(lengths) - lengths
+    # Zero padding keeps the reads of a truncated last blob in bounds
+    data = np.frombuffer(b''.join(blobs) + bytes(MAX_VARINT_BYTES + BITMAP_BYTES), dtype=np.uint8)
+    ends_seen = np.cumsum(data < 0x80)
+    levels = np.arange(TOTAL_LEVELS)
+
+    position = offsets + len(PACKED_HEADER)
+    status = (data[position[:, None] + (levels >> 2)] >> ((levels & 3) * 2)) & 3
+    position = position + (TOTAL_LEVELS + 3) // 4
+
+    sections = []
+    for _ in range(3):
+        bitmap = data[position[:, None] + np.arange(BITMAP_BYTES)]
+        present = np.unpackbits(bitmap, axis=1, bitorder='little')[:, :TOTAL_LEVELS].astype(bool)
+        values, position = _read_varints(data, ends_seen, position + BITMAP_BYTES, present.sum(axis=1))
+        section = np.zeros(present.shape, dtype=np.int64)
+        section[present] = values
+        sections.append((present, section))
+    if np.any(position > offsets + lengths):
+        raise ValueError("Packed progress is truncated")
+
+    (_, attempts), (has_best, best), (has_completed, completed) = sections
+    # Unzigzag the completion deltas and add them up along each row
+    completed_at = np.cumsum((completed >> 1) ^ -(completed & 1), axis=1)
+
+    recorded = (status > 0) | (attempts > 0) | has_best | has_completed
+    player, level = np.nonzero(recorded)
+    return {
+        'player': player.astype(np.int64),
+        'level': level.astype(np.int16),
+        'status': status[recorded].astype(np.int8),
+        'attempts': attempts[recorded].astype(np.int32),
+        'best_time': np.where(has_best, best / 10, np.nan)[recorded],
+        'completed_at': np.where(has_completed, completed_at, np.nan)[recorded].astype(np.float64),
+    }
+
+
+def load_progress_arrays(collection, batch_size: int = 100_000) -> dict:
+    """Stream progress documents into flat per-record arrays.
+
+    Packed documents are decoded in bulk with decode_packed_levels. Only
+    documents still in the older `levels` layout are walked record by record.
+    """
+    columns = {name: [] for name in ('player', 'level', 'status', 'attempts', 'best_time', 'completed_at')}
+    chunks = {name: [] for name in columns}
+    blobs: List[bytes] = []
+    blob_players: List[int] = []
+    player_count = 0
+
+    def flush():
+        if blobs:
+            decoded = decode_packed_levels(blobs)
+            decoded['player'] = np.array(blob_players, dtype=np.int64)[decoded['player']]
+            for name, values in decoded.items():
+                chunks[name].append(values)
+            blobs.clear()
+            blob_players.clear()
+        chunks['player'].append(np.array(columns['player'], dtype=np.int64))
+        chunks['level'].append(np.array(columns['level'], dtype=np.int16))
+        chunks['status'].append(np.array(columns['status'], dtype=np.int8))
+        chunks['attempts'].append(np.array(columns['attempts'], dtype=np.int32))
+        chunks['best_time'].append(np.array(columns['best_time'], dtype=np.float64))
+        chunks['completed_at'].append(np.array(columns['completed_at'], dtype=np.float64))
+        for values in columns.values():
+            values.clear()
+
+    cursor = collection.find({}, {'levels': 1, 'packed': 1}, batch_size=batch_size)
+    for document in cursor:
+        packed = document.get('packed')
+        if packed is not None and packed[:len(PACKED_HEADER)] == PACKED_HEADER:
+            blobs.append(bytes(packed))
+            blob_players.append(player_count)
+        else:
+            for key, record in document_levels(document).items():
+                level = LEVEL_INDEX.get(key)
+                if level is None:
+                    continue
+                completed_at = record.get('completedAt')
+                columns['player'].append(player_count)
+                columns['level'].append(level)
+                columns['status'].append(record.get('status', 0))
+                columns['attempts'].append(record.get('attempts', 0))
+                best_time = record.get('bestTime')
+                columns['best_time'].append(np.nan if best_time is None else best_time)
+                columns['completed_at'].append(
+                    completed_at.replace(tzinfo=timezone.utc).timestamp() if completed_at else np.nan
+                )
+        player_count += 1
+        if len(blobs) * TOTAL_LEVELS + len(columns['level']) >= batch_size:
+            flush()
+    flush()
+
+    arrays = {name: np.concatenate(parts) for name, parts in chunks.items()}
+    arrays['player_count'] = player_count
+    return arrays
+
+
+def load_submission_arrays(db, batch_size: int = 100_000) -> dict:
+    """Stream query events from event buckets (and legacy time-series events) into (level, correct) arrays."""
+    levels, correct = [], []
+
+    def add(event):
+        meta = event['meta']
+        level = LEVEL_INDEX.get(f"{meta['zone']}-{meta['level']}")
+        if level is not None:
+            levels.append(level)
+            correct.append(bool(event.get('data', {}).get('correct')))
+
+    for bucket in db[EVENTS_COLLECTION].find({'types': 'query'}, {'payload': 1}, batch_size=64):
+        for event in iter_bucket_events(bucket):
+            if event['meta']['type'] == 'query':
+                add(event)
+    legacy = db[LEGACY_EVENTS_COLLECTION].find(
+        {'meta.type': 'query'},
+        {'meta.zone': 1, 'meta.level': 1, 'data.correct': 1, '_id': 0},
+        batch_size=batch_size,
+    )
+    for event in legacy:
+        add(event)
+    return {'level': np.array(levels, dtype=np.int16), 'correct': np.array(correct, dtype=bool)}
+
+
+def group_quantiles(groups: np.ndarray, values: np.ndarray, quantiles, group_count: int) -> np.ndarray:
+    """Nearest-rank quantiles of values within each group; NaN for empty groups.
+
+    Returns an array of shape (len(quantiles), group_count).
+    """
+    order = np.lexsort((values, groups))
+    sorted_values = values[order]
+    counts = np.bincount(groups, minlength=group_count)
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+
+    result = np.full((len(quantiles), group_count), np.nan)
+    nonempty = counts > 0
+    for row, quantile in enumerate(quantiles):
+        positions = starts + np.floor(quantile * (counts - 1)).astype(np.int64)
+        result[row, nonempty] = sorted_values[positions[nonempty]]
+    return result
+
+
+def analyze(progress: dict, submissions: dict) -> dict:
+    level = progress['level'].astype(np.int64)
+    status = progress['status']
+    attempts = progress['attempts']
+    player = progress['player']
+
+    reached = status >= STATUS_RANKS['active']
+    completed = status == STATUS_RANKS['completed']
+    skipped = status == STATUS_RANKS['skipped']
+
+    reached_counts = np.bincount(level[reached], minlength=TOTAL_LEVELS)
+    completed_counts = np.bincount(level[completed], minlength=TOTAL_LEVELS)
+    skipped_counts = np.bincount(level[skipped], minlength=TOTAL_LEVELS)
+
+    # Attempt histogram per level, as one bincount over level * buckets + bucket
+    bucket_count = len(ATTEMPT_BUCKETS) + 1
+    buckets = np.digitize(attempts[reached], ATTEMPT_BUCKETS)
+    histogram = np.bincount(
+        level[reached] * bucket_count + buckets, minlength=TOTAL_LEVELS * bucket_count
+    ).reshape(TOTAL_LEVELS, bucket_count)
+    attempt_quantiles = group_quantiles(level[reached], attempts[reached].astype(np.float64), (0.5, 0.9), TOTAL_LEVELS)
+
+    timed = completed & np.isfinite(progress['best_time'])
+    median_best_time = group_quantiles(level[timed], progress['best_time'][timed], (0.5,), TOTAL_LEVELS)[0]
+
+    # Gap between completing level n-1 and level n of the same zone, per player
+    done = completed & np.isfinite(progress['completed_at'])
+    order = np.lexsort((level[done], player[done]))
+    done_player, done_level, done_at = player[done][order], level[done][order], progress['completed_at'][done][order]
+    consecutive = (
+        (done_player[1:] == done_player[:-1])
+        & (done_level[1:] == done_level[:-1] + 1)
+        & (LEVEL_ZONE[done_level[1:]] == LEVEL_ZONE[done_level[:-1]])
+    )
+    gaps = done_at[1:][consecutive] - done_at[:-1][consecutive]
+    median_gap = group_quantiles(done_level[1:][consecutive], gaps, (0.5,), TOTAL_LEVELS)[0]
+
+    # Zone funnel: a player started a zone if any level was reached, finished it if all were completed
+    player_count = max(progress['player_count'], 1)
+    zone = LEVEL_ZONE[level]
+    started = np.bincount(player[reached] * len(ZONES) + zone[reached], minlength=player_count * len(ZONES))
+    finished = np.bincount(player[completed] * len(ZONES) + zone[completed], minlength=player_count * len(ZONES))
+    started = started.reshape(player_count, len(ZONES)) > 0
+    finished = finished.reshape(player_count, len(ZONES)) == np.array(list(ZONE_LEVEL_COUNTS.values()))
+
+    submission_counts = np.bincount(submissions['level'], minlength=TOTAL_LEVELS)
+    correct_counts = np.bincount(submissions['level'][submissions['correct']], minlength=TOTAL_LEVELS)
+
+    levels = []
+    for index, label in enumerate(flat_level_labels()):
+        levels.append({
+            'level': label,
+            'reached': int(reached_counts[index]),
+            'completed': int(completed_counts[index]),
+            'skip_rate': _rate(skipped_counts[index], reached_counts[index]),
+            'completion_rate': _rate(completed_counts[index], reached_counts[index]),
+            'attempts_histogram': histogram[index].tolist(),
+            'attempts_p50': _number(attempt_quantiles[0, index]),
+            'attempts_p90': _number(attempt_quantiles[1, index]),
+            'median_best_time': _number(median_best_time[index]),
+            'median_seconds_since_previous': _number(median_gap[index]),
+            'submissions': int(submission_counts[index]),
+            'accuracy': _rate(correct_counts[index], submission_counts[index]),
+        })
+
+    funnel = []
+    for index, zone_name in enumerate(ZONES):
+        zone_started = int(started[:, index].sum())
+        zone_finished = int(finished[:, index].sum())
+        funnel.append({
+            'zone': zone_name,
+            'started': zone_started,
+            'finished': zone_finished,
+            'drop_off': _rate(zone_started - zone_finished, zone_started),
+        })
+
+    return {
+        'players': progress['player_count'],
+        'records': int(level.size),
+        'attempt_buckets': ['0', '1', '2', '3', '4-5', '6-8', '9-13', '14-20', '21+'],
+        'levels': levels,
+        'funnel': funnel,
+    }
+
+
+def _rate(numerator, denominator):
+    return float(numerator) / float(denominator) if denominator else None
+
+
+def _number(value):
+    return None if np.isnan(value) else float(value)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--batch-size', type=int, default=100_000)
+    args = parser.parse_args()
+
+    load_dotenv(Path(__file__).parent / '.env')
+    client = MongoClient(os.environ['MONGO_URL'])
+    db = client[os.environ['DB_NAME']]
+
+    started_at = time.perf_counter()
+    progress = load_progress_arrays(db.progress, args.batch_size)
+    submissions = load_submission_arrays(db, args.batch_size)
+    loaded_at = time.perf_counter()
+    report = analyze(progress, submissions)
+    finished_at = time.perf_counter()
+
+    report['_id'] = DIFFICULTY_REPORT_ID
+    report['generatedAt'] = datetime.utcnow()
+    report['timings'] = {'load_seconds': loaded_at - started_at, 'analyze_seconds': finished_at - loaded_at}
+    db.reports.replace_one({'_id': DIFFICULTY_REPORT_ID}, report, upsert=True)
+    print(f"Analyzed {report['records']} records from {report['players']} players "
+          f"(load {loaded_at - started_at:.1f}s, analyze {finished_at - loaded_at:.1f}s)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,144 @@
+"""
+Game content loader.
+
+The frontend's data modules (gameData.js, lessonsData.js, referenceData.js)
+are the single source of truth for tasks, lessons and reference material.
+This module reads their exported literals directly so the backend never
+keeps a second copy that could drift.
+
+Only the literal subset those files use is supported: objects, arrays,
+quoted and template strings (without ${} interpolation), numbers, booleans,
+null and comments.
+"""
+
+import re
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from sql_engine import CONTENT_DIR
+
+
+_TOKEN_PATTERN = re.compile(r'''
+    (?P<space>\s+|//[^\n]*|/\*.*?\*/)
+  | (?P<string>"(?:[^"\\]|\\.)*"|'(?:[^'\\]|\\.)*'|`(?:[^`\\]|\\.)*`)
+  | (?P<number>-?\d+(?:\.\d+)?(?:[eE][+-]?\d+)?)
+  | (?P<name>[A-Za-z_$][\w$]*)
+  | (?P<punct>[{}\[\]:,])
+''', re.S | re.X)
+
+_ESCAPES = {'n': '\n', 't': '\t', 'r': '\r', 'b': '\b', 'f': '\f', 'v': '\v', '0': '\0'}
+
+_LITERAL_NAMES = {'true': True, 'false': False, 'null': None, 'undefined': None}
+
+GAME_CONTENT_FILES = ('gameData.js', 'lessonsData.js', 'referenceData.js')
+
+
+def parse_js_exports(source: str) -> Dict[str, Any]:
+    """Parse every `export const name = <literal>;` in a JS module."""
+    exports = {}
+    for match in re.finditer(r'export const (\w+)\s*=\s*', source):
+        value, _ = _parse_value(source, match.end())
+        exports[match.group(1)] = value
+    return exports
+
+
+def load_js_exports(filename: str, content_dir: Optional[Path] = None) -> Dict[str, Any]:
+    path = Path(content_dir or CONTENT_DIR) / filename
+    return parse_js_exports(path.read_text(encoding='utf-8'))
+
+
+def load_game_content(content_dir: Optional[Path] = None, sources: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+    """Load tasks, lessons and reference data into one content dict.
+
+    `sources` maps file names to module text that was already read; the
+    files are read from content_dir otherwise.
+    """
+    content = {}
+    for filename in GAME_CONTENT_FILES:
+        if sources is not None:
+            content.update(parse_js_exports(sources[filename]))
+        else:
+            content.update(load_js_exports(filename, content_dir))
+    return content
+
+
+def get_task(content: Dict[str, Any], zone: str, level: int) -> Optional[dict]:
+    """Look up a task the way GameContext.getTask does (1-based levels)."""
+    tasks = content['gameTasks'].get(zone, [])
+    if 1 <= level <= len(tasks):
+        return tasks[level - 1]
+    return None
+
+
+def _next_token(source: str, position: int):
+    while True:
+        match = _TOKEN_PATTERN.match(source, position)
+        if match is None:
+            raise ValueError(f"Unexpected character {source[position]!r} at offset {position}")
+        if match.lastgroup != 'space':
+            return match.lastgroup, match.group(), match.end()
+        position = match.end()
+
+
+def _parse_value(source: str, position: int):
+    kind, text, position = _next_token(source, position)
+
+    if kind == 'string':
+        return _unquote(text), position
+    if kind == 'number':
+        value = float(text)
+        return (int(value) if value.is_integer() and '.' not in text else value), position
+    if kind == 'name':
+        if text not in _LITERAL_NAMES:
+            raise ValueError(f"Unsupported identifier {text!r} at offset {position}")
+        return _LITERAL_NAMES[text], position
+    if text == '[':
+        return _parse_array(source, position)
+    if text == '{':
+        return _parse_object(source, position)
+    raise ValueError(f"Unexpected token {text!r} at offset {position}")
+
+
+def _parse_array(source: str, position: int):
+    items = []
+    while True:
+        kind, text, after = _next_token(source, position)
+        if text == ']':
+            return items, after
+        value, position = _parse_value(source, position)
+        items.append(value)
+        kind, text, position = _next_token(source, position)
+        if text == ']':
+            return items, position
+        if text != ',':
+            raise ValueError(f"Expected ',' or ']' at offset {position}")
+
+
+def _parse_object(source: str, position: int):
+    obj = {}
+    while True:
+        kind, text, position = _next_token(source, position)
+        if text == '}':
+            return obj, position
+        if kind == 'string':
+            key = _unquote(text)
+        elif kind in ('name', 'number'):
+            key = text
+        else:
+            raise ValueError(f"Expected a property name at offset {position}")
+
+        kind, text, position = _next_token(source, position)
+        if text != ':':
+            raise ValueError(f"Expected ':' at offset {position}")
+        obj[key], position = _parse_value(source, position)
+
+        kind, text, position = _next_token(source, position)
+        if text == '}':
+            return obj, position
+        if text != ',':
+            raise ValueError(f"Expected ',' or '}}' at offset {position}")
+
+
+def _unquote(text: str) -> str:
+    body = text[1:-1]
+    return re.sub(r'\\(.)', lambda m: _ESCAPES.get(m.group(1), m.group(1)), body, flags=re.S)
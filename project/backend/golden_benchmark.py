@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+Golden SQL workload benchmark.
+
+Runs every expectedQuery in gameData.js (on its zone) and lessonsData.js
+(on the lessons database) through the real grading pipeline. That is the
+Grader with its perturbed variants, followed by JSON serialization of the
+response. Each task is run at several data scales; scale N repeats every
+table's rows N times (see sql_engine.scale_zone_image).
+
+For each task and scale the benchmark records:
+- min, p50, p95 and max latency over --repeats runs
+- the peak Python memory allocated while grading, via tracemalloc
+
+The results are compared with a stored baseline, and the run fails on a
+regression. Two kinds of change count as a regression:
+
+- the summed latency of a whole scale grows by more than --tolerance
+- a single task's latency or memory peak grows by more than
+  --task-tolerance and by more than a small absolute floor
+
+The gate compares the fastest run of each task rather than its median,
+because scheduler noise on a shared machine only ever adds time.
+Individual sub-millisecond tasks are still noisy, so their threshold is
+looser.
+Pass --update-baseline to record a new baseline. Without one, the run
+fails straight away.
+
+Usage: python golden_benchmark.py [--scales 1,10,100] [--repeats 20] [--update-baseline]
+"""
+
+import argparse
+import json
+import statistics
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Dict, List
+
+from content import load_game_content
+from grading import Grader
+from sql_engine import ZonePool, build_zone_images, scale_zone_image
+
+
+DEFAULT_BASELINE = Path(__file__).parent / 'golden_baseline.json'
+
+# Regressions smaller than these are treated as noise
+MIN_LATENCY_DELTA_MS = 0.2
+MIN_MEMORY_DELTA_BYTES = 64 * 1024
+
+
+def golden_tasks(content: dict) -> Dict[str, List[dict]]:
+    """Every task with an expectedQuery, grouped by the zone it runs on."""
+    tasks = {
+        zone: [{'level': task['level'], 'id': f"{zone}-{task['level']}", 'expectedQuery': task['expectedQuery']}
+               for task in zone_tasks]
+        for zone, zone_tasks in content['gameTasks'].items()
+    }
+    lesson_tasks = []
+    for lesson in content['lessons']:
+        for task in lesson['tasks']:
+            lesson_tasks.append({
+                'level': len(lesson_tasks) + 1,
+                'id': f"lesson-{lesson['id']}-{task['id']}",
+                'expectedQuery': task['expectedQuery'],
+            })
+    tasks['lessons'] = lesson_tasks
+    return tasks
+
+
+def run_scale(images: Dict[str, bytes], tasks: Dict[str, List[dict]], scale: int, repeats: int,
+              variant_count: int) -> Dict[str, dict]:
+    pools = {zone: ZonePool(zone, scale_zone_image(images[zone], scale) if scale > 1 else images[zone])
+             for zone in tasks}
+    grader = Grader(tasks, pools, variant_count=variant_count)
+    results = {}
+    try:
+        for zone, zone_tasks in tasks.items():
+            for task in zone_tasks:
+                # One untimed run so first-touch page cache and statement compilation are not counted
+                grader.grade(zone, task['level'], task['expectedQuery'])
+                timings = []
+                for _ in range(repeats):
+                    started_at = time.perf_counter()
+                    response = grader.grade(zone, task['level'], task['expectedQuery'])
+                    json.dumps(response)
+                    timings.append((time.perf_counter() - started_at) * 1000)
+
+                tracemalloc.start()
+                json.dumps(grader.grade(zone, task['level'], task['expectedQuery']))
+                _, memory_peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+
+                timings.sort()
+                results[task['id']] = {
+                    'correct': response['correct'],
+                    'rows': len(response['result'] or []),
+                    'steps': response['steps'],
+                    'min_ms': round(timings[0], 4),
+                    'p50_ms': round(statistics.median(timings), 4),
+                    'p95_ms': round(timings[min(len(timings) - 1, int(len(timings) * 0.95))], 4),
+                    'max_ms': round(timings[-1], 4),
+                    'memory_peak_bytes': memory_peak,
+                }
+    finally:
+        grader.close()
+        for pool in pools.values():
+            pool.close()
+    return results
+
+
+def find_regressions(report: dict, baseline: dict, tolerance: float, task_tolerance: float) -> List[str]:
+    regressions = []
+    for scale, tasks in report['scales'].items():
+        previous_tasks = baseline.get('scales', {}).get(scale, {})
+        shared = [task_id for task_id in tasks if task_id in previous_tasks]
+        total = sum(tasks[task_id]['min_ms'] for task_id in shared)
+        previous_total = sum(previous_tasks[task_id]['min_ms'] for task_id in shared)
+        if shared and total > previous_total * (1 + tolerance):
+            regressions.append(f"x{scale} workload: summed latency {previous_total:.2f}ms -> {total:.2f}ms")
+
+        for task_id, result in tasks.items():
+            previous = previous_tasks.get(task_id)
+            if previous is None:
+                continue
+            if not result['correct'] and previous['correct']:
+                regressions.append(f"x{scale} {task_id}: expected query no longer grades as correct")
+            latency_delta = result['min_ms'] - previous['min_ms']
+            if latency_delta > MIN_LATENCY_DELTA_MS and result['min_ms'] > previous['min_ms'] * (1 + task_tolerance):
+                regressions.append(f"x{scale} {task_id}: latency {previous['min_ms']:.3f}ms -> {result['min_ms']:.3f}ms")
+            memory_delta = result['memory_peak_bytes'] - previous['memory_peak_bytes']
+            if (memory_delta > MIN_MEMORY_DELTA_BYTES
+                    and result['memory_peak_bytes'] > previous['memory_peak_bytes'] * (1 + task_tolerance)):
+                regressions.append(
+                    f"x{scale} {task_id}: memory peak {previous['memory_peak_bytes']} -> {result['memory_peak_bytes']} bytes"
+                )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--scales', default='1,10,100')
+    parser.add_argument('--repeats', type=int, default=20)
+    parser.add_argument('--variants', type=int, default=4, help='perturbed variants per zone, as GRADING_VARIANTS')
+    parser.add_argument('--baseline', type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed growth of a whole scale over baseline')
+    parser.add_argument('--task-tolerance', type=float, default=1.0, help='allowed growth of one task over baseline')
+    parser.add_argument('--update-baseline', action='store_true')
+    parser.add_argument('--out', type=Path, help='also write the full report here')
+    args = parser.parse_args()
+
+    # A gate without a baseline would pass everything, so refuse before spending minutes on the run
+    if not args.update_baseline and not args.baseline.exists():
+        print(f"No baseline at {args.baseline}; run with --update-baseline to create one")
+        sys.exit(1)
+
+    images = build_zone_images()
+    tasks = golden_tasks(load_game_content())
+    report = {'scales': {}}
+    for scale in (int(value) for value in args.scales.split(',')):
+        started_at = time.perf_counter()
+        results = run_scale(images, tasks, scale, args.repeats, args.variants)
+        report['scales'][str(scale)] = results
+        slowest = sorted(results.items(), key=lambda item: item[1]['p50_ms'], reverse=True)[:5]
+        print(f"x{scale}: {len(results)} tasks in {time.perf_counter() - started_at:.1f}s; slowest p50: "
+              + ', '.join(f"{task_id} {result['p50_ms']:.2f}ms" for task_id, result in slowest))
+        incorrect = [task_id for task_id, result in results.items() if not result['correct']]
+        if incorrect:
+            print(f"  not graded correct: {', '.join(incorrect)}")
+
+    if args.out:
+        args.out.write_text(json.dumps(report, indent=2))
+
+    if args.update_baseline:
+        args.baseline.write_text(json.dumps(report, indent=2))
+        print(f"Wrote baseline to {args.baseline}")
+        return
+
+    regressions = find_regressions(report, json.loads(args.baseline.read_text()), args.tolerance,
+                                   args.task_tolerance)
+    if regressions:
+        print(f"{len(regressions)} regressions against {args.baseline}:")
+        for regression in regressions:
+            print(f"  {regression}")
+        sys.exit(1)
+    print(f"No regressions against {args.baseline}")
+
+
+if __name__ == '__main__':
+    main()
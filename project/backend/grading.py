@@ -0,0 +1,230 @@
+"""
+Server-side grading with differential checks.
+
+Each zone only has a handful of seed rows, so a query that hard-codes an
+answer (e.g. `WHERE survivor_id = 3` for "Find the Doctor") returns the same
+rows as the intended one. To catch this, the grader also keeps K perturbed
+variants of every zone. In each variant, the rows of every table are
+permuted across its primary keys with a seed derived from (zone, variant,
+table), so the variants are identical on every run. Each row keeps all of
+its non-key values together, so relationships within a row and foreign-key
+validity survive, while any coincidence between keys and values breaks.
+
+Row order only counts when the reference query sorts its result, that is,
+when it has an ORDER BY outside any parentheses. An ORDER BY inside
+OVER (...), a subquery or an aggregate does not order the rows returned.
+
+Expected results for every task on every variant are computed up front. A
+submission that passes on the real zone data is then run on all variants in
+parallel, so the extra checks cost about one query's latency.
+
+Every pool also compiles the reference queries into each connection's
+statement cache up front. Correct submissions are usually the reference
+query give or take whitespace, so most of them skip parsing and planning.
+"""
+
+import random
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from sql_engine import (
+    QUERY_STEP_BUDGET,
+    ZonePool,
+    compare_results,
+    create_zone_database,
+    count_vm_steps,
+    execute_user_query,
+    statement_cache_stats,
+    to_js_string,
+)
+from result_diff import diff_results, summarize_diff
+
+
+ORDER_BY_PATTERN = re.compile(r'\bORDER\s+BY\b', re.I)
+
+# String literals, quoted identifiers and comments, which may contain anything
+SQL_QUOTED_PATTERN = re.compile(r"'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"|`[^`]*`|\[[^\]]*\]|--[^\n]*|/\*.*?\*/", re.S)
+
+
+class UnknownTaskError(LookupError):
+    """Raised by Grader.grade for a zone or level that has no task."""
+
+
+def sorts_result(query: str) -> bool:
+    """Whether a query orders the rows it returns: an ORDER BY outside every parenthesis."""
+    text = SQL_QUOTED_PATTERN.sub(' ', query)
+    depth = 0
+    top_level = []
+    for char in text:
+        if char == '(':
+            depth += 1
+        elif char == ')':
+            depth = max(depth - 1, 0)
+        elif depth == 0:
+            top_level.append(char)
+            continue
+        top_level.append(' ')
+    return bool(ORDER_BY_PATTERN.search(''.join(top_level)))
+
+
+def perturb_zone_image(image: bytes, seed: str) -> bytes:
+    """Return a copy of a zone image with every table's rows permuted across its primary keys."""
+    conn = create_zone_database(image)
+    try:
+        tables = [row[0] for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%' ORDER BY name"
+        )]
+        conn.execute("BEGIN")
+        for table in tables:
+            columns = conn.execute(f'PRAGMA table_info("{table}")').fetchall()
+            keys = [column for _, column, _, _, _, is_primary_key in columns if is_primary_key]
+            values = [column for _, column, _, _, _, is_primary_key in columns if not is_primary_key]
+            if not values:
+                continue
+            column_list = ', '.join(f'"{column}"' for column in [*keys, *values])
+            rows = conn.execute(f'SELECT rowid, {column_list} FROM "{table}" ORDER BY rowid').fetchall()
+            key_count = 1 + len(keys)
+            permuted = [row[key_count:] for row in rows]
+            random.Random(f"{seed}:{table}").shuffle(permuted)
+            # Reinsert rather than update in place, so a UNIQUE column never holds a value twice midway
+            conn.execute(f'DELETE FROM "{table}"')
+            conn.executemany(
+                f'INSERT INTO "{table}" (rowid, {column_list}) VALUES ({", ".join(["?"] * (1 + len(columns)))})',
+                [row[:key_count] + row_values for row, row_values in zip(rows, permuted)],
+            )
+        conn.execute("COMMIT")
+        return conn.serialize()
+    finally:
+        conn.close()
+
+
+class ZoneVariants:
+    """The real zone pool plus K perturbed pools and their expected results."""
+
+    def __init__(self, pool: ZonePool, tasks: List[dict], variant_count: int, pool_size: int = 2):
+        self.pool = pool
+        self.variant_pools = [
+            ZonePool(pool.zone, perturb_zone_image(pool.image, f"{pool.zone}:{k}"), pool_size)
+            for k in range(variant_count)
+        ]
+        reference_queries = [task['expectedQuery'] for task in tasks]
+        for warm_pool in [self.pool, *self.variant_pools]:
+            warm_pool.warm(reference_queries)
+
+        self.expected: Dict[int, List[Optional[list]]] = {}
+        for task in tasks:
+            self.expected[task['level']] = [
+                _run(pool, task['expectedQuery'])['result']
+                for pool in [self.pool, *self.variant_pools]
+            ]
+
+    def close(self):
+        for pool in self.variant_pools:
+            pool.close()
+
+
+class Grader:
+    def __init__(
+        self,
+        tasks: Dict[str, List[dict]],
+        pools: Dict[str, ZonePool],
+        variant_count: int = 4,
+        max_workers: Optional[int] = None,
+    ):
+        self.tasks = tasks
+        self.variant_count = variant_count
+        self.zones = {
+            zone: ZoneVariants(pools[zone], zone_tasks, variant_count)
+            for zone, zone_tasks in tasks.items()
+        }
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers or max(variant_count, 1) * 4,
+            thread_name_prefix='grader',
+        )
+
+    def grade(self, zone: str, level: int, query: str) -> dict:
+        """Grade a submission and return {success, correct, result, error, steps}.
+
+        `steps` is the SQLite VM work the submission cost across all variants.
+        Wrong answers on the real zone data also carry a `diff` (see result_diff).
+        Raises UnknownTaskError when the zone has no such level.
+        """
+        variants = self.zones.get(zone)
+        if variants is None or level not in variants.expected:
+            raise UnknownTaskError(f"Unknown task: {zone} {level}")
+
+        expected = variants.expected[level]
+        user_result = _run(variants.pool, query)
+        steps = user_result['steps']
+        if not user_result['success']:
+            return {**user_result, 'correct': False}
+
+        if expected[0] is None:
+            return {'success': True, 'correct': False, 'result': user_result['result'],
+                    'error': 'Unable to validate result', 'steps': steps}
+
+        correct = compare_results(user_result['result'], expected[0])
+        if correct and variants.variant_pools:
+            ordered = sorts_result(self.tasks[zone][level - 1]['expectedQuery'])
+            checks = [
+                self._executor.submit(_passes, pool, query, expected[k + 1], ordered)
+                for k, pool in enumerate(variants.variant_pools)
+            ]
+            outcomes = [check.result() for check in checks]
+            steps += sum(variant_steps for _, variant_steps in outcomes)
+            if not all(passed for passed, _ in outcomes):
+                return {
+                    'success': True,
+                    'correct': False,
+                    'result': user_result['result'],
+                    'error': 'Your query only matches this exact data. '
+                             'Filter on the columns the task describes instead of hard-coded values.',
+                    'steps': steps,
+                }
+
+        if not correct:
+            diff = diff_results(user_result['result'], expected[0])
+            return {'success': True, 'correct': False, 'result': user_result['result'],
+                    'error': summarize_diff(diff), 'diff': diff, 'steps': steps}
+
+        return {'success': True, 'correct': True, 'result': user_result['result'], 'error': None, 'steps': steps}
+
+    def statement_stats(self) -> dict:
+        """Prepared-statement cache counters per zone, for the real zone pool and its variants."""
+        return {
+            zone: {
+                'zone': variants.pool.statement_stats(),
+                'variants': statement_cache_stats(variants.variant_pools),
+            }
+            for zone, variants in self.zones.items()
+        }
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+        for variants in self.zones.values():
+            variants.close()
+
+
+def _run(pool: ZonePool, query: str) -> dict:
+    with pool.connection() as conn, count_vm_steps(conn, budget=QUERY_STEP_BUDGET) as counter:
+        result = execute_user_query(query, conn)
+    result['steps'] = counter.steps
+    return result
+
+
+def _passes(pool: ZonePool, query: str, expected: Optional[list], ordered: bool) -> Tuple[bool, int]:
+    """Check a submission on one variant. Row order only counts when the task sorts.
+
+    Returns (passed, VM steps used).
+    """
+    result = _run(pool, query)
+    if not result['success'] or expected is None:
+        return False, result['steps']
+    if ordered:
+        return compare_results(result['result'], expected), result['steps']
+    return compare_results(_sorted_rows(result['result']), _sorted_rows(expected)), result['steps']
+
+
+def _sorted_rows(rows: list) -> list:
+    return sorted(rows, key=lambda row: sorted((key, to_js_string(value)) for key, value in row.items()))
@@ -0,0 +1,216 @@
+"""
+Index-tuning challenges.
+
+The zones have no secondary indexes and only a handful of rows, so the
+optimizer tips in queryOptimizer.js can't be tried out on them. Each
+challenge here pairs a target query with a scaled copy of its zone, where
+every table's rows are repeated `scale` times (see scale_zone_image).
+
+An attempt is a short list of CREATE INDEX statements. They run in a
+private copy of the scaled zone, followed by ANALYZE, and then the target
+query is measured again. The player is scored on:
+
+- the real speedup, in VM steps, over the unindexed baseline. Points are
+  logarithmic: 100 per 10x.
+- minus a charge for the space the indexes take, relative to the database
+- minus a charge for the work of building them, counted in multiples of
+  the baseline query
+
+Every measurement is in VM steps rather than wall time, so scores are
+the same on every machine. The query plans before and after are returned
+too, so players can see which index the planner picked.
+"""
+
+import math
+import re
+import sqlite3
+import threading
+import time
+from typing import Dict, List
+
+from sql_engine import (
+    QUERY_STEP_BUDGET,
+    QUERY_TOO_EXPENSIVE,
+    SANDBOX,
+    count_vm_steps,
+    create_zone_database,
+    database_size,
+    scale_zone_image,
+)
+
+
+CREATE_INDEX_PATTERN = re.compile(r'^\s*CREATE\s+(UNIQUE\s+)?INDEX\s', re.I)
+MAX_STATEMENTS = 3
+
+# Longest value an index expression may produce. Zone values are under 100
+# bytes, and at 1 KB an index over the largest scaled table stays near 15 MB.
+MAX_INDEX_VALUE_LENGTH = 1024
+
+# Fine enough to tell an index seek from a scan of a few thousand rows
+STEP_GRANULARITY = 10
+
+SPEEDUP_POINTS = 100
+MAX_SPEEDUP = 1000
+SIZE_POINTS = 100
+BUILD_POINTS_PER_QUERY = 5
+
+
+class IndexChallenge:
+    def __init__(self, challenge_id: str, zone: str, title: str, description: str, query: str, scale: int = 2000):
+        self.id = challenge_id
+        self.zone = zone
+        self.title = title
+        self.description = description
+        self.query = query
+        self.scale = scale
+
+    def describe(self) -> dict:
+        return {
+            'id': self.id,
+            'zone': self.zone,
+            'title': self.title,
+            'description': self.description,
+            'query': self.query,
+            'scale': self.scale,
+        }
+
+
+CHALLENGES = {challenge.id: challenge for challenge in [
+    IndexChallenge(
+        'logbook-by-author', 'beach', "One survivor's logbook",
+        "Fetch one author's entries in date order without reading every entry.",
+        "SELECT entry_date, log_text FROM logbook_entries WHERE author_id = 1 ORDER BY entry_date, entry_id",
+    ),
+    IndexChallenge(
+        'medical-supplies', 'beach', "Running low on medicine",
+        "Medical supplies are one category in seven. Filter on both conditions with one index.",
+        "SELECT item_name, quantity FROM crashed_supplies WHERE category = 'Medical' AND quantity < 20",
+    ),
+    IndexChallenge(
+        'edible-finds', 'jungle', "What did Lina find?",
+        "The join looks up a survivor by key, but the flora side is scanned.",
+        "SELECT f.plant_name FROM island_flora f JOIN survivors s ON s.survivor_id = f.discovered_by "
+        "WHERE s.survivor_id = 4 AND f.is_edible = 1",
+    ),
+    IndexChallenge(
+        'relic-glyphs', 'ruins', "Glyphs on the Harvest Totem",
+        "Find every glyph carved on one relic.",
+        "SELECT r.relic_name, g.glyph_symbol, g.meaning FROM ancient_relics r "
+        "JOIN glyph_translations g ON g.found_on_relic_id = r.relic_id WHERE r.relic_id = 602",
+    ),
+    IndexChallenge(
+        'latest-pending-orders', 'lessons', "Newest pending orders",
+        "Filter and sort with one index so the query can stop after ten rows instead of sorting them all.",
+        "SELECT order_id, order_date, total_amount FROM orders WHERE status = 'Pending' "
+        "ORDER BY order_date DESC, order_id DESC LIMIT 10",
+    ),
+    IndexChallenge(
+        'email-domain', 'lessons', "Customers by email domain",
+        "LIKE patterns starting with % cannot use an index. Is any index worth building here?",
+        "SELECT name FROM customers WHERE email LIKE '%@email.com'",
+    ),
+]}
+
+
+def query_plan(conn, query: str) -> List[str]:
+    return [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {query}")]
+
+
+def measure_query(conn, query: str) -> dict:
+    with count_vm_steps(conn, STEP_GRANULARITY) as counter:
+        rows = conn.execute(query).fetchall()
+    return {'steps': counter.steps, 'rows': len(rows), 'plan': query_plan(conn, query)}
+
+
+def score_attempt(baseline_steps: int, steps: int, index_bytes: int, database_bytes: int, build_steps: int) -> dict:
+    speedup = baseline_steps / max(steps, STEP_GRANULARITY)
+    speedup_points = SPEEDUP_POINTS * math.log10(min(max(speedup, 1.0), MAX_SPEEDUP))
+    size_points = SIZE_POINTS * index_bytes / database_bytes
+    build_points = BUILD_POINTS_PER_QUERY * build_steps / max(baseline_steps, STEP_GRANULARITY)
+    return {
+        'speedup': round(speedup, 2),
+        'speedup_points': round(speedup_points, 1),
+        'size_penalty': round(size_points, 1),
+        'build_penalty': round(build_points, 1),
+        'score': max(0, round(speedup_points - size_points - build_points)),
+    }
+
+
+class IndexChallengeLab:
+    """Scaled zone images and baselines for each challenge, built on first use."""
+
+    def __init__(self, zone_images: Dict[str, bytes], challenges: Dict[str, IndexChallenge] = CHALLENGES):
+        self.zone_images = zone_images
+        self.challenges = challenges
+        self._images: Dict[str, bytes] = {}
+        self._baselines: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+
+    def _prepare(self, challenge: IndexChallenge):
+        with self._lock:
+            if challenge.id not in self._baselines:
+                image = scale_zone_image(self.zone_images[challenge.zone], challenge.scale)
+                conn = create_zone_database(image)
+                try:
+                    conn.execute("ANALYZE")
+                    image = conn.serialize()
+                    baseline = {**measure_query(conn, challenge.query), 'database_bytes': database_size(conn)}
+                finally:
+                    conn.close()
+                self._images[challenge.id] = image
+                self._baselines[challenge.id] = baseline
+        return self._images[challenge.id], self._baselines[challenge.id]
+
+    def baseline(self, challenge_id: str) -> dict:
+        challenge = self.challenges[challenge_id]
+        _, baseline = self._prepare(challenge)
+        return {**challenge.describe(), 'baseline': baseline}
+
+    def attempt(self, challenge_id: str, statements: List[str]) -> dict:
+        """Build the indexes in a private copy of the scaled zone and score the target query.
+
+        Raises KeyError for an unknown challenge and ValueError for statements
+        that are not a single CREATE INDEX, that SQLite rejects, or that run
+        past the step budget.
+        """
+        challenge = self.challenges[challenge_id]
+        if len(statements) > MAX_STATEMENTS:
+            raise ValueError(f"At most {MAX_STATEMENTS} CREATE INDEX statements per attempt")
+        for statement in statements:
+            if not CREATE_INDEX_PATTERN.match(statement):
+                raise ValueError(f"Only CREATE INDEX statements are allowed: {statement[:80]!r}")
+
+        image, baseline = self._prepare(challenge)
+        conn = create_zone_database(image)
+        try:
+            size_before = database_size(conn)
+            started_at = time.perf_counter()
+            # Player statements get the same authorizer and step budget as sandbox queries, and a
+            # value cap small enough that an expression index over every scaled row stays small
+            conn.restrict(SANDBOX, max_value_length=MAX_INDEX_VALUE_LENGTH)
+            with count_vm_steps(conn, STEP_GRANULARITY, budget=QUERY_STEP_BUDGET) as build:
+                for statement in statements:
+                    try:
+                        conn.execute(statement)
+                    except (sqlite3.Error, sqlite3.Warning) as error:
+                        if build.exhausted:
+                            raise ValueError(QUERY_TOO_EXPENSIVE)
+                        raise ValueError(f"{statement[:80]!r}: {error}")
+            conn.restrict(None)
+            build_ms = (time.perf_counter() - started_at) * 1000
+            index_bytes = database_size(conn) - size_before
+            # Statistics for the new indexes, so the planner can weigh them
+            conn.execute("ANALYZE")
+            result = measure_query(conn, challenge.query)
+        finally:
+            conn.close()
+
+        return {
+            'challenge': challenge.id,
+            'baseline': baseline,
+            'result': result,
+            'index_bytes': index_bytes,
+            'build_steps': build.steps,
+            'build_ms': round(build_ms, 2),
+            **score_attempt(baseline['steps'], result['steps'], index_bytes, baseline['database_bytes'], build.steps),
+        }
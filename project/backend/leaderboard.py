@@ -0,0 +1,215 @@
+"""
+Global XP leaderboard.
+
+Ranks are answered from memory. A Fenwick tree counts players per score
+bucket, indexed from the highest score down, so "how many players are
+ahead of me" is a prefix sum and "who is at rank k" is a binary descent
+over the tree. Both are O(log MAX_SCORE). Players with equal scores share
+a rank and are listed by player_id inside their bucket. Each bucket is a
+SortedList, so moving a player between buckets and finding a position in
+one are O(log n) even when thousands of players are tied.
+
+Scores only move up: an update lower than the stored score is ignored, so
+a stale device cannot push a player down. Updates change the tree in place
+and are persisted to the `leaderboard` collection in batches of `$max`
+upserts. After startup the tree is rebuilt from that collection in one
+pass, in the background. Updates that arrive meanwhile are kept and merged
+into the loaded scores, and `loaded` turns True once the ranking is complete.
+"""
+
+import logging
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from pymongo import UpdateOne
+from sortedcontainers import SortedList
+
+from analytics import PeriodicFlusher
+from progress import TOTAL_LEVELS
+
+
+logger = logging.getLogger(__name__)
+
+# Highest trackable score. Completing all 50 levels first try is worth 7000.
+MAX_SCORE = 1 << 16
+
+
+class FenwickTree:
+    def __init__(self, size: int):
+        self.size = size
+        self.tree = [0] * (size + 1)
+        self.step = 1 << (size.bit_length() - 1)
+
+    @classmethod
+    def from_counts(cls, counts: List[int]) -> 'FenwickTree':
+        """Build from per-position counts (position 1 first) in O(n)."""
+        fenwick = cls(len(counts))
+        tree = fenwick.tree
+        tree[1:] = counts
+        for index in range(1, fenwick.size + 1):
+            parent = index + (index & -index)
+            if parent <= fenwick.size:
+                tree[parent] += tree[index]
+        return fenwick
+
+    def add(self, index: int, delta: int):
+        while index <= self.size:
+            self.tree[index] += delta
+            index += index & -index
+
+    def prefix_sum(self, index: int) -> int:
+        total = 0
+        while index > 0:
+            total += self.tree[index]
+            index -= index & -index
+        return total
+
+    def find(self, k: int) -> int:
+        """Smallest index whose prefix sum is at least k (1-based k)."""
+        position = 0
+        step = self.step
+        while step:
+            candidate = position + step
+            if candidate <= self.size and self.tree[candidate] < k:
+                position = candidate
+                k -= self.tree[candidate]
+            step >>= 1
+        return position + 1
+
+
+class Leaderboard(PeriodicFlusher):
+    def __init__(self, collection, max_score: int = MAX_SCORE, flush_interval: float = 1.0):
+        super().__init__(flush_interval)
+        self.collection = collection
+        self.max_score = max_score
+        self.fenwick = FenwickTree(max_score + 1)
+        self.scores: Dict[str, int] = {}
+        self.levels_completed: Dict[str, int] = {}
+        self._buckets: Dict[int, SortedList] = {}
+        self._pending: Dict[str, dict] = {}
+        self.loaded = False
+
+    def _index(self, score: int) -> int:
+        # Highest score first, so prefix sums count the players ahead
+        return self.max_score - score + 1
+
+    async def load(self):
+        """Rebuild the in-memory structure from the persisted scores, keeping any newer updates."""
+        scores: Dict[str, int] = {}
+        levels_completed: Dict[str, int] = {}
+        async for document in self.collection.find({}, {'score': 1, 'levelsCompleted': 1}):
+            scores[document['_id']] = min(int(document['score']), self.max_score)
+            levels_completed[document['_id']] = document.get('levelsCompleted', 0)
+
+        # No awaits from here on, so no update can slip in between the merge and the rebuild
+        for player_id, score in self.scores.items():
+            scores[player_id] = max(scores.get(player_id, 0), score)
+        for player_id, levels in self.levels_completed.items():
+            levels_completed[player_id] = max(levels_completed.get(player_id, 0), levels)
+
+        counts = [0] * (self.max_score + 1)
+        buckets: Dict[int, List[str]] = {}
+        for player_id, score in scores.items():
+            buckets.setdefault(score, []).append(player_id)
+            counts[self._index(score) - 1] += 1
+        self.scores = scores
+        self.levels_completed = levels_completed
+        self._buckets = {score: SortedList(player_ids) for score, player_ids in buckets.items()}
+        self.fenwick = FenwickTree.from_counts(counts)
+        self.loaded = True
+
+    def update(self, player_id: str, score: int, levels_completed: int = 0) -> dict:
+        """Raise a player's score. Returns their entry after the update."""
+        score = max(0, min(int(score), self.max_score))
+        levels_completed = max(0, min(int(levels_completed), TOTAL_LEVELS))
+        current = self.scores.get(player_id)
+        if current is None or score > current:
+            if current is not None:
+                bucket = self._buckets[current]
+                bucket.remove(player_id)
+                if not bucket:
+                    del self._buckets[current]
+                self.fenwick.add(self._index(current), -1)
+            bucket = self._buckets.get(score)
+            if bucket is None:
+                bucket = self._buckets[score] = SortedList()
+            bucket.add(player_id)
+            self.fenwick.add(self._index(score), 1)
+            self.scores[player_id] = score
+        self.levels_completed[player_id] = max(self.levels_completed.get(player_id, 0), levels_completed)
+
+        self._pending[player_id] = {
+            'score': self.scores[player_id],
+            'levelsCompleted': self.levels_completed[player_id],
+        }
+        return self.entry(player_id)
+
+    def rank(self, player_id: str) -> Optional[int]:
+        score = self.scores.get(player_id)
+        if score is None:
+            return None
+        return self.fenwick.prefix_sum(self._index(score) - 1) + 1
+
+    def entry(self, player_id: str) -> Optional[dict]:
+        if player_id not in self.scores:
+            return None
+        return {
+            'rank': self.rank(player_id),
+            'player_id': player_id,
+            'score': self.scores[player_id],
+            'levels_completed': self.levels_completed.get(player_id, 0),
+        }
+
+    def __len__(self) -> int:
+        return len(self.scores)
+
+    def page(self, offset: int, limit: int) -> List[dict]:
+        """Entries at positions offset..offset+limit-1 of the ranking."""
+        entries = []
+        position = offset + 1
+        while len(entries) < limit and position <= len(self.scores):
+            index = self.fenwick.find(position)
+            ahead = self.fenwick.prefix_sum(index - 1)
+            bucket = self._buckets[self.max_score - index + 1]
+            start = position - ahead - 1
+            for player_id in bucket.islice(start, start + limit - len(entries)):
+                entries.append({
+                    'rank': ahead + 1,
+                    'player_id': player_id,
+                    'score': self.scores[player_id],
+                    'levels_completed': self.levels_completed.get(player_id, 0),
+                })
+            position = offset + len(entries) + 1
+        return entries
+
+    def around(self, player_id: str, radius: int) -> List[dict]:
+        score = self.scores.get(player_id)
+        if score is None:
+            return []
+        ahead = self.fenwick.prefix_sum(self._index(score) - 1)
+        position = ahead + self._buckets[score].index(player_id)
+        start = max(0, position - radius)
+        return self.page(start, position + radius + 1 - start)
+
+    async def flush(self):
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, {}
+        now = datetime.utcnow()
+        operations = [
+            UpdateOne(
+                {'_id': player_id},
+                {
+                    '$max': {'score': fields['score'], 'levelsCompleted': fields['levelsCompleted']},
+                    '$set': {'updatedAt': now},
+                },
+                upsert=True,
+            )
+            for player_id, fields in pending.items()
+        ]
+        try:
+            await self.collection.bulk_write(operations, ordered=False)
+        except Exception:
+            logger.exception("Leaderboard flush failed; keeping %d players for retry", len(pending))
+            for player_id, fields in pending.items():
+                self._pending.setdefault(player_id, fields)
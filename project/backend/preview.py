@@ -0,0 +1,133 @@
+"""
+Live query preview over a WebSocket.
+
+The client streams every edit to the editor. Each new edit replaces the
+pending one, so there is at most one scheduled run and at most one running
+execution per channel. A player typing fast never queues stale work: a
+pending run is cancelled during its debounce window, and a running one is
+stopped with sqlite3.Connection.interrupt().
+
+Messages are JSON objects, {"query": "<sql>", "seq": <any>}. A message
+that is not one gets an error frame back, and the socket stays open. The
+VM steps of every execution, finished or interrupted, are reported to
+on_steps so the caller can charge them to a rate limit.
+"""
+
+import asyncio
+import json
+import sqlite3
+import threading
+from typing import Awaitable, Callable, Optional, Tuple
+
+from sql_engine import create_zone_database
+
+
+PROGRESS_INTERVAL = 1000
+
+
+class PreviewChannel:
+    def __init__(
+        self,
+        image: bytes,
+        send: Callable[[dict], Awaitable[None]],
+        debounce: float = 0.25,
+        max_rows: int = 20,
+        step_limit: int = 5_000_000,
+        on_steps: Optional[Callable[[int], Awaitable[None]]] = None,
+    ):
+        self.conn = create_zone_database(image, read_only=True)
+        self.send = send
+        self.on_steps = on_steps
+        self.debounce = debounce
+        self.max_rows = max_rows
+        self.step_limit = step_limit
+
+        self._pending: Optional[asyncio.Task] = None
+        self._generation = 0
+        self._execute_lock = threading.Lock()
+
+    async def handle(self, text) -> None:
+        """Submit one client message, or answer it with an error frame if it is malformed."""
+        try:
+            message = json.loads(text)
+        except (TypeError, ValueError):
+            await self.reject(None, 'Message is not valid JSON')
+            return
+        if not isinstance(message, dict):
+            await self.reject(None, 'Message must be a JSON object')
+            return
+        query = message.get('query', '')
+        if not isinstance(query, str):
+            await self.reject(message.get('seq'), 'query must be a string')
+            return
+        self.submit(query, message.get('seq'))
+
+    async def reject(self, seq, error: str):
+        """Send an error frame without running anything."""
+        await self.send({'seq': seq, 'success': False, 'result': None, 'truncated': False, 'error': error})
+
+    def submit(self, query: str, seq=None):
+        """Replace whatever is pending or running with a preview of this query."""
+        self._generation += 1
+        if self._pending is not None and not self._pending.done():
+            self._pending.cancel()
+        self.conn.interrupt()
+
+        if query.strip():
+            self._pending = asyncio.create_task(self._run(query, seq, self._generation))
+
+    async def close(self):
+        self._generation += 1
+        if self._pending is not None and not self._pending.done():
+            self._pending.cancel()
+        self.conn.interrupt()
+        # A running execution holds the lock until the interrupt lands; wait for it off the event loop
+        await asyncio.to_thread(self._close_connection)
+
+    def _close_connection(self):
+        with self._execute_lock:
+            self.conn.close()
+
+    async def _run(self, query: str, seq, generation: int):
+        await asyncio.sleep(self.debounce)
+        preview, steps = await asyncio.to_thread(self._execute, query, generation)
+        if steps and self.on_steps is not None:
+            await self.on_steps(steps)
+        if preview is not None and generation == self._generation:
+            await self.send({'seq': seq, **preview})
+
+    def _execute(self, query: str, generation: int) -> Tuple[Optional[dict], int]:
+        """Returns (preview, VM steps run); the preview is None when a newer edit superseded it."""
+        with self._execute_lock:
+            if generation != self._generation:
+                return None, 0
+
+            steps = 0
+
+            def check_progress():
+                nonlocal steps
+                steps += PROGRESS_INTERVAL
+                return generation != self._generation or steps > self.step_limit
+
+            self.conn.set_progress_handler(check_progress, PROGRESS_INTERVAL)
+            try:
+                cursor = self.conn.execute(query.strip())
+                if cursor.description is None:
+                    return {'success': True, 'result': [], 'truncated': False, 'error': None}, steps
+                columns = [column[0] for column in cursor.description]
+                rows = cursor.fetchmany(self.max_rows + 1)
+                return {
+                    'success': True,
+                    'result': [dict(zip(columns, row)) for row in rows[:self.max_rows]],
+                    'truncated': len(rows) > self.max_rows,
+                    'error': None,
+                }, steps
+            except (sqlite3.Error, sqlite3.Warning) as error:
+                if generation != self._generation:
+                    return None, steps
+                message = str(error)
+                if message == 'interrupted':
+                    message = 'Query took too long to preview'
+                return {'success': False, 'result': None, 'truncated': False, 'error': message}, steps
+            finally:
+                self.conn.set_progress_handler(None, PROGRESS_INTERVAL)
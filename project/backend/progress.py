@@ -0,0 +1,388 @@
+"""
+Server-side player progress schema.
+
+Mirrors the `progress` block of GameContext.getDefaultGameState. Each player
+has one document in the `progress` collection:
+
+    {
+        "_id": "<player_id>",
+        "levels": {
+            "beach-1": {"status": 3, "attempts": 2, "completedAt": <datetime>, "bestTime": 41.5},
+            ...
+        },
+        "updatedAt": <datetime>
+    }
+
+Statuses are stored as ranks so that merges can take the maximum: a level
+only ever moves forward from locked to active to skipped to completed.
+
+The levels map is stored bit-packed in a `packed` binary field rather than
+as the map shown above (see encode_levels). With the device versions packed
+as well, a finished profile's document is more than ten times smaller.
+Documents written before it still carry `levels`, and document_levels reads
+either form. Clients can fetch the same encoding as
+base64url text, and frontend/src/utils/progressCodec.js reads and writes
+it as well.
+
+Devices sync batches of deltas accumulated offline. Each delta carries the
+device's own change counter for that level, and the server records the
+highest counter applied per device and level under `devices`, one packed
+version vector per device (see encode_versions). A replayed delta is
+therefore skipped. Every other delta merges monotonically: max
+status, summed attempts, min bestTime and min completedAt. A sync is read
+once and written back as one conditional update guarded by `revision`, and
+retried if another device wrote in between.
+"""
+
+import base64
+import math
+import re
+from datetime import datetime, timezone
+from itertools import accumulate
+from typing import Dict, List, Optional, Tuple
+
+from pymongo.errors import DuplicateKeyError
+
+
+ZONE_LEVEL_COUNTS = {
+    'beach': 15,
+    'jungle': 20,
+    'ruins': 15,
+}
+
+ZONES = list(ZONE_LEVEL_COUNTS)
+
+STATUS_RANKS = {
+    'locked': 0,
+    'active': 1,
+    'skipped': 2,
+    'completed': 3,
+}
+
+STATUS_NAMES = {rank: status for status, rank in STATUS_RANKS.items()}
+
+TOTAL_LEVELS = sum(ZONE_LEVEL_COUNTS.values())
+
+# Offset of each zone's first level in the flat 0..TOTAL_LEVELS-1 numbering
+ZONE_OFFSETS: Dict[str, int] = dict(zip(ZONES, accumulate([0, *ZONE_LEVEL_COUNTS.values()])))
+
+
+PACKED_FORMAT_VERSION = 1
+
+# Device ids become part of a field path under `devices`, so no dots or dollar signs
+DEVICE_ID_PATTERN = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+
+
+def level_key(zone: str, level: int) -> str:
+    return f"{zone}-{level}"
+
+
+FLAT_LEVEL_KEYS: List[str] = [
+    level_key(zone, level) for zone, count in ZONE_LEVEL_COUNTS.items() for level in range(1, count + 1)
+]
+
+
+def parse_level_key(key: str) -> Tuple[str, int]:
+    zone, level = key.rsplit('-', 1)
+    return zone, int(level)
+
+
+def flat_level_index(zone: str, level: int) -> int:
+    """Position of a level in the flat numbering used by analytics arrays."""
+    return ZONE_OFFSETS[zone] + level - 1
+
+
+def flat_level_labels() -> List[str]:
+    return list(FLAT_LEVEL_KEYS)
+
+
+class LevelDelta:
+    __slots__ = ('key', 'version', 'status', 'attempts', 'best_time', 'completed_at')
+
+    def __init__(self, zone: str, level: int, version: int, status: Optional[str] = None, attempts: int = 0,
+                 best_time: Optional[float] = None, completed_at: Optional[datetime] = None):
+        if zone not in ZONE_LEVEL_COUNTS or not 1 <= level <= ZONE_LEVEL_COUNTS[zone]:
+            raise ValueError(f"Unknown level: {zone} {level}")
+        if status is not None and status not in STATUS_RANKS:
+            raise ValueError(f"Unknown status: {status}")
+        if version < 1:
+            raise ValueError("version must be a positive change counter")
+        if attempts < 0:
+            raise ValueError("attempts must be a non-negative increment")
+        if best_time is not None and not (math.isfinite(best_time) and best_time >= 0):
+            raise ValueError("best_time must be a non-negative number of seconds")
+        self.key = level_key(zone, level)
+        self.version = version
+        self.status = status
+        self.attempts = attempts
+        self.best_time = best_time
+        # Stored datetimes are naive UTC, as pymongo and decode_levels return them
+        if completed_at is not None and completed_at.tzinfo is not None:
+            completed_at = completed_at.astimezone(timezone.utc).replace(tzinfo=None)
+        self.completed_at = completed_at
+
+
+def merge_deltas(document: dict, device_id: str, deltas: List[LevelDelta]) -> Tuple[dict, Dict[str, dict]]:
+    """Fold deltas into a progress document. Returns (update, merged levels touched)."""
+    if not DEVICE_ID_PATTERN.match(device_id):
+        raise ValueError(f"Invalid device id: {device_id!r}")
+    levels = document_levels(document)
+    applied = document_versions(document, device_id)
+    merged: Dict[str, dict] = {}
+    versions: Dict[str, int] = {}
+
+    for delta in sorted(deltas, key=lambda delta: delta.version):
+        if delta.version <= max(applied.get(delta.key, 0), versions.get(delta.key, 0)):
+            continue
+        record = merged.setdefault(delta.key, dict(levels.get(delta.key, {'status': 0, 'attempts': 0})))
+        if delta.status is not None:
+            record['status'] = max(record.get('status', 0), STATUS_RANKS[delta.status])
+        record['attempts'] = record.get('attempts', 0) + delta.attempts
+        if delta.best_time is not None:
+            record['bestTime'] = min(_present(record.get('bestTime'), delta.best_time))
+        if delta.completed_at is not None:
+            record['completedAt'] = min(_present(record.get('completedAt'), delta.completed_at))
+        versions[delta.key] = delta.version
+
+    update = {'$set': {'packed': encode_levels({**levels, **merged})}}
+    if versions:
+        update['$set'][f"devices.{device_id}"] = encode_versions({**applied, **versions})
+    update['$set']['updatedAt'] = datetime.utcnow()
+    update['$inc'] = {'revision': 1}
+    update['$unset'] = {'levels': ''}
+    return update, merged
+
+
+async def sync_progress(collection, player_id: str, device_id: str, deltas: List[LevelDelta], retries: int = 5,
+                        packed: bool = False) -> dict:
+    """Apply a batch of offline deltas with one conditional write. Returns the player's full progress."""
+    for _ in range(retries):
+        document = await collection.find_one({'_id': player_id}) or {'_id': player_id, 'revision': 0}
+        update, merged = merge_deltas(document, device_id, deltas)
+        if not merged:
+            return serialize_progress(document, packed)
+
+        revision = document.get('revision', 0)
+        guard = {'_id': player_id, 'revision': revision} if revision else {'_id': player_id, 'revision': {'$exists': False}}
+        try:
+            result = await collection.update_one(guard, update, upsert=not revision)
+        except DuplicateKeyError:
+            # Another device created the document first
+            continue
+        if result.matched_count or result.upserted_id is not None:
+            document.pop('levels', None)
+            document['packed'] = update['$set']['packed']
+            document['updatedAt'] = update['$set']['updatedAt']
+            return serialize_progress(document, packed)
+    raise RuntimeError("Progress sync kept conflicting with concurrent writes")
+
+
+def serialize_progress(document: dict, packed: bool = False) -> dict:
+    """Client-facing progress, with status names instead of ranks, or as packed base64url text."""
+    if packed:
+        return {'packed': pack_progress(document_levels(document)), 'updatedAt': document.get('updatedAt')}
+    return {
+        'levels': {
+            key: {**record, 'status': STATUS_NAMES[record.get('status', 0)]}
+            for key, record in document_levels(document).items()
+        },
+        'updatedAt': document.get('updatedAt'),
+    }
+
+
+def document_versions(document: dict, device_id: str) -> Dict[str, int]:
+    """The change counters applied from one device, packed or in the older per-level map."""
+    versions = document.get('devices', {}).get(device_id, {})
+    if isinstance(versions, dict):
+        return versions
+    return decode_versions(versions)
+
+
+def document_levels(document: dict) -> Dict[str, dict]:
+    """The levels map of a progress document, packed or not."""
+    if 'packed' in document:
+        return decode_levels(document['packed'])
+    return document.get('levels', {})
+
+
+# Packed format, version 1. Levels are in FLAT_LEVEL_KEYS order:
+#
+#   byte       format version
+#   varint     level count N
+#   ceil(N/4)  status rank, 2 bits per level: level i is in byte i // 4 at bit 2 * (i % 4)
+#   ceil(N/8)  bitmap of levels with attempts > 0, then one varint per set bit
+#   ceil(N/8)  bitmap of levels with a bestTime, then one varint per set bit, in tenths of a second
+#   ceil(N/8)  bitmap of levels with a completedAt, then one zigzag varint per set bit: whole
+#              seconds since the previous set level's completedAt (the first since the epoch)
+#
+# Players mostly finish levels in order, so completion deltas are small and
+# take one to three bytes each.
+#
+# Every value must be a non-negative int that fits its field. encode_levels
+# raises ValueError otherwise, and decode_levels raises ValueError for
+# truncated or malformed input.
+
+def encode_levels(levels: Dict[str, dict]) -> bytes:
+    count = len(FLAT_LEVEL_KEYS)
+    records = [levels.get(key, {}) for key in FLAT_LEVEL_KEYS]
+    out = bytearray([PACKED_FORMAT_VERSION])
+    _write_varint(out, count)
+
+    statuses = bytearray((count + 3) // 4)
+    for index, record in enumerate(records):
+        status = record.get('status', 0)
+        if status not in STATUS_NAMES:
+            raise ValueError(f"Status rank out of range: {status!r}")
+        statuses[index >> 2] |= status << ((index & 3) * 2)
+    out += statuses
+
+    attempts = [record.get('attempts', 0) for record in records]
+    _write_section(out, [value or None for value in attempts])
+    best_times = [record.get('bestTime') for record in records]
+    _write_section(out, [None if value is None else round(value * 10) for value in best_times])
+
+    completed = [record.get('completedAt') for record in records]
+    previous = 0
+    deltas = []
+    for value in completed:
+        if value is None:
+            deltas.append(None)
+            continue
+        seconds = _utc_seconds(value)
+        deltas.append(_zigzag(seconds - previous))
+        previous = seconds
+    _write_section(out, deltas)
+    return bytes(out)
+
+
+def decode_levels(data: bytes) -> Dict[str, dict]:
+    """Inverse of encode_levels. Levels with nothing recorded are left out, as in the unpacked map."""
+    if not data or data[0] != PACKED_FORMAT_VERSION:
+        raise ValueError(f"Unsupported packed progress version: {data[0] if data else None}")
+    count, position = _read_varint(data, 1)
+    if count > len(FLAT_LEVEL_KEYS) or position + (count + 3) // 4 > len(data):
+        raise ValueError("Packed progress is truncated or has too many levels")
+    records = [{'status': (data[position + (index >> 2)] >> ((index & 3) * 2)) & 3} for index in range(count)]
+    position += (count + 3) // 4
+
+    attempts, position = _read_section(data, position, count)
+    best_times, position = _read_section(data, position, count)
+    completed, position = _read_section(data, position, count)
+
+    previous = 0
+    levels = {}
+    for index, record in enumerate(records):
+        record['attempts'] = attempts[index] or 0
+        if best_times[index] is not None:
+            record['bestTime'] = best_times[index] / 10
+        if completed[index] is not None:
+            previous += _unzigzag(completed[index])
+            record['completedAt'] = datetime.utcfromtimestamp(previous)
+        if index < len(FLAT_LEVEL_KEYS) and (record['status'] or record['attempts'] or len(record) > 2):
+            levels[FLAT_LEVEL_KEYS[index]] = record
+    return levels
+
+
+# Device version vectors use the same varint sections, in FLAT_LEVEL_KEYS order:
+#
+#   byte       format version
+#   varint     level count N
+#   ceil(N/8)  bitmap of levels with a version, then one varint per set bit
+
+def encode_versions(versions: Dict[str, int]) -> bytes:
+    out = bytearray([PACKED_FORMAT_VERSION])
+    _write_varint(out, len(FLAT_LEVEL_KEYS))
+    _write_section(out, [versions.get(key) for key in FLAT_LEVEL_KEYS])
+    return bytes(out)
+
+
+def decode_versions(data: bytes) -> Dict[str, int]:
+    if not data or data[0] != PACKED_FORMAT_VERSION:
+        raise ValueError(f"Unsupported packed versions format: {data[0] if data else None}")
+    count, position = _read_varint(data, 1)
+    if count > len(FLAT_LEVEL_KEYS):
+        raise ValueError("Packed versions have too many levels")
+    values, _ = _read_section(data, position, count)
+    return {key: value for key, value in zip(FLAT_LEVEL_KEYS, values) if value is not None}
+
+
+def pack_progress(levels: Dict[str, dict]) -> str:
+    return base64.urlsafe_b64encode(encode_levels(levels)).rstrip(b'=').decode('ascii')
+
+
+def unpack_progress(text: str) -> Dict[str, dict]:
+    try:
+        data = base64.urlsafe_b64decode(text + '=' * (-len(text) % 4))
+    except ValueError as error:
+        raise ValueError(f"Packed progress is not base64url: {error}")
+    return decode_levels(data)
+
+
+def _utc_seconds(value: datetime) -> int:
+    if value.tzinfo is not None:
+        return int(value.timestamp())
+    # Naive datetimes are UTC, as pymongo returns them
+    return int((value - datetime(1970, 1, 1)).total_seconds())
+
+
+def _zigzag(value: int) -> int:
+    return value * 2 if value >= 0 else -value * 2 - 1
+
+
+def _unzigzag(value: int) -> int:
+    return value // 2 if value % 2 == 0 else -(value + 1) // 2
+
+
+# Ten bytes hold any value below 2**70, far past anything stored here
+MAX_VARINT_BYTES = 10
+
+
+def _write_varint(out: bytearray, value: int):
+    if isinstance(value, bool) or not isinstance(value, int) or not 0 <= value < 1 << (7 * MAX_VARINT_BYTES):
+        raise ValueError(f"Varint out of range: {value!r}")
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _read_varint(data: bytes, position: int) -> Tuple[int, int]:
+    value = shift = 0
+    for position in range(position, min(position + MAX_VARINT_BYTES, len(data))):
+        byte = data[position]
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, position + 1
+        shift += 7
+    raise ValueError("Packed varint is truncated or too long")
+
+
+def _write_section(out: bytearray, values: List[Optional[int]]):
+    """A presence bitmap followed by a varint for each present value."""
+    bitmap = bytearray((len(values) + 7) // 8)
+    for index, value in enumerate(values):
+        if value is not None:
+            bitmap[index >> 3] |= 1 << (index & 7)
+    out += bitmap
+    for value in values:
+        if value is not None:
+            _write_varint(out, value)
+
+
+def _read_section(data: bytes, position: int, count: int) -> Tuple[List[Optional[int]], int]:
+    bitmap_end = position + (count + 7) // 8
+    if bitmap_end > len(data):
+        raise ValueError("Packed section is truncated")
+    values: List[Optional[int]] = []
+    cursor = bitmap_end
+    for index in range(count):
+        if data[position + (index >> 3)] >> (index & 7) & 1:
+            value, cursor = _read_varint(data, cursor)
+            values.append(value)
+        else:
+            values.append(None)
+    return values, cursor
+
+
+def _present(*values):
+    return [value for value in values if value is not None]
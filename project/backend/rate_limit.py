@@ -0,0 +1,204 @@
+"""
+Fair-share rate limiting for expensive routes.
+
+Every limited request is checked against two token buckets: one for the
+client IP and, when the X-Player-Id header is sent, one for the player.
+The IP quota is larger, because a classroom often shares one address. The
+header is client-supplied, so the player bucket only ever narrows a
+client's share: the IP bucket is always charged, and rotating player ids
+cannot get past it.
+
+Grading, status checks and telemetry uploads each have their own buckets.
+Sandbox queries, index challenge attempts and table browsing share the
+`sandbox` buckets. The live preview WebSocket is checked per message
+against the `preview` buckets, and the VM steps of each preview are
+charged to them afterwards.
+
+Requests are charged by what they actually cost, not by count. Admission
+takes the base token from both buckets there and then, and only if they
+hold it, so a burst of concurrent requests cannot all pass on the same
+balance. When the request finishes the rest is charged: one token per
+STEPS_PER_TOKEN SQLite VM steps it ran. A heavy query can drive a bucket
+into debt, and that player's next request waits until the debt is repaid. A rejected request
+gets 429 with a Retry-After covering the longer of the two waits.
+
+Buckets live in process by default. When RATE_LIMIT_REDIS_URL is set and
+the optional `redis` package is installed, they live in Redis so that all
+workers share one quota. LocalBucketStore is the local stand-in.
+"""
+
+import math
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import HTTPException
+from starlette.requests import HTTPConnection
+
+try:
+    import redis.asyncio as redis
+except ImportError:
+    redis = None
+
+
+BASE_COST = 1.0
+STEPS_PER_TOKEN = 100_000
+
+PLAYER_HEADER = 'x-player-id'
+
+
+class Policy:
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+
+
+# Route -> (per-player policy, per-IP policy). Rates are tokens per second.
+DEFAULT_POLICIES: Dict[str, Tuple[Policy, Policy]] = {
+    'grade': (Policy(rate=2, burst=30), Policy(rate=40, burst=400)),
+    'sandbox': (Policy(rate=4, burst=40), Policy(rate=60, burst=600)),
+    'status': (Policy(rate=2, burst=10), Policy(rate=10, burst=50)),
+    # One message per edit, most of them superseded before they run
+    'preview': (Policy(rate=10, burst=60), Policy(rate=150, burst=1500)),
+    'telemetry': (Policy(rate=1, burst=20), Policy(rate=20, burst=200)),
+}
+
+
+class LocalBucketStore:
+    def __init__(self, max_keys: int = 100_000):
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+
+    async def apply(self, key: str, cost: float, policy: Policy, strict: bool = False) -> float:
+        """Refill the bucket, take cost from it and return the tokens left (negative when in debt).
+
+        With strict, cost is only taken if the bucket holds it. Otherwise
+        nothing is taken and the shortfall comes back as a negative number.
+        """
+        now = time.monotonic()
+        tokens, updated_at = self._buckets.get(key, (policy.burst, now))
+        tokens = min(policy.burst, tokens + (now - updated_at) * policy.rate)
+        if strict and tokens < cost:
+            self._buckets[key] = (tokens, now)
+            left = tokens - cost
+        else:
+            # A negative cost is a refund, which cannot overfill the bucket
+            tokens = left = min(policy.burst, tokens - cost)
+            self._buckets[key] = (tokens, now)
+        self._buckets.move_to_end(key)
+        while len(self._buckets) > self.max_keys:
+            # The least recently used bucket has been idle longest, so it is the closest to full
+            self._buckets.popitem(last=False)
+        return left
+
+
+REDIS_APPLY_SCRIPT = """
+local now = redis.call('TIME')
+now = tonumber(now[1]) + tonumber(now[2]) / 1000000
+local rate, burst, cost = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+local tokens = tonumber(redis.call('HGET', KEYS[1], 't') or burst)
+local updated = tonumber(redis.call('HGET', KEYS[1], 'u') or now)
+tokens = math.min(burst, tokens + (now - updated) * rate)
+local left
+if ARGV[4] == '1' and tokens < cost then
+  left = tokens - cost
+else
+  tokens = math.min(burst, tokens - cost)
+  left = tokens
+end
+redis.call('HSET', KEYS[1], 't', tokens, 'u', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil((burst - tokens) / rate * 1000) + 1000)
+return tostring(left)
+"""
+
+
+class RedisBucketStore:
+    """Same buckets in Redis, updated atomically by a Lua script using the Redis clock."""
+
+    def __init__(self, url: str, prefix: str = 'rate-limit:'):
+        self.client = redis.from_url(url)
+        self.prefix = prefix
+        self._apply = self.client.register_script(REDIS_APPLY_SCRIPT)
+
+    async def apply(self, key: str, cost: float, policy: Policy, strict: bool = False) -> float:
+        return float(await self._apply(
+            keys=[self.prefix + key], args=[policy.rate, policy.burst, cost, int(strict)]
+        ))
+
+
+class Usage:
+    """Filled in by the route with the VM steps the request ran."""
+
+    def __init__(self):
+        self.steps = 0
+
+    @property
+    def cost(self) -> float:
+        return BASE_COST + self.steps / STEPS_PER_TOKEN
+
+
+class RateLimiter:
+    def __init__(self, store=None, policies: Optional[Dict[str, Tuple[Policy, Policy]]] = None):
+        self.store = store or LocalBucketStore()
+        self.policies = policies or DEFAULT_POLICIES
+        self._stats = {'admitted': 0, 'rejected': 0}
+
+    def _buckets(self, connection: HTTPConnection, route: str) -> List[Tuple[str, Policy]]:
+        player_policy, ip_policy = self.policies[route]
+        # The IP bucket always applies; the player bucket is an extra, narrower limit
+        buckets = [(f"{route}:ip:{connection.client.host if connection.client else 'unknown'}", ip_policy)]
+        player_id = connection.headers.get(PLAYER_HEADER)
+        if player_id:
+            buckets.append((f"{route}:player:{player_id[:128]}", player_policy))
+        return buckets
+
+    async def admit(self, connection: HTTPConnection, route: str):
+        """Take the base cost from every bucket, or take nothing and raise 429."""
+        buckets = self._buckets(connection, route)
+        wait = 0.0
+        taken = []
+        for key, policy in buckets:
+            tokens = await self.store.apply(key, BASE_COST, policy, strict=True)
+            if tokens < 0:
+                wait = max(wait, -tokens / policy.rate)
+            else:
+                taken.append((key, policy))
+        if wait:
+            # Give back what the other bucket already paid for a request that never ran
+            for key, policy in taken:
+                await self.store.apply(key, -BASE_COST, policy)
+            self._stats['rejected'] += 1
+            raise HTTPException(
+                status_code=429,
+                detail=f"Rate limit exceeded; retry in {wait:.2f}s",
+                headers={'Retry-After': str(math.ceil(wait))},
+            )
+
+        self._stats['admitted'] += 1
+
+    async def charge(self, connection: HTTPConnection, route: str, cost: float):
+        """Charge work measured after admission, which may leave the buckets in debt."""
+        if cost:
+            for key, policy in self._buckets(connection, route):
+                await self.store.apply(key, cost, policy)
+
+    @asynccontextmanager
+    async def guard(self, connection: HTTPConnection, route: str):
+        """Take the base cost or raise 429, then charge the rest of the measured cost on the way out."""
+        await self.admit(connection, route)
+        usage = Usage()
+        try:
+            yield usage
+        finally:
+            await self.charge(connection, route, usage.cost - BASE_COST)
+
+    def stats(self) -> dict:
+        return dict(self._stats)
+
+
+def bucket_store(redis_url: Optional[str]):
+    """Redis buckets for RATE_LIMIT_REDIS_URL when available, else in-process buckets."""
+    if redis_url and redis is not None:
+        return RedisBucketStore(redis_url)
+    return LocalBucketStore()
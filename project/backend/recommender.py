@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+"""
+Adaptive next-task recommender.
+
+Every game task and lesson is described by the SQL concepts its expected
+queries exercise. These are the structure flags that parseQuery in
+queryAnalyzer.js computes (hasJoin, hasGroupBy, hasWindowFunction, ...).
+Each player is described by a mastery vector over the same concepts. It is
+estimated from their progress: a level completed in few attempts is strong
+evidence, a skipped level or one that took many attempts is weak evidence.
+
+A batch job scores every candidate item against how much each player still
+needs its concepts and keeps a top-K per player. Candidates are skipped
+levels, the active level, hard-won completed levels to review, and every
+lesson. The job writes the results to the `recommendations` collection, so
+GET /api/recommendations/{player_id} is a single _id lookup.
+
+The server runs the job every RECOMMENDATIONS_INTERVAL_HOURS (see
+RecommendationJob). Every worker schedules it, but a run first claims a
+lease document in `jobs`, so one worker refreshes per interval. Set the
+interval to 0 to run it from cron instead, e.g. `0 */6 * * * python
+recommender.py`.
+
+Usage: python recommender.py [--top-k 5] [--chunk-size 50000]
+"""
+
+import argparse
+import asyncio
+import logging
+import re
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List
+
+import numpy as np
+from pymongo import ReplaceOne
+from pymongo.errors import DuplicateKeyError
+
+from analytics import PeriodicFlusher
+from content import load_game_content
+from progress import STATUS_RANKS, TOTAL_LEVELS, ZONE_LEVEL_COUNTS, document_levels, flat_level_index
+
+
+logger = logging.getLogger(__name__)
+
+RECOMMENDATIONS_COLLECTION = 'recommendations'
+
+# One lease document per scheduled job: {_id: name, runAfter: <datetime>}
+JOBS_COLLECTION = 'jobs'
+
+# Structure flags from parseQuery, minus hasFrom which every task shares with hasSelect
+CONCEPTS = (
+    'hasSelect', 'hasWhere', 'hasJoin', 'hasGroupBy', 'hasHaving', 'hasOrderBy', 'hasLimit',
+    'hasDistinct', 'hasAggregate', 'hasSubquery', 'hasCTE', 'hasWindowFunction',
+)
+
+# Beta prior on mastery, so unseen concepts start at 0.5
+PRIOR_SUCCESS = 1.0
+PRIOR_FAILURE = 1.0
+
+# Completed levels that took at least this many attempts are offered for review
+REVIEW_ATTEMPTS = 4
+
+# Bonus that keeps the player's current level near the top of the list
+ACTIVE_BONUS = 0.15
+
+
+def query_concepts(query: str) -> Dict[str, bool]:
+    """Python port of the structure flags in parseQuery (queryAnalyzer.js)."""
+    clean = query.strip().rstrip(';').strip()
+    upper = clean.upper()
+    return {
+        'hasSelect': 'SELECT' in upper,
+        'hasWhere': 'WHERE' in upper,
+        'hasJoin': re.search(r'JOIN', clean, re.I) is not None,
+        'hasGroupBy': 'GROUP BY' in upper,
+        'hasHaving': 'HAVING' in upper,
+        'hasOrderBy': 'ORDER BY' in upper,
+        'hasLimit': 'LIMIT' in upper,
+        'hasDistinct': 'DISTINCT' in upper,
+        'hasAggregate': re.search(r'(COUNT|SUM|AVG|MAX|MIN|GROUP_CONCAT)\(', clean, re.I) is not None,
+        'hasSubquery': re.search(r'\([\s\S]*SELECT[\s\S]*\)', clean, re.I) is not None,
+        'hasCTE': re.search(r'WITH\s+\w+\s+AS', clean, re.I) is not None,
+        'hasWindowFunction': re.search(
+            r'(ROW_NUMBER|RANK|DENSE_RANK|LAG|LEAD|SUM|AVG|COUNT)\s*\([^)]*\)\s*OVER', clean, re.I
+        ) is not None,
+    }
+
+
+def concept_vector(queries: List[str]) -> np.ndarray:
+    vector = np.zeros(len(CONCEPTS), dtype=np.float32)
+    for query in queries:
+        flags = query_concepts(query)
+        vector = np.maximum(vector, [flags[concept] for concept in CONCEPTS])
+    return vector
+
+
+class ItemCatalog:
+    """Concept matrices for every game level (in flat level order) and every lesson."""
+
+    def __init__(self, content: dict):
+        self.task_items = [None] * TOTAL_LEVELS
+        task_vectors = np.zeros((TOTAL_LEVELS, len(CONCEPTS)), dtype=np.float32)
+        for zone, tasks in content['gameTasks'].items():
+            for task in tasks:
+                index = flat_level_index(zone, task['level'])
+                task_vectors[index] = concept_vector([task['expectedQuery']])
+                self.task_items[index] = {
+                    'kind': 'task', 'zone': zone, 'level': task['level'], 'title': task['title'],
+                }
+
+        self.lesson_items = []
+        lesson_vectors = []
+        for lesson in content['lessons']:
+            lesson_vectors.append(concept_vector([task['expectedQuery'] for task in lesson['tasks']]))
+            self.lesson_items.append({'kind': 'lesson', 'id': lesson['id'], 'title': lesson['title']})
+
+        self.task_concepts = task_vectors
+        self.lesson_concepts = np.array(lesson_vectors, dtype=np.float32)
+        for items, vectors in ((self.task_items, task_vectors), (self.lesson_items, self.lesson_concepts)):
+            for item, vector in zip(items, vectors):
+                if item is not None:
+                    item['concepts'] = [concept for concept, flag in zip(CONCEPTS, vector) if flag]
+
+
+def progress_matrices(documents: List[dict]):
+    """Dense (players x levels) status and attempts matrices for a chunk of progress documents."""
+    status = np.zeros((len(documents), TOTAL_LEVELS), dtype=np.int8)
+    attempts = np.zeros((len(documents), TOTAL_LEVELS), dtype=np.int32)
+    for row, document in enumerate(documents):
+        for key, record in document_levels(document).items():
+            zone, _, level = key.rpartition('-')
+            if zone not in ZONE_LEVEL_COUNTS or not level.isdigit() or not 1 <= int(level) <= ZONE_LEVEL_COUNTS[zone]:
+                continue
+            index = flat_level_index(zone, int(level))
+            status[row, index] = record.get('status', 0)
+            attempts[row, index] = record.get('attempts', 0)
+    return status, attempts
+
+
+def mastery(status: np.ndarray, attempts: np.ndarray, task_concepts: np.ndarray) -> np.ndarray:
+    """Per-player concept mastery in [0, 1], shape (players, concepts)."""
+    completed = status == STATUS_RANKS['completed']
+    exposed = completed | (status == STATUS_RANKS['skipped']) | (attempts > 0)
+    # A first-try completion counts fully; credit falls off as 1 / attempts
+    success = np.where(completed, 1.0 / np.maximum(attempts, 1), 0.0).astype(np.float32)
+    successes = success @ task_concepts
+    exposures = exposed.astype(np.float32) @ task_concepts
+    return (successes + PRIOR_SUCCESS) / (exposures + PRIOR_SUCCESS + PRIOR_FAILURE)
+
+
+def recommend(status: np.ndarray, attempts: np.ndarray, catalog: ItemCatalog, top_k: int) -> List[List[dict]]:
+    """Top-K items per player. Scores are the mean unmet need over an item's concepts."""
+    need = 1.0 - mastery(status, attempts, catalog.task_concepts)
+
+    task_weights = catalog.task_concepts / np.maximum(catalog.task_concepts.sum(axis=1, keepdims=True), 1)
+    lesson_weights = catalog.lesson_concepts / np.maximum(catalog.lesson_concepts.sum(axis=1, keepdims=True), 1)
+    task_scores = need @ task_weights.T
+    lesson_scores = need @ lesson_weights.T
+
+    active = status == STATUS_RANKS['active']
+    eligible = (
+        active
+        | (status == STATUS_RANKS['skipped'])
+        | ((status == STATUS_RANKS['completed']) & (attempts >= REVIEW_ATTEMPTS))
+    )
+    task_scores = np.where(eligible, task_scores + ACTIVE_BONUS * active, -np.inf)
+
+    scores = np.concatenate([task_scores, lesson_scores], axis=1)
+    items = catalog.task_items + catalog.lesson_items
+    k = min(top_k, scores.shape[1])
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    top_scores = np.take_along_axis(scores, top, axis=1)
+    order = np.argsort(-top_scores, axis=1)
+    top = np.take_along_axis(top, order, axis=1)
+    top_scores = np.take_along_axis(top_scores, order, axis=1)
+
+    results = []
+    for row_items, row_scores in zip(top.tolist(), top_scores.tolist()):
+        results.append([
+            {**items[index], 'score': round(score, 4)}
+            for index, score in zip(row_items, row_scores) if score != -np.inf
+        ])
+    return results
+
+
+async def run(db, catalog: ItemCatalog, top_k: int, chunk_size: int) -> int:
+    """Recompute recommendations for every player, one chunk of progress documents at a time."""
+    generated_at = datetime.utcnow()
+    collection = db[RECOMMENDATIONS_COLLECTION]
+    players = 0
+    chunk = []
+
+    def score(documents):
+        status, attempts = progress_matrices(documents)
+        return recommend(status, attempts, catalog, top_k)
+
+    async def write(documents):
+        # The scoring is numpy work; keep it off the event loop
+        recommendations = await asyncio.to_thread(score, documents)
+        await collection.bulk_write([
+            ReplaceOne(
+                {'_id': document['_id']},
+                {'items': items, 'generatedAt': generated_at},
+                upsert=True,
+            )
+            for document, items in zip(documents, recommendations)
+        ], ordered=False)
+
+    async for document in db.progress.find({}, {'levels': 1, 'packed': 1}, batch_size=chunk_size):
+        chunk.append(document)
+        if len(chunk) >= chunk_size:
+            await write(chunk)
+            players += len(chunk)
+            chunk = []
+    if chunk:
+        await write(chunk)
+        players += len(chunk)
+    return players
+
+
+class RecommendationJob(PeriodicFlusher):
+    """Runs the batch job every `interval` seconds, on one worker at a time."""
+
+    def __init__(self, db, content: Callable[[], dict], interval: float, top_k: int = 5,
+                 chunk_size: int = 50_000):
+        super().__init__(interval)
+        self.db = db
+        self.content = content
+        self.top_k = top_k
+        self.chunk_size = chunk_size
+        self._stats = {'runs': 0, 'skipped': 0, 'players': 0, 'last_run': None}
+
+    async def claim(self, now: datetime) -> bool:
+        """Take the lease for this interval, unless another worker already has it."""
+        # Slightly short of the interval, so timer drift never skips a run
+        run_after = now + timedelta(seconds=self.flush_interval * 0.9)
+        try:
+            await self.db[JOBS_COLLECTION].update_one(
+                {'_id': RECOMMENDATIONS_COLLECTION, 'runAfter': {'$lte': now}},
+                {'$set': {'runAfter': run_after}},
+                upsert=True,
+            )
+        except DuplicateKeyError:
+            # The lease exists and is not due, so the filter missed and the upsert collided
+            return False
+        return True
+
+    async def flush(self):
+        try:
+            if not await self.claim(datetime.utcnow()):
+                self._stats['skipped'] += 1
+                return
+            started_at = time.perf_counter()
+            players = await run(self.db, ItemCatalog(self.content()), self.top_k, self.chunk_size)
+        except Exception:
+            logger.exception("Recommendation refresh failed; retrying next interval")
+            return
+        logger.info("Refreshed recommendations for %d players in %.1fs", players, time.perf_counter() - started_at)
+        self._stats['runs'] += 1
+        self._stats['players'] = players
+        self._stats['last_run'] = datetime.utcnow()
+
+    async def stop(self):
+        # A full refresh is too long to run on the way out
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def stats(self) -> dict:
+        return dict(self._stats)
+
+
+def main():
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    from settings import get_settings
+
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--top-k', type=int, default=5)
+    parser.add_argument('--chunk-size', type=int, default=50_000)
+    args = parser.parse_args()
+
+    settings = get_settings()
+    db = AsyncIOMotorClient(settings.require('mongo_url'))[settings.require('db_name')]
+
+    started_at = time.perf_counter()
+    players = asyncio.run(run(db, ItemCatalog(load_game_content()), args.top_k, args.chunk_size))
+    print(f"Refreshed recommendations for {players} players in {time.perf_counter() - started_at:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Replay archived submissions through the current grader.
+
+Run this after a task's expectedQuery or the comparison logic changes to
+find out which historical submissions would now be graded differently. The
+archive's block index (see archive.py) selects only the blocks for the
+requested days, zone and level. Blocks are fanned out to a process pool,
+and each worker builds its own zone pools and Grader once. Players submit
+the same query text over and over, so each worker also memoizes grades by
+normalized query.
+
+Prints per-level totals of submissions that flipped from correct to
+incorrect and back, with a few example queries of each, and optionally
+writes the full report as JSON.
+
+Usage: python regrade.py [--since 2026-01-01] [--until 2026-01-31] [--zone beach] [--level 3] [--workers 8]
+"""
+
+import argparse
+import json
+import os
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from archive import BlockRef, find_blocks, level_key, read_block
+from content import load_game_content
+from grading import Grader, UnknownTaskError
+from settings import get_settings
+from sql_engine import ZonePool, build_zone_images, normalize_sql
+
+
+EXAMPLES_PER_LEVEL = 5
+MAX_MEMOIZED_GRADES = 200_000
+
+_grader: Optional[Grader] = None
+_grades: Dict[Tuple[str, int, str], dict] = {}
+
+
+def _init_worker(variant_count: int):
+    global _grader
+    images = build_zone_images()
+    pools = {zone: ZonePool(zone, image, size=1) for zone, image in images.items()}
+    _grader = Grader(load_game_content()['gameTasks'], pools, variant_count=variant_count, max_workers=variant_count)
+
+
+def _grade(zone: str, level: int, query: str) -> dict:
+    key = (zone, level, normalize_sql(query))
+    result = _grades.get(key)
+    if result is None:
+        if len(_grades) >= MAX_MEMOIZED_GRADES:
+            _grades.clear()
+        result = _grader.grade(zone, level, query)
+        _grades[key] = {'correct': result['correct'], 'error': result['error']}
+        result = _grades[key]
+    return result
+
+
+def regrade_block(block: BlockRef, zone: Optional[str], level: Optional[int]) -> dict:
+    counts: Dict[str, Counter] = defaultdict(Counter)
+    examples: Dict[str, dict] = defaultdict(lambda: {'newly_correct': [], 'newly_incorrect': []})
+    for record in read_block(block, zone, level):
+        key = level_key(record['zone'], record['level'])
+        try:
+            result = _grade(record['zone'], record['level'], record['query'])
+        except UnknownTaskError:
+            # The level was removed from the content since the submission was archived
+            counts[key]['task_removed'] += 1
+            continue
+        counts[key]['submissions'] += 1
+        counts[key]['was_correct'] += record['correct']
+        counts[key]['now_correct'] += result['correct']
+        if result['correct'] != record['correct']:
+            flip = 'newly_correct' if result['correct'] else 'newly_incorrect'
+            counts[key][flip] += 1
+            if len(examples[key][flip]) < EXAMPLES_PER_LEVEL:
+                examples[key][flip].append({'t': record['t'], 'query': record['query'], 'error': result['error']})
+    return {'counts': counts, 'examples': dict(examples)}
+
+
+def merge(report: dict, partial: dict):
+    for key, counts in partial['counts'].items():
+        report['levels'].setdefault(key, Counter()).update(counts)
+    for key, flips in partial['examples'].items():
+        level_examples = report['examples'].setdefault(key, {'newly_correct': [], 'newly_incorrect': []})
+        for flip, items in flips.items():
+            level_examples[flip].extend(items[:EXAMPLES_PER_LEVEL - len(level_examples[flip])])
+
+
+def main():
+    settings = get_settings()
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--archive-dir', type=Path, default=settings.submission_archive_dir)
+    parser.add_argument('--since', help='first day to replay (YYYY-MM-DD)')
+    parser.add_argument('--until', help='last day to replay (YYYY-MM-DD)')
+    parser.add_argument('--zone')
+    parser.add_argument('--level', type=int)
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--variants', type=int, default=settings.grading_variants)
+    parser.add_argument('--out', type=Path, help='write the full report as JSON')
+    args = parser.parse_args()
+
+    blocks = list(find_blocks(args.archive_dir, args.since, args.until, args.zone, args.level))
+    print(f"Reading {len(blocks)} blocks ({sum(block.count for block in blocks)} submissions before "
+          f"zone/level filtering) with {args.workers} workers")
+
+    started_at = time.perf_counter()
+    report = {'levels': {}, 'examples': {}}
+    with ProcessPoolExecutor(args.workers, initializer=_init_worker, initargs=(args.variants,)) as executor:
+        partials = executor.map(
+            regrade_block, blocks, [args.zone] * len(blocks), [args.level] * len(blocks)
+        )
+        for partial in partials:
+            merge(report, partial)
+    elapsed = time.perf_counter() - started_at
+
+    totals = sum(report['levels'].values(), Counter())
+    print(f"Regraded {totals['submissions']} submissions in {elapsed:.1f}s "
+          f"({totals['submissions'] / elapsed if elapsed else 0:.0f}/s): "
+          f"{totals['newly_correct']} newly correct, {totals['newly_incorrect']} newly incorrect")
+    for key in sorted(report['levels']):
+        counts = report['levels'][key]
+        if counts['newly_correct'] or counts['newly_incorrect']:
+            print(f"  {key}: {counts['submissions']} submissions, "
+                  f"+{counts['newly_correct']} / -{counts['newly_incorrect']}")
+
+    if args.out:
+        args.out.write_text(json.dumps({**report, 'elapsed_seconds': round(elapsed, 2)}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,155 @@
+"""
+Hot-swappable content releases.
+
+A ContentRelease holds everything the API derives from the frontend's
+content modules:
+
+- zone images and read-only pools
+- the grader, with its variant pools and expected results
+- autocomplete indexes
+- the search index
+- the content catalog
+- table browsers with row estimates
+- index-tuning challenges over scaled copies of the zones
+
+ReleaseManager polls the source files. When their content hash changes, it
+builds and warms a complete new release in a worker thread while the
+current one keeps serving. The release is built from the same bytes that
+were hashed, so its version always names the content it serves, even when
+a file changes between the poll and the build. It then switches over with a single reference
+assignment. Requests that acquired the old release finish on it, and the
+old pools and grader are closed once the last of them has released it.
+"""
+
+import asyncio
+import hashlib
+import logging
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+from autocomplete import build_completers
+from catalog import ContentCatalog
+from content import load_game_content
+from grading import Grader
+from index_challenge import IndexChallengeLab
+from search import SearchIndex, collect_documents
+from sql_engine import CONTENT_DIR, ZonePool, build_zone_images, get_database_schema, load_zone_setup_sql
+from table_browser import build_table_browsers
+
+
+logger = logging.getLogger(__name__)
+
+CONTENT_SOURCES = ('sqlEngine.js', 'gameData.js', 'lessonsData.js', 'referenceData.js')
+
+
+def read_sources(content_dir: Optional[Path] = None) -> Dict[str, bytes]:
+    return {filename: (Path(content_dir or CONTENT_DIR) / filename).read_bytes() for filename in CONTENT_SOURCES}
+
+
+def content_version(sources: Dict[str, bytes]) -> str:
+    digest = hashlib.sha256()
+    for filename in CONTENT_SOURCES:
+        digest.update(sources[filename])
+    return digest.hexdigest()[:16]
+
+
+class ContentRelease:
+    def __init__(self, sources: Dict[str, bytes], variant_count: int):
+        self.version = content_version(sources)
+        text = {filename: source.decode('utf-8') for filename, source in sources.items()}
+        self.zone_images = build_zone_images(load_zone_setup_sql(text['sqlEngine.js']))
+        self.zone_pools = {zone: ZonePool(zone, image) for zone, image in self.zone_images.items()}
+        self.game_content = load_game_content(sources=text)
+        self.grader = Grader(self.game_content['gameTasks'], self.zone_pools, variant_count=variant_count)
+
+        self.zone_schemas = {}
+        for zone, pool in self.zone_pools.items():
+            with pool.connection() as conn:
+                self.zone_schemas[zone] = get_database_schema(conn)
+        self.completers = build_completers(self.zone_schemas, self.game_content['syntaxReference'])
+        self.search_index = SearchIndex(collect_documents(self.game_content))
+        self.content_catalog = ContentCatalog(self.game_content)
+        self.table_browsers = build_table_browsers(self.zone_pools)
+        self.index_challenges = IndexChallengeLab(self.zone_images)
+
+        self._active = 0
+        self._retired = False
+        self._lock = threading.Lock()
+
+    def close(self):
+        self.grader.close()
+        for pool in self.zone_pools.values():
+            pool.close()
+
+
+class ReleaseManager:
+    def __init__(
+        self,
+        variant_count: int = 4,
+        poll_interval: float = 5.0,
+        on_swap: Optional[Callable[[ContentRelease], None]] = None,
+        content_dir: Optional[Path] = None,
+    ):
+        self.variant_count = variant_count
+        self.poll_interval = poll_interval
+        self.on_swap = on_swap
+        self.content_dir = content_dir
+        self.current = ContentRelease(read_sources(content_dir), variant_count)
+        self._task: Optional[asyncio.Task] = None
+
+    @contextmanager
+    def acquire(self):
+        """Pin the current release for the duration of a request."""
+        while True:
+            release = self.current
+            with release._lock:
+                if not release._retired:
+                    release._active += 1
+                    break
+        try:
+            yield release
+        finally:
+            with release._lock:
+                release._active -= 1
+                drained = release._retired and release._active == 0
+            if drained:
+                release.close()
+
+    def swap(self, release: ContentRelease):
+        previous, self.current = self.current, release
+        if self.on_swap is not None:
+            self.on_swap(release)
+        with previous._lock:
+            previous._retired = True
+            drained = previous._active == 0
+        if drained:
+            previous.close()
+        logger.info("Switched content from %s to %s", previous.version, release.version)
+
+    async def reload(self) -> bool:
+        """Build and switch to a new release if the content changed. Returns whether it did."""
+        sources = await asyncio.to_thread(read_sources, self.content_dir)
+        if content_version(sources) == self.current.version:
+            return False
+        release = await asyncio.to_thread(ContentRelease, sources, self.variant_count)
+        self.swap(release)
+        return True
+
+    def start(self):
+        self._task = asyncio.create_task(self._watch())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        self.current.close()
+
+    async def _watch(self):
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                await self.reload()
+            except Exception:
+                logger.exception("Content reload failed; still serving %s", self.current.version)
@@ -0,0 +1,226 @@
+"""
+Async response cache for read-heavy GET routes.
+
+Two tiers:
+
+- an in-process LRU, always on
+- an optional shared tier, so several workers can reuse each other's
+  results. Redis is used when the optional `redis` package is installed
+  and CACHE_REDIS_URL is set. MemoryBackend is the local stand-in.
+
+Each entry is fresh for its route's TTL, and after that stale for a grace
+period. A stale hit is returned immediately and refreshed in the
+background. Concurrent misses on the same key share one in-flight
+computation, so a cold key reaches MongoDB exactly once however many
+requests arrive together.
+
+Routes opt in with the `cached` decorator. The key is the route name plus
+its arguments. A write that changes a cached result calls the route's
+`invalidate` with the same arguments. That drops the entry from this
+worker's tier and from the shared tier, and a computation already in flight
+is not stored. Other workers' local tiers keep their copy until its TTL
+runs out, so routes with writes keep short TTLs.
+"""
+
+import asyncio
+import functools
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from fastapi import HTTPException
+from fastapi.encoders import jsonable_encoder
+
+try:
+    import redis.asyncio as redis
+except ImportError:
+    redis = None
+
+
+logger = logging.getLogger(__name__)
+
+
+class MemoryBackend:
+    """LRU of cache entries. Also serves as the shared tier when Redis is not configured."""
+
+    def __init__(self, max_entries: int = 10_000):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, dict]" = OrderedDict()
+
+    async def get(self, key: str) -> Optional[dict]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry['stale_until'] < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    async def set(self, key: str, entry: dict):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def delete(self, key: str):
+        self._entries.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class RedisBackend:
+    """Shared tier in Redis. Entries carry wall-clock deadlines and expire with the stale window."""
+
+    def __init__(self, url: str, prefix: str = 'response-cache:'):
+        self.client = redis.from_url(url)
+        self.prefix = prefix
+
+    async def get(self, key: str) -> Optional[dict]:
+        raw = await self.client.get(self.prefix + key)
+        if raw is None:
+            return None
+        entry = json.loads(raw)
+        # Convert wall-clock deadlines back to this process's monotonic clock
+        offset = time.monotonic() - time.time()
+        entry['fresh_until'] += offset
+        entry['stale_until'] += offset
+        return entry
+
+    async def set(self, key: str, entry: dict):
+        offset = time.time() - time.monotonic()
+        payload = {
+            'value': entry['value'],
+            'fresh_until': entry['fresh_until'] + offset,
+            'stale_until': entry['stale_until'] + offset,
+        }
+        ttl = max(1, int(entry['stale_until'] - time.monotonic()) + 1)
+        await self.client.set(self.prefix + key, json.dumps(payload), ex=ttl)
+
+    async def delete(self, key: str):
+        await self.client.delete(self.prefix + key)
+
+
+class ResponseCache:
+    def __init__(self, local: Optional[MemoryBackend] = None, shared=None):
+        self.local = local or MemoryBackend()
+        self.shared = shared
+        self._inflight: Dict[str, asyncio.Task] = {}
+        # Bumped by invalidate(), so computations that started before a write are not stored
+        self._generations: Dict[str, int] = {}
+        self._stats = {'hits': 0, 'stale_hits': 0, 'misses': 0, 'coalesced': 0, 'shared_hits': 0, 'errors': 0}
+
+    async def get_or_compute(
+        self,
+        key: str,
+        compute: Callable[[], Awaitable[Any]],
+        ttl: float,
+        stale_ttl: float,
+    ) -> Any:
+        entry = await self.local.get(key)
+        if entry is None and self.shared is not None:
+            try:
+                entry = await self.shared.get(key)
+            except Exception:
+                self._stats['errors'] += 1
+                logger.exception("Shared cache read failed for %s", key)
+            if entry is not None:
+                self._stats['shared_hits'] += 1
+                await self.local.set(key, entry)
+
+        if entry is not None:
+            if entry['fresh_until'] >= time.monotonic():
+                self._stats['hits'] += 1
+            else:
+                self._stats['stale_hits'] += 1
+                self._refresh(key, compute, ttl, stale_ttl)
+            return entry['value']
+
+        if key in self._inflight:
+            self._stats['coalesced'] += 1
+        else:
+            self._stats['misses'] += 1
+        return await asyncio.shield(self._refresh(key, compute, ttl, stale_ttl))
+
+    def _refresh(self, key: str, compute, ttl: float, stale_ttl: float) -> asyncio.Task:
+        task = self._inflight.get(key)
+        if task is None:
+            generation = self._generations.get(key, 0)
+            task = asyncio.create_task(self._compute(key, compute, ttl, stale_ttl, generation))
+            self._inflight[key] = task
+            task.add_done_callback(functools.partial(self._done, key))
+        return task
+
+    def _done(self, key: str, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            self._inflight.pop(key)
+        if task.cancelled():
+            return
+        error = task.exception()
+        # HTTP errors are ordinary responses for the waiting requests, not cache failures
+        if error is not None and not isinstance(error, HTTPException):
+            self._stats['errors'] += 1
+            logger.warning("Cache refresh failed for %s: %r", key, error)
+
+    async def _compute(self, key: str, compute, ttl: float, stale_ttl: float, generation: int) -> Any:
+        value = jsonable_encoder(await compute())
+        if self._generations.get(key, 0) != generation:
+            return value
+        now = time.monotonic()
+        entry = {'value': value, 'fresh_until': now + ttl, 'stale_until': now + ttl + stale_ttl}
+        await self.local.set(key, entry)
+        if self.shared is not None:
+            try:
+                await self.shared.set(key, entry)
+            except Exception:
+                self._stats['errors'] += 1
+                logger.exception("Shared cache write failed for %s", key)
+        return value
+
+    async def invalidate(self, key: str):
+        """Forget a key, so the next request computes it afresh."""
+        self._generations[key] = self._generations.get(key, 0) + 1
+        # Later requests start a new computation instead of joining the outdated one
+        self._inflight.pop(key, None)
+        await self.local.delete(key)
+        if self.shared is not None:
+            try:
+                await self.shared.delete(key)
+            except Exception:
+                self._stats['errors'] += 1
+                logger.exception("Shared cache delete failed for %s", key)
+
+    def cached(self, ttl: float, stale_ttl: Optional[float] = None):
+        """Cache a route's JSON result for ttl seconds, then serve it stale for stale_ttl while refreshing."""
+        def decorator(route):
+            def key_for(kwargs):
+                return f"{route.__name__}:{json.dumps(kwargs, sort_keys=True, default=str)}"
+
+            @functools.wraps(route)
+            async def wrapper(**kwargs):
+                return await self.get_or_compute(
+                    key_for(kwargs), lambda: route(**kwargs), ttl, ttl if stale_ttl is None else stale_ttl
+                )
+
+            async def invalidate(**kwargs):
+                await self.invalidate(key_for(kwargs))
+
+            wrapper.invalidate = invalidate
+            return wrapper
+        return decorator
+
+    def stats(self) -> dict:
+        return {**self._stats, 'local_entries': len(self.local), 'inflight': len(self._inflight)}
+
+
+def shared_backend(redis_url: Optional[str]) -> Optional[RedisBackend]:
+    """The shared tier for CACHE_REDIS_URL, or None to use the in-process tier only."""
+    if not redis_url:
+        return None
+    if redis is None:
+        logger.warning("CACHE_REDIS_URL is set but the redis package is not installed; using local cache only")
+        return None
+    return RedisBackend(redis_url)
@@ -0,0 +1,123 @@
+"""
+Structured diff between a player's result set and the expected one.
+
+Rows are keyed by a tuple of their values over the columns both results
+share (coerced the same way compare_results does), and counted in multisets.
+That makes every check a single pass over each result. The output is small
+enough to send back with every failed attempt: counts plus a few sample rows,
+never the whole result.
+"""
+
+from collections import Counter
+from typing import Dict, List
+
+from sql_engine import to_js_string
+
+
+SQL_TYPE_NAMES = {
+    int: 'integer',
+    float: 'real',
+    str: 'text',
+    bytes: 'blob',
+    bool: 'integer',
+}
+
+
+def diff_results(user_result: List[dict], expected_result: List[dict], sample_size: int = 3) -> dict:
+    """Describe how user_result differs from expected_result."""
+    user_columns = _columns(user_result)
+    expected_columns = _columns(expected_result)
+    shared_columns = [column for column in expected_columns if column in user_columns]
+
+    diff = {
+        'row_count': {'expected': len(expected_result), 'actual': len(user_result)},
+        'columns': {
+            'missing': [column for column in expected_columns if column not in user_columns],
+            'extra': [column for column in user_columns if column not in expected_columns],
+        },
+        'rows': None,
+        'type_mismatches': _type_mismatches(user_result, expected_result, shared_columns),
+        'order_only': False,
+    }
+    if not shared_columns:
+        return diff
+
+    user_keys = [_row_key(row, shared_columns) for row in user_result]
+    expected_keys = [_row_key(row, shared_columns) for row in expected_result]
+    user_counts = Counter(user_keys)
+    expected_counts = Counter(expected_keys)
+
+    missing = expected_counts - user_counts
+    extra = user_counts - expected_counts
+    diff['rows'] = {
+        'missing_count': sum(missing.values()),
+        'extra_count': sum(extra.values()),
+        'missing_sample': _sample(expected_result, expected_keys, missing, shared_columns, sample_size),
+        'extra_sample': _sample(user_result, user_keys, extra, shared_columns, sample_size),
+    }
+    diff['order_only'] = (
+        not missing and not extra
+        and not diff['columns']['missing'] and not diff['columns']['extra']
+        and user_keys != expected_keys
+    )
+    return diff
+
+
+def summarize_diff(diff: dict) -> str:
+    """One-line, player-facing summary of a diff."""
+    if diff['columns']['missing']:
+        return f"Missing column(s): {', '.join(diff['columns']['missing'])}"
+    if diff['columns']['extra']:
+        return f"Unexpected column(s): {', '.join(diff['columns']['extra'])}"
+    if diff['order_only']:
+        return 'Right rows, wrong order'
+    rows = diff['rows']
+    if rows and (rows['missing_count'] or rows['extra_count']):
+        return f"{rows['missing_count']} expected row(s) missing, {rows['extra_count']} unexpected row(s)"
+    if diff['type_mismatches']:
+        return f"Value types differ in column {diff['type_mismatches'][0]['column']}"
+    return 'Results differ'
+
+
+def _columns(rows: List[dict]) -> List[str]:
+    return list(rows[0]) if rows else []
+
+
+def _row_key(row: dict, columns: List[str]) -> tuple:
+    return tuple(to_js_string(row.get(column)) for column in columns)
+
+
+def _sample(rows, keys, wanted: Counter, columns, sample_size) -> List[dict]:
+    sample = []
+    remaining = Counter(wanted)
+    for row, key in zip(rows, keys):
+        if len(sample) >= sample_size:
+            break
+        if remaining[key] > 0:
+            remaining[key] -= 1
+            sample.append({column: row.get(column) for column in columns})
+    return sample
+
+
+def _type_mismatches(user_result, expected_result, columns) -> List[dict]:
+    user_types = _column_types(user_result, columns)
+    expected_types = _column_types(expected_result, columns)
+    mismatches = []
+    for column in columns:
+        if user_types[column] and expected_types[column] and user_types[column] != expected_types[column]:
+            mismatches.append({
+                'column': column,
+                'expected': sorted(expected_types[column]),
+                'actual': sorted(user_types[column]),
+            })
+    return mismatches
+
+
+def _column_types(rows: List[dict], columns: List[str]) -> Dict[str, set]:
+    types = {column: set() for column in columns}
+    for row in rows:
+        for column in columns:
+            value = row.get(column)
+            if value is not None:
+                types[column].add(SQL_TYPE_NAMES.get(type(value), type(value).__name__))
+    return types
@@ -0,0 +1,259 @@
+"""
+Tiered retention for raw MongoDB collections.
+
+Raw documents are kept only for a short window, and MongoDB deletes them
+through TTL indexes. Before a day's documents can expire, it is rolled up
+into one small summary document in `daily_summaries`, which is kept
+indefinitely:
+
+    {"_id": "status_checks:2026-10-19", "kind": "status_checks", "day": "2026-10-19",
+     "count": 1834, "clients": {"web": 1790, "probe": 44}}
+    {"_id": "events:2026-10-19", "kind": "events", "day": "2026-10-19", "count": 120512,
+     "players": 311, "types": {"query": 90211, ...}, "levels": {"beach-1": {"query": 3120, ...}}}
+
+Each policy names its collection, the time field that carries the TTL
+index, and a summarize function. RetentionManager runs every
+RETENTION_INTERVAL_SECONDS. It summarizes each finished day after the one
+recorded in `retention` ({_id: kind, rolledUpThrough: day}) and then
+advances that marker, so every day is summarized exactly once. A day is
+only summarized once it is SETTLE_DAYS old, because telemetry may arrive
+up to a day late. Raw retention is never shorter than that delay plus a
+day, so nothing expires before it has been counted.
+
+Every query is a range on the TTL index's field, so rollups and the status
+list never scan a whole collection.
+
+Events written before buckets are still in the legacy time-series `events`
+collection, one document per event. The events policy summarizes them
+together with the buckets of the same day. The legacy collection only gets
+its expiry once the marker has reached the oldest day that expiry would
+delete, so no legacy event is dropped before it has been counted.
+"""
+
+import logging
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from pymongo.errors import OperationFailure
+
+from analytics import PeriodicFlusher
+from telemetry import EVENTS_COLLECTION, LEGACY_EVENTS_COLLECTION, iter_bucket_events
+
+
+logger = logging.getLogger(__name__)
+
+SUMMARIES_COLLECTION = 'daily_summaries'
+STATE_COLLECTION = 'retention'
+
+SETTLE_DAYS = 1
+MIN_RETENTION_DAYS = SETTLE_DAYS + 2
+MAX_DAYS_PER_RUN = 31
+MAX_SUMMARY_CLIENTS = 100
+
+
+def summary_id(kind: str, day: str) -> str:
+    return f"{kind}:{day}"
+
+
+def day_bounds(day: str):
+    start = datetime.strptime(day, '%Y-%m-%d')
+    return start, start + timedelta(days=1)
+
+
+async def summarize_status_checks(collection, start: datetime, end: datetime) -> dict:
+    clients = Counter()
+    async for document in collection.find({'timestamp': {'$gte': start, '$lt': end}}, {'client_name': 1, '_id': 0}):
+        clients[document.get('client_name')] += 1
+    top = dict(clients.most_common(MAX_SUMMARY_CLIENTS))
+    other = sum(clients.values()) - sum(top.values())
+    if other:
+        top['(other)'] = other
+    return {'count': sum(clients.values()), 'clients': top}
+
+
+async def summarize_events(collection, start: datetime, end: datetime, legacy=None) -> dict:
+    """Count a day of bucketed events, plus that day's events in the legacy collection if given."""
+    types = Counter()
+    levels: Dict[str, Counter] = defaultdict(Counter)
+    players = set()
+
+    def count(event):
+        meta = event['meta']
+        types[meta['type']] += 1
+        levels[f"{meta['zone']}-{meta['level']}"][meta['type']] += 1
+        if event.get('player_id'):
+            players.add(event['player_id'])
+
+    # Buckets never span an hour, so every event in them is inside [start, end)
+    async for bucket in collection.find({'end': {'$gte': start, '$lt': end}}, {'payload': 1}):
+        for event in iter_bucket_events(bucket):
+            count(event)
+    if legacy is not None:
+        async for event in legacy.find({'ts': {'$gte': start, '$lt': end}}, {'meta': 1, 'player_id': 1}):
+            count(event)
+    return {
+        'count': sum(types.values()),
+        'players': len(players),
+        'types': dict(types),
+        'levels': {key: dict(counts) for key, counts in levels.items()},
+    }
+
+
+class RetentionPolicy:
+    def __init__(
+        self,
+        kind: str,
+        collection: str,
+        time_field: str,
+        days: int,
+        summarize: Callable[..., Awaitable[dict]],
+        legacy_collection: Optional[str] = None,
+        legacy_time_field: Optional[str] = None,
+    ):
+        self.kind = kind
+        self.collection = collection
+        self.time_field = time_field
+        self.days = max(days, MIN_RETENTION_DAYS)
+        self.summarize = summarize
+        # Older documents of the same kind, summarized alongside until they expire
+        self.legacy_collection = legacy_collection
+        self.legacy_time_field = legacy_time_field
+
+
+def default_policies(status_check_days: int, event_days: int) -> List[RetentionPolicy]:
+    return [
+        RetentionPolicy('status_checks', 'status_checks', 'timestamp', status_check_days, summarize_status_checks),
+        RetentionPolicy('events', EVENTS_COLLECTION, 'end', event_days, summarize_events,
+                        legacy_collection=LEGACY_EVENTS_COLLECTION, legacy_time_field='ts'),
+    ]
+
+
+async def ensure_ttl_indexes(db, policies: List[RetentionPolicy]):
+    """Create the TTL index of every policy. Legacy collections are left to RetentionManager."""
+    for policy in policies:
+        seconds = policy.days * 24 * 60 * 60
+        try:
+            await db[policy.collection].create_index(policy.time_field, expireAfterSeconds=seconds)
+        except OperationFailure:
+            # The index exists with another expiry; change it in place
+            await db.command('collMod', policy.collection, index={
+                'keyPattern': {policy.time_field: 1}, 'expireAfterSeconds': seconds,
+            })
+
+
+class RetentionManager(PeriodicFlusher):
+    def __init__(self, db, policies: List[RetentionPolicy], interval: float = 3600.0):
+        super().__init__(interval)
+        self.db = db
+        self.policies = policies
+        self._stats = {'runs': 0, 'days_summarized': 0, 'last_run': None}
+        self._legacy_expiring = set()
+
+    async def _legacy(self, policy: RetentionPolicy):
+        """The policy's legacy collection, or None when it has none or it does not exist."""
+        if policy.legacy_collection is None:
+            return None
+        if policy.legacy_collection not in await self.db.list_collection_names():
+            return None
+        return self.db[policy.legacy_collection]
+
+    async def _first_day(self, policy: RetentionPolicy, legacy=None) -> Optional[str]:
+        """The day after the last summarized one, or the oldest raw document's day if that is later."""
+        sources = [(self.db[policy.collection], policy.time_field)]
+        if legacy is not None:
+            sources.append((legacy, policy.legacy_time_field))
+        days = []
+        for collection, time_field in sources:
+            oldest = await collection.find_one({}, {time_field: 1}, sort=[(time_field, 1)])
+            if oldest is not None:
+                days.append(oldest[time_field].strftime('%Y-%m-%d'))
+        if not days:
+            return None
+        first = min(days)
+        state = await self.db[STATE_COLLECTION].find_one({'_id': policy.kind})
+        if state is not None:
+            after_marker = (day_bounds(state['rolledUpThrough'])[1]).strftime('%Y-%m-%d')
+            first = max(first, after_marker)
+        return first
+
+    async def roll_up(self, policy: RetentionPolicy, today: Optional[datetime] = None) -> List[str]:
+        """Summarize the settled days not summarized yet. Returns the days written."""
+        legacy = await self._legacy(policy)
+        first = await self._first_day(policy, legacy)
+        if first is None:
+            return []
+        today = (today or datetime.utcnow()).replace(hour=0, minute=0, second=0, microsecond=0)
+        last = today - timedelta(days=SETTLE_DAYS + 1)
+
+        written = []
+        start, end = day_bounds(first)
+        while start <= last and len(written) < MAX_DAYS_PER_RUN:
+            day = start.strftime('%Y-%m-%d')
+            if legacy is not None:
+                summary = await policy.summarize(self.db[policy.collection], start, end, legacy)
+            else:
+                summary = await policy.summarize(self.db[policy.collection], start, end)
+            await self.db[SUMMARIES_COLLECTION].replace_one(
+                {'_id': summary_id(policy.kind, day)},
+                {'kind': policy.kind, 'day': day, **summary, 'summarizedAt': datetime.utcnow()},
+                upsert=True,
+            )
+            await self.db[STATE_COLLECTION].replace_one(
+                {'_id': policy.kind}, {'rolledUpThrough': day}, upsert=True
+            )
+            written.append(day)
+            start, end = end, end + timedelta(days=1)
+        return written
+
+    async def expire_legacy(self, policy: RetentionPolicy, now: Optional[datetime] = None) -> bool:
+        """Give the legacy collection its TTL once every day it would delete is summarized.
+
+        Returns True once the expiry is in place, or when there is nothing to expire.
+        """
+        if policy.kind in self._legacy_expiring:
+            return True
+        legacy = await self._legacy(policy)
+        if legacy is not None:
+            oldest_kept = ((now or datetime.utcnow()) - timedelta(days=policy.days)).strftime('%Y-%m-%d')
+            state = await self.db[STATE_COLLECTION].find_one({'_id': policy.kind})
+            if state is None or state['rolledUpThrough'] < oldest_kept:
+                # Still catching up on legacy days; expiring now would lose them
+                return False
+            await self.db.command('collMod', policy.legacy_collection, expireAfterSeconds=policy.days * 24 * 60 * 60)
+            logger.info("Legacy %s now expires after %d days", policy.legacy_collection, policy.days)
+        self._legacy_expiring.add(policy.kind)
+        return True
+
+    async def flush(self):
+        for policy in self.policies:
+            try:
+                days = await self.roll_up(policy)
+                if policy.legacy_collection is not None:
+                    await self.expire_legacy(policy)
+            except Exception:
+                logger.exception("Retention rollup of %s failed; retrying next run", policy.kind)
+                continue
+            if days:
+                logger.info("Summarized %s for %s", policy.kind, ', '.join(days))
+            self._stats['days_summarized'] += len(days)
+        self._stats['runs'] += 1
+        self._stats['last_run'] = datetime.utcnow()
+
+    def stats(self) -> dict:
+        return {
+            **self._stats,
+            'policies': {
+                policy.kind: {'collection': policy.collection, 'retention_days': policy.days}
+                for policy in self.policies
+            },
+        }
+
+
+async def read_summaries(db, kind: str, start: datetime, days: int) -> List[dict]:
+    """Summaries for consecutive days. Days with nothing recorded come back as None."""
+    day_names = [(start + timedelta(days=offset)).strftime('%Y-%m-%d') for offset in range(days)]
+    ids = [summary_id(kind, day) for day in day_names]
+    documents = await db[SUMMARIES_COLLECTION].find({'_id': {'$in': ids}}, {'_id': 0}).to_list(len(ids))
+    by_day = {document['day']: document for document in documents}
+    return [by_day.get(day) for day in day_names]
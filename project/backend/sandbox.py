@@ -0,0 +1,272 @@
+"""
+Per-session sandbox databases.
+
+Players read from the shared, read-only zone pool until their first write.
+At that point the session gets its own copy of the zone image (copy on first
+write) so INSERT/UPDATE/DELETE persist across that player's queries only.
+
+Live sandboxes are tracked in an LRU. When their combined size goes over the
+memory cap, the least recently used idle sandboxes are compressed and spilled
+to disk. They are restored lazily the next time their session sends a query,
+and spilled sandboxes left alone for longer than the spill TTL are deleted.
+
+While a sandbox is being spilled or restored its key is in `_moving`, and
+anyone else looking it up waits for the move to finish. A session is never
+seen as absent halfway through, so it cannot be recreated from the pristine
+zone and lose the player's changes. Compression and disk I/O happen outside
+the manager's lock.
+"""
+
+import logging
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from sql_engine import QUERY_STEP_BUDGET, ZonePool, count_vm_steps, create_zone_database, database_size, execute_user_query
+
+
+logger = logging.getLogger(__name__)
+
+SESSION_ID_PATTERN = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+
+
+class Sandbox:
+    def __init__(self, key: str, conn: sqlite3.Connection):
+        self.key = key
+        self.conn = conn
+        self.lock = threading.Lock()
+        self.size = database_size(conn)
+        self.last_used = time.monotonic()
+        self.closed = False
+
+
+class SandboxManager:
+    def __init__(
+        self,
+        pools: Dict[str, ZonePool],
+        memory_limit: int = 512 * 1024 * 1024,
+        spill_dir: Optional[Path] = None,
+        spill_ttl: float = 24 * 60 * 60,
+    ):
+        self.pools = pools
+        self.memory_limit = memory_limit
+        self.spill_ttl = spill_ttl
+        self.spill_dir = Path(spill_dir or tempfile.mkdtemp(prefix='sql-survival-sandboxes-'))
+        self.spill_dir.mkdir(parents=True, exist_ok=True)
+
+        self._live: "OrderedDict[str, Sandbox]" = OrderedDict()
+        # Oldest spill first, so expiry only looks at the front
+        self._spilled: "OrderedDict[str, Tuple[Path, float]]" = OrderedDict()
+        self._moving: Dict[str, threading.Event] = {}
+        self._memory_used = 0
+        self._lock = threading.Lock()
+        self._stats = {'created': 0, 'evicted': 0, 'restored': 0, 'expired': 0}
+        self._remove_stale_spills()
+
+    def execute(self, zone: str, session_id: str, query: str) -> dict:
+        """Run a query in the session's sandbox, creating it on the first write.
+
+        The result carries `steps`, the SQLite VM work the query cost.
+        """
+        key = self._key(zone, session_id)
+        self.expire_spilled()
+
+        while True:
+            sandbox = self._get(key)
+            if sandbox is None:
+                with self.pools[zone].connection() as conn, \
+                        count_vm_steps(conn, budget=QUERY_STEP_BUDGET) as counter:
+                    conn.denied_write = False
+                    result = execute_user_query(query, conn)
+                    wrote = conn.denied_write
+                if result['success'] or not wrote:
+                    return {**result, 'steps': counter.steps}
+                sandbox = self._materialize(key, self.pools[zone].image)
+
+            with sandbox.lock:
+                # Evicted between lookup and lock: restore it and try again.
+                if sandbox.closed:
+                    continue
+                with count_vm_steps(sandbox.conn, budget=QUERY_STEP_BUDGET) as counter:
+                    result = execute_user_query(query, sandbox.conn)
+                self._resize(sandbox)
+            self._evict_over_limit()
+            return {**result, 'steps': counter.steps}
+
+    def reset(self, zone: str, session_id: str):
+        """Discard a session's sandbox so its next query sees the pristine zone."""
+        key = self._key(zone, session_id)
+        while True:
+            with self._lock:
+                moving = self._moving.get(key)
+                if moving is None:
+                    sandbox = self._live.pop(key, None)
+                    if sandbox is not None:
+                        self._memory_used -= sandbox.size
+                    spilled = self._spilled.pop(key, None)
+                    break
+            moving.wait()
+
+        if sandbox is not None:
+            with sandbox.lock:
+                sandbox.conn.close()
+                sandbox.closed = True
+        if spilled is not None:
+            spilled[0].unlink(missing_ok=True)
+
+    def expire_spilled(self) -> int:
+        """Delete spilled sandboxes idle for longer than spill_ttl. Returns how many went."""
+        cutoff = time.monotonic() - self.spill_ttl
+        expired: List[Path] = []
+        with self._lock:
+            while self._spilled:
+                key, (spill_path, spilled_at) = next(iter(self._spilled.items()))
+                if spilled_at > cutoff:
+                    break
+                del self._spilled[key]
+                expired.append(spill_path)
+            self._stats['expired'] += len(expired)
+        for spill_path in expired:
+            spill_path.unlink(missing_ok=True)
+        return len(expired)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'live_sandboxes': len(self._live),
+                'spilled_sandboxes': len(self._spilled),
+                'memory_used': self._memory_used,
+                'memory_limit': self.memory_limit,
+                **self._stats,
+            }
+
+    def _key(self, zone: str, session_id: str) -> str:
+        if zone not in self.pools:
+            raise KeyError(zone)
+        if not SESSION_ID_PATTERN.match(session_id):
+            raise ValueError(f"Invalid session id: {session_id!r}")
+        return f"{zone}--{session_id}"
+
+    def _remove_stale_spills(self):
+        # Left by an earlier process; nothing here knows their sessions any more
+        cutoff = time.time() - self.spill_ttl
+        for spill_path in self.spill_dir.glob('*.db.z'):
+            try:
+                if spill_path.stat().st_mtime < cutoff:
+                    spill_path.unlink()
+            except OSError:
+                pass
+
+    def _get(self, key: str) -> Optional[Sandbox]:
+        while True:
+            with self._lock:
+                sandbox = self._live.get(key)
+                if sandbox is not None:
+                    self._live.move_to_end(key)
+                    sandbox.last_used = time.monotonic()
+                    return sandbox
+                moving = self._moving.get(key)
+                if moving is None:
+                    spilled = self._spilled.pop(key, None)
+                    if spilled is None:
+                        return None
+                    moving = self._moving[key] = threading.Event()
+                    break
+            # Being spilled or restored by another request; look again once it lands
+            moving.wait()
+
+        spill_path = spilled[0]
+        sandbox = None
+        try:
+            image = zlib.decompress(spill_path.read_bytes())
+            sandbox = Sandbox(key, create_zone_database(image, sandbox=True))
+            spill_path.unlink(missing_ok=True)
+        except (OSError, zlib.error, sqlite3.Error):
+            logger.exception("Could not restore sandbox %s; it starts over from the zone", key)
+        finally:
+            with self._lock:
+                if sandbox is not None:
+                    self._live[key] = sandbox
+                    self._memory_used += sandbox.size
+                    self._stats['restored'] += 1
+                del self._moving[key]
+            moving.set()
+        self._evict_over_limit()
+        return sandbox
+
+    def _materialize(self, key: str, image: bytes) -> Sandbox:
+        while True:
+            existing = self._get(key)
+            if existing is not None:
+                return existing
+            sandbox = Sandbox(key, create_zone_database(image, sandbox=True))
+            with self._lock:
+                # Created, spilled or being restored by another request meanwhile
+                if key not in self._live and key not in self._moving and key not in self._spilled:
+                    self._live[key] = sandbox
+                    self._memory_used += sandbox.size
+                    self._stats['created'] += 1
+                    break
+            sandbox.conn.close()
+        self._evict_over_limit()
+        return sandbox
+
+    def _resize(self, sandbox: Sandbox):
+        size = database_size(sandbox.conn)
+        with self._lock:
+            if self._live.get(sandbox.key) is sandbox:
+                self._memory_used += size - sandbox.size
+            sandbox.size = size
+
+    def _evict_over_limit(self):
+        """Spill idle sandboxes, least recently used first.
+
+        Victims are picked and marked as moving under self._lock. They are
+        serialized, compressed and written after it is released.
+        """
+        victims: List[Sandbox] = []
+        with self._lock:
+            if self._memory_used <= self.memory_limit:
+                return
+            # The most recently used sandbox always stays live so its query can run.
+            for key in list(self._live)[:-1]:
+                if self._memory_used <= self.memory_limit:
+                    break
+                sandbox = self._live[key]
+                if not sandbox.lock.acquire(blocking=False):
+                    continue
+                del self._live[key]
+                self._memory_used -= sandbox.size
+                self._moving[key] = threading.Event()
+                victims.append(sandbox)
+
+        for sandbox in victims:
+            self._spill(sandbox)
+        logger.debug("Sandbox memory after eviction: %d bytes", self._memory_used)
+
+    def _spill(self, sandbox: Sandbox):
+        """Write one victim to disk. The caller holds sandbox.lock, which is released here."""
+        spill_path = self.spill_dir / f"{sandbox.key}.db.z"
+        try:
+            spill_path.write_bytes(zlib.compress(sandbox.conn.serialize(), 1))
+            sandbox.conn.close()
+            sandbox.closed = True
+        except (OSError, sqlite3.Error):
+            logger.exception("Could not spill sandbox %s; keeping it in memory", sandbox.key)
+        with self._lock:
+            if sandbox.closed:
+                self._spilled[sandbox.key] = (spill_path, time.monotonic())
+                self._stats['evicted'] += 1
+            else:
+                self._live[sandbox.key] = sandbox
+                self._live.move_to_end(sandbox.key, last=False)
+                self._memory_used += sandbox.size
+            moving = self._moving.pop(sandbox.key)
+        sandbox.lock.release()
+        moving.set()
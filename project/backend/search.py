@@ -0,0 +1,209 @@
+"""
+Full-text search over the SQL reference library, lesson theory and task hints.
+
+The index is built once at startup from the same content the client bundles.
+It maps each token to a postings dict of {document: weight}, where weight is
+the BM25 term score with matches in titles counted more heavily. A query sums
+the postings of its terms. A last word that is still being typed also matches
+as a prefix, by bisecting the sorted vocabulary, so results update as the
+player types.
+
+Tokenization is SQL-aware. Compound keywords such as GROUP BY or LEFT JOIN
+are indexed as single tokens as well as by their words, and snake_case
+identifiers are indexed whole and in parts.
+"""
+
+import heapq
+import math
+import re
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from typing import Dict, List
+
+
+COMPOUND_KEYWORDS = [
+    'group by', 'order by', 'partition by', 'inner join', 'left join', 'right join',
+    'full join', 'outer join', 'cross join', 'union all', 'is null', 'is not null',
+    'not in', 'not exists', 'row_number', 'select distinct', 'insert into', 'delete from',
+]
+
+STOP_WORDS = {'a', 'an', 'and', 'are', 'be', 'for', 'is', 'it', 'of', 'or', 'the', 'this', 'to', 'you', 'your'}
+
+TITLE_WEIGHT = 3
+BM25_K1 = 1.2
+BM25_B = 0.75
+SNIPPET_RADIUS = 80
+
+_WORD_PATTERN = re.compile(r'[a-z0-9_]+')
+_COMPOUND_PATTERN = re.compile(
+    r'\b(' + '|'.join(re.escape(keyword).replace(r'\ ', r'\s+') for keyword in COMPOUND_KEYWORDS) + r')\b'
+)
+
+
+def tokenize(text: str) -> List[str]:
+    text = text.lower()
+    tokens = [re.sub(r'\s+', '_', keyword) for keyword in _COMPOUND_PATTERN.findall(text)]
+    for word in _WORD_PATTERN.findall(text):
+        if word in STOP_WORDS:
+            continue
+        tokens.append(word)
+        if '_' in word:
+            tokens.extend(part for part in word.split('_') if part and part not in STOP_WORDS)
+    return tokens
+
+
+def collect_documents(content: dict) -> List[dict]:
+    """Flatten reference items, lesson theory sections and task hints into documents."""
+    documents = []
+
+    for category in content['syntaxReference']:
+        for item in category['items']:
+            documents.append({
+                'kind': 'syntax',
+                'title': item['name'],
+                'text': ' '.join([item['syntax'], item['description'], *item.get('examples', [])]),
+                'ref': {'category': category['category'], 'name': item['name']},
+            })
+
+    for example in content['examplesLibrary']:
+        documents.append({
+            'kind': 'example',
+            'title': example['title'],
+            'text': ' '.join([example['query'], example['result'], example['explanation'], *example.get('tags', [])]),
+            'ref': {'id': example['id'], 'zone': example.get('zone')},
+        })
+
+    for pattern in content['commonPatterns']:
+        documents.append({
+            'kind': 'pattern',
+            'title': pattern['name'],
+            'text': ' '.join([pattern['useCase'], pattern['template'], pattern['example']]),
+            'ref': {'name': pattern['name'], 'category': pattern.get('category')},
+        })
+
+    for lesson in content['lessons']:
+        for heading, body in _theory_sections(lesson['theory']):
+            documents.append({
+                'kind': 'lesson',
+                'title': f"{lesson['title']}: {heading}" if heading else lesson['title'],
+                'text': body,
+                'ref': {'lesson': lesson['id'], 'section': heading},
+            })
+        for task in lesson.get('tasks', []):
+            documents.append({
+                'kind': 'hint',
+                'title': task['description'],
+                'text': task['hint'],
+                'ref': {'lesson': lesson['id'], 'task': task['id']},
+            })
+
+    for zone, tasks in content['gameTasks'].items():
+        for task in tasks:
+            documents.append({
+                'kind': 'hint',
+                'title': task['title'],
+                'text': f"{task['description']} {task['hint']}",
+                'ref': {'zone': zone, 'level': task['level']},
+            })
+
+    return documents
+
+
+class SearchIndex:
+    def __init__(self, documents: List[dict]):
+        self.documents = documents
+        self.postings: Dict[str, Dict[int, float]] = defaultdict(dict)
+
+        term_counts = []
+        lengths = []
+        for document in documents:
+            counts = Counter(tokenize(document['text']))
+            for token in tokenize(document['title']):
+                counts[token] += TITLE_WEIGHT
+            term_counts.append(counts)
+            lengths.append(sum(counts.values()))
+
+        average_length = sum(lengths) / max(len(lengths), 1)
+        document_frequency = Counter(token for counts in term_counts for token in counts)
+        total = len(documents)
+
+        for doc_id, counts in enumerate(term_counts):
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths[doc_id] / average_length)
+            for token, count in counts.items():
+                idf = math.log(1 + (total - document_frequency[token] + 0.5) / (document_frequency[token] + 0.5))
+                self.postings[token][doc_id] = idf * count * (BM25_K1 + 1) / (count + norm)
+
+        self.vocabulary = sorted(self.postings)
+
+    def search(self, query: str, limit: int = 10) -> List[dict]:
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+
+        # A word still being typed (no trailing space) also matches as a prefix,
+        # and so does the last part of a snake_case identifier being typed.
+        words = _WORD_PATTERN.findall(query.lower())
+        partials = []
+        if words and not query[-1].isspace():
+            partials = list(dict.fromkeys([words[-1], words[-1].rsplit('_', 1)[-1]]))
+        tokens = [token for token in tokens if token not in partials]
+
+        scores: Dict[int, float] = defaultdict(float)
+        for token in tokens:
+            for doc_id, weight in self.postings.get(token, {}).items():
+                scores[doc_id] += weight
+
+        for partial in partials:
+            prefix_scores: Dict[int, float] = {}
+            for token in self._expand_prefix(partial):
+                boost = 1.0 if token == partial else 0.5
+                for doc_id, weight in self.postings[token].items():
+                    prefix_scores[doc_id] = max(prefix_scores.get(doc_id, 0.0), weight * boost)
+            for doc_id, weight in prefix_scores.items():
+                scores[doc_id] += weight
+        tokens.extend(partials)
+
+        top = heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
+        return [
+            {
+                'kind': self.documents[doc_id]['kind'],
+                'title': self.documents[doc_id]['title'],
+                'snippet': _snippet(self.documents[doc_id]['text'], tokens),
+                'ref': self.documents[doc_id]['ref'],
+                'score': round(score, 3),
+            }
+            for doc_id, score in top
+        ]
+
+    def _expand_prefix(self, prefix: str, max_terms: int = 50) -> List[str]:
+        index = bisect_left(self.vocabulary, prefix)
+        expanded = []
+        while index < len(self.vocabulary) and len(expanded) < max_terms and self.vocabulary[index].startswith(prefix):
+            expanded.append(self.vocabulary[index])
+            index += 1
+        return expanded
+
+
+def _theory_sections(theory: str):
+    heading, lines = '', []
+    for line in theory.splitlines():
+        match = re.match(r'#{2,3}\s+(.*)', line)
+        if match:
+            if any(line.strip() for line in lines):
+                yield heading, '\n'.join(lines).strip()
+            heading, lines = match.group(1).strip(), []
+        elif line.strip() != '---':
+            lines.append(line)
+    if any(line.strip() for line in lines):
+        yield heading, '\n'.join(lines).strip()
+
+
+def _snippet(text: str, terms: List[str]) -> str:
+    lowered = text.lower()
+    positions = [lowered.find(term.replace('_', ' ')) for term in terms] + [lowered.find(term) for term in terms]
+    positions = [position for position in positions if position >= 0]
+    start = max(min(positions) - SNIPPET_RADIUS // 2, 0) if positions else 0
+    snippet = ' '.join(text[start:start + 2 * SNIPPET_RADIUS].split())
+    prefix = '…' if start > 0 else ''
+    suffix = '…' if start + 2 * SNIPPET_RADIUS < len(text) else ''
+    return f"{prefix}{snippet}{suffix}"
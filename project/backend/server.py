@@ -1,26 +1,35 @@
-from fastapi import FastAPI, APIRouter
-from dotenv import load_dotenv
+from fastapi import FastAPI, APIRouter, HTTPException, Request, Response, WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from starlette.middleware.cors import CORSMiddleware
-from motor.motor_asyncio import AsyncIOMotorClient
-import os
+from contextlib import asynccontextmanager
 import logging
-from pathlib import Path
 from pydantic import BaseModel, Field
-from typing import List
+from typing import List, Optional
+import time
 import uuid
 from datetime import datetime
 
+from settings import Settings, get_settings
+from services import Services
+from response_cache import ResponseCache
+from preview import PreviewChannel
+from analytics import daily_dashboard, difficulty_report, zone_dashboard
+from classroom import CLASS_HEADER
+from grading import UnknownTaskError
+from progress import DEVICE_ID_PATTERN, TOTAL_LEVELS, LevelDelta, serialize_progress, sync_progress
+from retention import read_summaries
+from rate_limit import PLAYER_HEADER, STEPS_PER_TOKEN
+from telemetry import parse_events
 
-ROOT_DIR = Path(__file__).parent
-load_dotenv(ROOT_DIR / '.env')
 
-# MongoDB connection
-mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
+logger = logging.getLogger(__name__)
+
+# Cache for read-heavy GET routes; the shared tier is attached at startup
+response_cache = ResponseCache()
 
-# Create the main app without a prefix
-app = FastAPI()
+# Mongo client, zone pools, grader, sandboxes and writers, created at startup
+services = Services(response_cache)
 
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
@@ -35,41 +44,412 @@ class StatusCheck(BaseModel):
 class StatusCheckCreate(BaseModel):
     client_name: str
 
+class IndexAttempt(BaseModel):
+    statements: List[str] = []
+
+class SandboxQuery(BaseModel):
+    query: str
+
+class GradeRequest(BaseModel):
+    zone: str
+    level: int
+    query: str
+
+class CompletionRequest(BaseModel):
+    zone: str
+    query: str
+    cursor: Optional[int] = None
+    limit: int = 20
+
+class ProgressDelta(BaseModel):
+    zone: str
+    level: int
+    version: int = Field(..., ge=1)
+    status: Optional[str] = None
+    attempts: int = Field(0, ge=0)
+    best_time: Optional[float] = Field(None, ge=0, allow_inf_nan=False)
+    completed_at: Optional[datetime] = None
+
+class ProgressSync(BaseModel):
+    device_id: str = Field(..., pattern=DEVICE_ID_PATTERN.pattern)
+    deltas: List[ProgressDelta] = Field(..., max_length=2000)
+
+class ScoreUpdate(BaseModel):
+    player_id: str
+    score: int
+    levels_completed: int = Field(0, ge=0, le=TOTAL_LEVELS)
+
 # Add your routes to the router instead of directly to app
 @api_router.get("/")
 async def root():
     return {"message": "Hello World"}
 
+@api_router.get("/health")
+async def health():
+    return {
+        "status": "ok" if services.ready else "starting",
+        "content_version": services.releases.current.version,
+        "startup_phases": services.startup_phases,
+        "readiness": services.readiness,
+    }
+
 @api_router.post("/status", response_model=StatusCheck)
-async def create_status_check(input: StatusCheckCreate):
-    status_dict = input.dict()
-    status_obj = StatusCheck(**status_dict)
-    _ = await db.status_checks.insert_one(status_obj.dict())
-    return status_obj
+async def create_status_check(input: StatusCheckCreate, request: Request):
+    async with services.limiter.guard(request, 'status'):
+        status_dict = input.dict()
+        status_obj = StatusCheck(**status_dict)
+        _ = await services.db.status_checks.insert_one(status_obj.dict())
+        await recent_status_checks.invalidate()
+        return status_obj
+
+STATUS_LIST_LIMIT = 1000
+
+@response_cache.cached(ttl=5)
+async def recent_status_checks():
+    # Newest first on the TTL index, then back into time order
+    cursor = services.db.status_checks.find({}, {'_id': 0}).sort('timestamp', -1).limit(STATUS_LIST_LIMIT)
+    status_checks = await cursor.to_list(STATUS_LIST_LIMIT)
+    return [StatusCheck(**status_check) for status_check in reversed(status_checks)]
 
 @api_router.get("/status", response_model=List[StatusCheck])
-async def get_status_checks():
-    status_checks = await db.status_checks.find().to_list(1000)
-    return [StatusCheck(**status_check) for status_check in status_checks]
-
-# Include the router in the main app
-app.include_router(api_router)
-
-app.add_middleware(
-    CORSMiddleware,
-    allow_credentials=True,
-    allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
-logger = logging.getLogger(__name__)
+async def get_status_checks(request: Request):
+    async with services.limiter.guard(request, 'status'):
+        return await recent_status_checks()
+
+@api_router.post("/sandbox/{zone}/{session_id}/query")
+async def execute_sandbox_query(zone: str, session_id: str, input: SandboxQuery, request: Request):
+    try:
+        async with services.limiter.guard(request, 'sandbox') as usage:
+            with services.releases.acquire():
+                result = await run_in_threadpool(services.sandboxes.execute, zone, session_id, input.query)
+            usage.steps = result['steps']
+            return result
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Unknown zone: {zone}")
+    except ValueError as error:
+        raise HTTPException(status_code=400, detail=str(error))
+
+@api_router.delete("/sandbox/{zone}/{session_id}")
+async def reset_sandbox(zone: str, session_id: str):
+    try:
+        await run_in_threadpool(services.sandboxes.reset, zone, session_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Unknown zone: {zone}")
+    except ValueError as error:
+        raise HTTPException(status_code=400, detail=str(error))
+    return {"reset": True}
+
+@api_router.get("/cache/stats")
+async def get_cache_stats():
+    return response_cache.stats()
+
+@api_router.get("/rate-limit/stats")
+async def get_rate_limit_stats():
+    return services.limiter.stats()
+
+@api_router.get("/sandbox/stats")
+async def get_sandbox_stats():
+    return services.sandboxes.stats()
+
+@api_router.get("/grading/stats")
+async def get_grading_stats():
+    with services.releases.acquire() as release:
+        return {"version": release.version, "statement_cache": release.grader.statement_stats()}
+
+@api_router.get("/archive/stats")
+async def get_archive_stats():
+    return services.archive.stats()
+
+@api_router.post("/grade")
+async def grade_submission(input: GradeRequest, request: Request):
+    async with services.limiter.guard(request, 'grade') as usage:
+        with services.releases.acquire() as release:
+            try:
+                result = await run_in_threadpool(release.grader.grade, input.zone, input.level, input.query)
+            except UnknownTaskError as error:
+                raise HTTPException(status_code=404, detail=str(error))
+        usage.steps = result['steps']
+    player_id = request.headers.get(PLAYER_HEADER)
+    class_id = request.headers.get(CLASS_HEADER)
+    services.rollups.record_submission(input.zone, input.level, result['correct'])
+    services.archive.record(input.zone, input.level, input.query, result['correct'], player_id)
+    if class_id and player_id:
+        outcome = 'correct' if result['correct'] else 'failed'
+        services.classroom.record(
+            class_id[:64], player_id, input.zone, input.level, outcome, error=result['error']
+        )
+    return result
+
+@api_router.post("/telemetry", status_code=202)
+async def ingest_telemetry(request: Request):
+    async with services.limiter.guard(request, 'telemetry'):
+        body = await request.body()
+        try:
+            game_tasks = services.releases.current.game_content['gameTasks']
+            level_counts = {zone: len(tasks) for zone, tasks in game_tasks.items()}
+            documents, rejected = await run_in_threadpool(parse_events, body, time.time() * 1000, level_counts)
+        except ValueError as error:
+            raise HTTPException(status_code=413, detail=str(error))
+    accepted = services.events.accept(documents)
+    if documents and not accepted:
+        raise HTTPException(status_code=503, detail="Telemetry buffer is full", headers={"Retry-After": "1"})
+    services.classroom.record_events(documents)
+    return {"accepted": accepted, "rejected": rejected}
+
+@api_router.get("/analytics/zones/{zone}")
+@response_cache.cached(ttl=10)
+async def get_zone_analytics(zone: str):
+    game_tasks = services.releases.current.game_content['gameTasks']
+    if zone not in game_tasks:
+        raise HTTPException(status_code=404, detail=f"Unknown zone: {zone}")
+    return await zone_dashboard(services.db.rollups, zone, len(game_tasks[zone]))
+
+@api_router.get("/analytics/days")
+@response_cache.cached(ttl=10)
+async def get_daily_analytics(start: str, days: int = 7):
+    try:
+        start_date = datetime.strptime(start, '%Y-%m-%d')
+    except ValueError:
+        raise HTTPException(status_code=400, detail="start must be YYYY-MM-DD")
+    return await daily_dashboard(services.db.rollups, start_date, max(1, min(days, 90)))
+
+@api_router.get("/analytics/difficulty")
+@response_cache.cached(ttl=60)
+async def get_difficulty_analytics():
+    report = await difficulty_report(services.db.reports)
+    if report is None:
+        raise HTTPException(status_code=404, detail="Difficulty report has not been generated yet")
+    return report
+
+def require_teacher(class_id: str, request: Request):
+    token = request.query_params.get('token')
+    scheme, _, credentials = request.headers.get('authorization', '').partition(' ')
+    if scheme.lower() == 'bearer':
+        token = credentials
+    if not services.classroom.keys.is_teacher(class_id, token):
+        raise HTTPException(status_code=403, detail="A teacher token for this class is required")
+
+@api_router.post("/classes", status_code=201)
+async def create_classroom():
+    class_id, teacher_token = services.classroom.keys.mint()
+    return {"class_id": class_id, "teacher_token": teacher_token}
+
+@api_router.get("/classes/{class_id}")
+async def get_classroom(class_id: str, request: Request):
+    require_teacher(class_id, request)
+    snapshot = services.classroom.snapshot(class_id)
+    if snapshot is None:
+        raise HTTPException(status_code=404, detail=f"No activity recorded for class: {class_id}")
+    return snapshot
+
+@api_router.get("/classes/{class_id}/stream")
+async def stream_classroom(class_id: str, request: Request):
+    require_teacher(class_id, request)
+    broadcaster = services.classroom.watch(class_id)
+    if broadcaster is None:
+        raise HTTPException(status_code=503, detail="Too many classes are being watched", headers={"Retry-After": "30"})
+    return StreamingResponse(
+        broadcaster.stream(request.is_disconnected),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@api_router.get("/classroom/stats")
+async def get_classroom_stats():
+    return services.classroom.stats()
+
+@api_router.get("/retention/stats")
+async def get_retention_stats():
+    return services.retention.stats()
+
+@api_router.get("/retention/summaries/{kind}")
+@response_cache.cached(ttl=60)
+async def get_daily_summaries(kind: str, start: str, days: int = 7):
+    if kind not in {policy.kind for policy in services.retention.policies}:
+        raise HTTPException(status_code=404, detail=f"Unknown summary kind: {kind}")
+    try:
+        start_date = datetime.strptime(start, '%Y-%m-%d')
+    except ValueError:
+        raise HTTPException(status_code=400, detail="start must be YYYY-MM-DD")
+    return await read_summaries(services.db, kind, start_date, max(1, min(days, 90)))
+
+@api_router.get("/recommendations/{player_id}")
+@response_cache.cached(ttl=30)
+async def get_recommendations(player_id: str):
+    document = await services.db.recommendations.find_one({'_id': player_id}, {'_id': 0})
+    return document or {"items": [], "generatedAt": None}
+
+@api_router.get("/progress/{player_id}")
+async def get_progress(player_id: str, packed: bool = False):
+    document = await services.db.progress.find_one({'_id': player_id}) or {}
+    return serialize_progress(document, packed)
+
+@api_router.post("/progress/{player_id}/sync")
+async def sync_player_progress(player_id: str, input: ProgressSync, packed: bool = False):
+    try:
+        deltas = [LevelDelta(**delta.dict()) for delta in input.deltas]
+        return await sync_progress(services.db.progress, player_id, input.device_id, deltas, packed=packed)
+    except ValueError as error:
+        raise HTTPException(status_code=400, detail=str(error))
+
+@api_router.post("/leaderboard/scores")
+async def update_score(input: ScoreUpdate):
+    return services.leaderboard.update(input.player_id, input.score, input.levels_completed)
+
+def loaded_leaderboard():
+    # Ranks are partial until the persisted scores have been loaded in the background
+    if not services.leaderboard.loaded:
+        raise HTTPException(status_code=503, detail="Leaderboard is still loading", headers={'Retry-After': '5'})
+    return services.leaderboard
+
+@api_router.get("/leaderboard/top")
+@response_cache.cached(ttl=1)
+async def get_leaderboard(offset: int = 0, limit: int = 100):
+    loaded_leaderboard()
+    entries = services.leaderboard.page(max(offset, 0), max(1, min(limit, 100)))
+    return {"total": len(services.leaderboard), "entries": entries}
+
+@api_router.get("/leaderboard/players/{player_id}")
+async def get_player_rank(player_id: str, radius: int = 5):
+    entry = loaded_leaderboard().entry(player_id)
+    if entry is None:
+        raise HTTPException(status_code=404, detail="Player is not on the leaderboard")
+    return {**entry, "around": services.leaderboard.around(player_id, max(0, min(radius, 50)))}
+
+@api_router.get("/zones/{zone}/tables")
+async def list_zone_tables(zone: str):
+    browser = services.releases.current.table_browsers.get(zone)
+    if browser is None:
+        raise HTTPException(status_code=404, detail=f"Unknown zone: {zone}")
+    return {"zone": zone, "tables": [info.describe() for info in browser.tables.values()]}
+
+@api_router.get("/zones/{zone}/tables/{table}/rows")
+async def browse_table(zone: str, table: str, request: Request, after: Optional[str] = None, limit: int = 20):
+    async with services.limiter.guard(request, 'sandbox'):
+        with services.releases.acquire() as release:
+            browser = release.table_browsers.get(zone)
+            if browser is None:
+                raise HTTPException(status_code=404, detail=f"Unknown zone: {zone}")
+            try:
+                return await run_in_threadpool(browser.page, table, after, limit)
+            except KeyError:
+                raise HTTPException(status_code=404, detail=f"Unknown table in {zone}: {table}")
+            except ValueError as error:
+                raise HTTPException(status_code=400, detail=str(error))
+
+@api_router.get("/index-challenges")
+async def list_index_challenges():
+    challenges = services.releases.current.index_challenges.challenges
+    return {"challenges": [challenge.describe() for challenge in challenges.values()]}
+
+@api_router.get("/index-challenges/{challenge_id}")
+async def get_index_challenge(challenge_id: str):
+    with services.releases.acquire() as release:
+        try:
+            return await run_in_threadpool(release.index_challenges.baseline, challenge_id)
+        except KeyError:
+            raise HTTPException(status_code=404, detail=f"Unknown index challenge: {challenge_id}")
+
+@api_router.post("/index-challenges/{challenge_id}/attempts")
+async def attempt_index_challenge(challenge_id: str, input: IndexAttempt, request: Request):
+    async with services.limiter.guard(request, 'sandbox') as usage:
+        with services.releases.acquire() as release:
+            try:
+                result = await run_in_threadpool(release.index_challenges.attempt, challenge_id, input.statements)
+            except KeyError:
+                raise HTTPException(status_code=404, detail=f"Unknown index challenge: {challenge_id}")
+            except ValueError as error:
+                raise HTTPException(status_code=400, detail=str(error))
+        usage.steps = result['build_steps'] + result['result']['steps']
+        return result
+
+@api_router.post("/complete")
+async def complete_query(input: CompletionRequest):
+    completer = services.releases.current.completers.get(input.zone)
+    if completer is None:
+        raise HTTPException(status_code=404, detail=f"Unknown zone: {input.zone}")
+    return completer.complete(input.query, input.cursor, input.limit)
+
+@api_router.get("/search")
+async def search_reference(q: str, limit: int = 10):
+    return {"query": q, "results": services.releases.current.search_index.search(q, min(limit, 50))}
+
+def _content_response(request: Request, filename: Optional[str]) -> Response:
+    status, body, headers = services.releases.current.content_catalog.respond(
+        filename,
+        request.headers.get('accept-encoding', ''),
+        request.headers.get('if-none-match', ''),
+    )
+    if status == 404:
+        raise HTTPException(status_code=404, detail=f"Unknown content artifact: {filename}")
+    return Response(content=body, status_code=status, headers=headers)
+
+@api_router.get("/content/manifest")
+async def get_content_manifest(request: Request):
+    return _content_response(request, None)
+
+@api_router.get("/content/{filename}")
+async def get_content_artifact(filename: str, request: Request):
+    return _content_response(request, filename)
+
+@api_router.websocket("/preview/{zone}")
+async def live_preview(websocket: WebSocket, zone: str):
+    zone_images = services.releases.current.zone_images
+    if zone not in zone_images:
+        await websocket.close(code=4404)
+        return
+
+    await websocket.accept()
+
+    async def charge_steps(steps: int):
+        await services.limiter.charge(websocket, 'preview', steps / STEPS_PER_TOKEN)
+
+    channel = PreviewChannel(zone_images[zone], websocket.send_json, on_steps=charge_steps)
+    try:
+        while True:
+            message = await websocket.receive()
+            if message['type'] == 'websocket.disconnect':
+                break
+            try:
+                await services.limiter.admit(websocket, 'preview')
+            except HTTPException as error:
+                await channel.reject(None, error.detail)
+                continue
+            await channel.handle(message.get('text') or message.get('bytes'))
+    except WebSocketDisconnect:
+        pass
+    finally:
+        await channel.close()
+
+def create_app(settings: Optional[Settings] = None) -> FastAPI:
+    """Build the app: `uvicorn server:create_app --factory`.
+
+    Importing this module reads no settings and configures nothing, so the
+    app is only built, and .env only loaded, when the server asks for it.
+    Nothing slow happens until the lifespan starts it.
+    """
+    settings = settings or get_settings()
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        # Configure logging
+        logging.basicConfig(
+            level=logging.INFO,
+            format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+        )
+        await services.start(settings)
+        try:
+            yield
+        finally:
+            await services.stop()
 
-@app.on_event("shutdown")
-async def shutdown_db_client():
-    client.close()
+    app = FastAPI(lifespan=lifespan)
+    app.include_router(api_router)
+    app.add_middleware(
+        CORSMiddleware,
+        allow_credentials=True,
+        allow_origins=settings.cors_origins,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+    return app
@@ -0,0 +1,192 @@
+"""
+Runtime services, created during application startup.
+
+The Mongo client, zone pools, grader, sandboxes and background writers are
+built by Services.start() from the app lifespan, not at import time. Each
+startup phase is timed. The timings are logged and reported by
+GET /api/health, so slow cold starts show which phase to look at.
+
+Steps that need MongoDB (the TTL indexes and loading the leaderboard) run
+as background tasks once startup has finished, and are retried until they
+succeed. An unreachable database therefore cannot hold up startup.
+/api/health reports each step under `readiness`, and its status is
+"starting" until all of them are done.
+"""
+
+import asyncio
+import logging
+import secrets
+import time
+from contextlib import contextmanager
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from analytics import RollupWriter
+from archive import SubmissionArchive
+from classroom import ClassKeys, ClassroomHub
+from leaderboard import Leaderboard
+from rate_limit import RateLimiter, bucket_store
+from recommender import RecommendationJob
+from release import ReleaseManager
+from response_cache import ResponseCache, shared_backend
+from sandbox import SandboxManager
+from settings import Settings
+from retention import RetentionManager, default_policies, ensure_ttl_indexes
+from telemetry import EVENTS_COLLECTION, EventWriter
+
+
+logger = logging.getLogger(__name__)
+
+MAX_RETRY_SECONDS = 30.0
+
+
+class Services:
+    def __init__(self, response_cache: ResponseCache):
+        self.response_cache = response_cache
+        self.settings: Optional[Settings] = None
+        self.startup_phases: Dict[str, float] = {}
+        self.readiness: Dict[str, str] = {}
+        self._background: List[asyncio.Task] = []
+        self._client: Optional[AsyncIOMotorClient] = None
+        self._db = None
+
+        self.releases: Optional[ReleaseManager] = None
+        self.sandboxes: Optional[SandboxManager] = None
+        self.rollups: Optional[RollupWriter] = None
+        self.events: Optional[EventWriter] = None
+        self.leaderboard: Optional[Leaderboard] = None
+        self.limiter: Optional[RateLimiter] = None
+        self.archive: Optional[SubmissionArchive] = None
+        self.classroom: Optional[ClassroomHub] = None
+        self.retention: Optional[RetentionManager] = None
+        self.recommendations: Optional[RecommendationJob] = None
+
+    @property
+    def client(self) -> AsyncIOMotorClient:
+        """The Motor client, created on first use. Motor connects lazily as well."""
+        if self._client is None:
+            self._client = AsyncIOMotorClient(self.settings.require('mongo_url'))
+        return self._client
+
+    @property
+    def db(self):
+        if self._db is None:
+            self._db = self.client[self.settings.require('db_name')]
+        return self._db
+
+    @contextmanager
+    def _phase(self, name: str):
+        started_at = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.startup_phases[name] = round(time.perf_counter() - started_at, 4)
+
+    def _in_background(self, name: str, step: Callable[[], Awaitable[None]]):
+        """Run a startup step after startup, retrying with backoff until it succeeds."""
+        self.readiness[name] = 'pending'
+        started_at = time.perf_counter()
+
+        async def run():
+            delay = 1.0
+            while True:
+                try:
+                    await step()
+                    break
+                except Exception:
+                    logger.exception("Startup step %s failed; retrying in %.0fs", name, delay)
+                    self.readiness[name] = 'retrying'
+                    await asyncio.sleep(delay)
+                    delay = min(delay * 2, MAX_RETRY_SECONDS)
+            self.readiness[name] = 'ready'
+            self.startup_phases[name] = round(time.perf_counter() - started_at, 4)
+            logger.info("Startup step %s finished after %.2fs", name, self.startup_phases[name])
+
+        self._background.append(asyncio.create_task(run()))
+
+    @property
+    def ready(self) -> bool:
+        return all(state == 'ready' for state in self.readiness.values())
+
+    async def start(self, settings: Settings):
+        self.settings = settings
+        self.startup_phases = {}
+        self.readiness = {}
+
+        with self._phase('mongo_client'):
+            db = self.db
+        with self._phase('content_release'):
+            # Zone images, pools and the grader's expected results are CPU work
+            self.releases = await asyncio.to_thread(
+                ReleaseManager,
+                variant_count=settings.grading_variants,
+                poll_interval=settings.content_poll_interval,
+                on_swap=lambda release: setattr(self.sandboxes, 'pools', release.zone_pools),
+            )
+        with self._phase('sandboxes'):
+            self.sandboxes = SandboxManager(
+                self.releases.current.zone_pools,
+                memory_limit=settings.sandbox_memory_limit,
+                spill_dir=settings.sandbox_spill_dir,
+                spill_ttl=settings.sandbox_spill_ttl,
+            )
+        with self._phase('response_cache'):
+            self.response_cache.shared = shared_backend(settings.cache_redis_url)
+        with self._phase('rate_limiter'):
+            self.limiter = RateLimiter(bucket_store(settings.rate_limit_redis_url))
+        with self._phase('background_tasks'):
+            policies = default_policies(settings.status_check_retention_days, settings.event_retention_days)
+            self.leaderboard = Leaderboard(db.leaderboard)
+            self.rollups = RollupWriter(db.rollups)
+            self.events = EventWriter(db[EVENTS_COLLECTION], self.rollups)
+            self.archive = SubmissionArchive(settings.submission_archive_dir)
+            if settings.classroom_secret:
+                class_keys = ClassKeys(settings.classroom_secret.encode())
+            else:
+                logger.warning("CLASSROOM_SECRET is not set; class IDs are only valid in this process")
+                class_keys = ClassKeys(secrets.token_bytes(32))
+            self.classroom = ClassroomHub(class_keys, settings.classroom_tick)
+            self.retention = RetentionManager(db, policies, settings.retention_interval)
+            self.rollups.start()
+            self.archive.start()
+            self.classroom.start()
+            self.retention.start()
+            # Catch up on days that settled while the server was down
+            self.retention.request_flush()
+            if settings.recommendations_interval > 0:
+                self.recommendations = RecommendationJob(
+                    db,
+                    lambda: self.releases.current.game_content,
+                    settings.recommendations_interval,
+                )
+                self.recommendations.start()
+                # Restarts reset the timer, so check the lease now rather than a full interval later
+                self.recommendations.request_flush()
+            self.events.start()
+            self.leaderboard.start()
+            self.releases.start()
+            self._in_background('retention_indexes', lambda: ensure_ttl_indexes(db, policies))
+            self._in_background('leaderboard', self.leaderboard.load)
+
+        logger.info(
+            "Startup finished in %.2fs (%s)",
+            sum(self.startup_phases.values()),
+            ', '.join(f"{name} {seconds:.3f}s" for name, seconds in self.startup_phases.items()),
+        )
+
+    async def stop(self):
+        for task in self._background:
+            task.cancel()
+        await asyncio.gather(*self._background, return_exceptions=True)
+        self._background = []
+        for writer in (self.events, self.rollups, self.leaderboard, self.archive, self.classroom, self.retention,
+                       self.recommendations):
+            if writer is not None:
+                await writer.stop()
+        if self.releases is not None:
+            await self.releases.stop()
+        if self._client is not None:
+            self._client.close()
+            self._client = None
+            self._db = None
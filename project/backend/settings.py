@@ -0,0 +1,53 @@
+"""
+Backend settings.
+
+Nothing is read at import time. get_settings() loads `.env` and the process
+environment once, on first use. MONGO_URL and DB_NAME are only required
+when something actually connects to MongoDB, so tools and tests can import
+the app without them.
+"""
+
+import os
+from functools import lru_cache
+from pathlib import Path
+from typing import List, Mapping, Optional
+
+from dotenv import load_dotenv
+
+
+ROOT_DIR = Path(__file__).parent
+
+
+class Settings:
+    def __init__(self, environ: Mapping[str, str]):
+        self.mongo_url: Optional[str] = environ.get('MONGO_URL')
+        self.db_name: Optional[str] = environ.get('DB_NAME')
+        self.cors_origins: List[str] = environ.get('CORS_ORIGINS', '*').split(',')
+        self.grading_variants = int(environ.get('GRADING_VARIANTS', '4'))
+        self.content_poll_interval = float(environ.get('CONTENT_POLL_INTERVAL', '5'))
+        self.sandbox_memory_limit = int(environ.get('SANDBOX_MEMORY_LIMIT_MB', '512')) * 1024 * 1024
+        self.sandbox_spill_dir: Optional[str] = environ.get('SANDBOX_SPILL_DIR')
+        self.sandbox_spill_ttl = float(environ.get('SANDBOX_SPILL_TTL_HOURS', '24')) * 60 * 60
+        self.cache_redis_url: Optional[str] = environ.get('CACHE_REDIS_URL')
+        self.rate_limit_redis_url: Optional[str] = environ.get('RATE_LIMIT_REDIS_URL')
+        # Data the server writes lives outside the source tree by default
+        data_dir = Path(environ.get('XDG_DATA_HOME') or Path.home() / '.local' / 'share') / 'sql-survival'
+        self.submission_archive_dir = Path(environ.get('SUBMISSION_ARCHIVE_DIR') or data_dir / 'submission-archive')
+        self.classroom_tick = float(environ.get('CLASSROOM_TICK_SECONDS', '1'))
+        self.classroom_secret: Optional[str] = environ.get('CLASSROOM_SECRET')
+        self.status_check_retention_days = int(environ.get('STATUS_CHECK_RETENTION_DAYS', '7'))
+        self.event_retention_days = int(environ.get('EVENT_RETENTION_DAYS', '30'))
+        self.retention_interval = float(environ.get('RETENTION_INTERVAL_SECONDS', '3600'))
+        self.recommendations_interval = float(environ.get('RECOMMENDATIONS_INTERVAL_HOURS', '6')) * 60 * 60
+
+    def require(self, name: str) -> str:
+        value = getattr(self, name)
+        if not value:
+            raise RuntimeError(f"{name.upper()} must be set in the environment or backend/.env")
+        return value
+
+
+@lru_cache(maxsize=None)
+def get_settings() -> Settings:
+    load_dotenv(ROOT_DIR / '.env')
+    return Settings(os.environ)
@@ -0,0 +1,450 @@
+"""
+Server-side SQL engine for SQL Survival.
+
+Mirrors frontend/src/utils/sqlEngine.js. Zone databases are built from the
+exact setup SQL the client runs (parsed out of sqlEngine.js), so anything the
+backend executes or grades sees the same tables and seed rows as the player.
+"""
+
+import os
+import queue
+import re
+import sqlite3
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+
+CONTENT_DIR = Path(os.environ.get(
+    'CONTENT_DIR',
+    Path(__file__).parent.parent / 'frontend' / 'src' / 'utils'
+))
+
+ZONE_SETUP_FUNCTIONS = {
+    'beach': 'setupBeachDatabase',
+    'jungle': 'setupJungleDatabase',
+    'ruins': 'setupRuinsDatabase',
+    'lessons': 'setupLessonsDatabase',
+}
+
+
+def load_zone_setup_sql(source: Optional[str] = None) -> Dict[str, str]:
+    """Extract each zone's setup SQL from sqlEngine.js, in execution order."""
+    if source is None:
+        source = (CONTENT_DIR / 'sqlEngine.js').read_text(encoding='utf-8')
+
+    setup_sql = {}
+    for zone, function_name in ZONE_SETUP_FUNCTIONS.items():
+        match = re.search(
+            rf"const {function_name} = \(db\) => \{{(.*?)\n\}};", source, re.S
+        )
+        if not match:
+            raise ValueError(f"Setup function {function_name} not found in sqlEngine.js")
+        chunks = re.findall(r"db\.exec\(`(.*?)`\)", match.group(1), re.S)
+        setup_sql[zone] = "\n".join(chunks)
+    return setup_sql
+
+
+def build_zone_image(setup_sql: str) -> bytes:
+    """Run a zone's setup SQL in memory and return the serialized database."""
+    conn = sqlite3.connect(':memory:')
+    try:
+        conn.executescript(setup_sql)
+        conn.commit()
+        return conn.serialize()
+    finally:
+        conn.close()
+
+
+def build_zone_images(setup_sql: Optional[Dict[str, str]] = None) -> Dict[str, bytes]:
+    if setup_sql is None:
+        setup_sql = load_zone_setup_sql()
+    return {zone: build_zone_image(sql) for zone, sql in setup_sql.items()}
+
+
+# Compiled statements kept per connection: every reference query of the
+# largest zone plus plenty of room for player queries
+STATEMENT_CACHE_SIZE = 256
+
+# Literals and comments are kept verbatim; line comments keep their newline
+SQL_TOKEN_PATTERN = re.compile(
+    r"'(?:[^']|'')*(?:'|$)|\"(?:[^\"]|\"\")*(?:\"|$)|`[^`]*`|\[[^\]]*\]|--[^\n]*\n?|/\*.*?(?:\*/|$)|(\s+)",
+    re.S,
+)
+
+
+def normalize_sql(query: str) -> str:
+    """Canonical SQL text, so queries that differ only in spacing or a trailing
+    semicolon share a compiled statement."""
+    normalized = SQL_TOKEN_PATTERN.sub(
+        lambda match: ' ' if match.group(1) else match.group(0), query.strip()
+    )
+    return normalized.rstrip('; ') or normalized
+
+
+class StatementCache:
+    """Hit and miss counts for a connection's prepared-statement cache.
+
+    sqlite3 keeps an LRU of compiled statements per connection, keyed by SQL
+    text, and only parses and plans a query on a miss. It does not expose
+    its counters, so this mirrors the LRU's keys with the same capacity.
+    """
+
+    def __init__(self, capacity: int = STATEMENT_CACHE_SIZE):
+        self.capacity = capacity
+        self.hits = 0
+        self.misses = 0
+        self._keys: "OrderedDict[str, None]" = OrderedDict()
+
+    def record(self, sql: str):
+        if sql in self._keys:
+            self.hits += 1
+            self._keys.move_to_end(sql)
+            return
+        self.misses += 1
+        self._keys[sql] = None
+        if len(self._keys) > self.capacity:
+            self._keys.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+
+# Authorizer access levels for connections that run player SQL
+READ_ONLY = 'read_only'
+SANDBOX = 'sandbox'
+
+# Size caps on restricted connections. SQLite checks them as each value is
+# built, so one statement cannot allocate a huge string or blob (zeroblob,
+# randomblob, replace, group_concat) inside its VM step budget.
+MAX_VALUE_LENGTH = 64 * 1024
+MAX_SQL_LENGTH = 64 * 1024
+
+# Largest database a sandbox connection may grow to
+MAX_SANDBOX_DATABASE_BYTES = 64 * 1024 * 1024
+
+READ_ACTIONS = frozenset({
+    sqlite3.SQLITE_SELECT, sqlite3.SQLITE_READ, sqlite3.SQLITE_FUNCTION, sqlite3.SQLITE_RECURSIVE,
+})
+
+WRITE_ACTIONS = frozenset({
+    sqlite3.SQLITE_INSERT, sqlite3.SQLITE_UPDATE, sqlite3.SQLITE_DELETE,
+    sqlite3.SQLITE_CREATE_TABLE, sqlite3.SQLITE_CREATE_INDEX, sqlite3.SQLITE_CREATE_VIEW,
+    sqlite3.SQLITE_CREATE_TRIGGER, sqlite3.SQLITE_DROP_TABLE, sqlite3.SQLITE_DROP_INDEX,
+    sqlite3.SQLITE_DROP_VIEW, sqlite3.SQLITE_DROP_TRIGGER, sqlite3.SQLITE_ALTER_TABLE,
+    sqlite3.SQLITE_REINDEX, sqlite3.SQLITE_ANALYZE, sqlite3.SQLITE_TRANSACTION, sqlite3.SQLITE_SAVEPOINT,
+})
+
+# Pragmas that only describe the schema; every other pragma is denied
+INTROSPECTION_PRAGMAS = frozenset({
+    'table_info', 'table_xinfo', 'index_list', 'index_info', 'index_xinfo',
+    'foreign_key_list', 'page_count', 'page_size',
+})
+
+
+class ZoneConnection(sqlite3.Connection):
+    """A connection that tracks how often its statements come from the cache.
+
+    restrict() installs an authorizer for player SQL. READ_ONLY allows only
+    reads, and SANDBOX also allows DML and DDL on `main`. Both deny ATTACH,
+    DETACH (and so VACUUM, which attaches its target), temp objects and
+    every pragma that is not pure introspection. While restricted, strings,
+    blobs and SQL text are capped at max_value_length and MAX_SQL_LENGTH. `denied_write` records that
+    a statement was refused because it writes, which is how the sandbox
+    manager tells a player's first write from any other error.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.statements = StatementCache(kwargs.get('cached_statements', 128))
+        self.access: Optional[str] = None
+        self.denied_write = False
+        self._default_limits = {
+            limit: self.getlimit(limit) for limit in (sqlite3.SQLITE_LIMIT_LENGTH, sqlite3.SQLITE_LIMIT_SQL_LENGTH)
+        }
+
+    def restrict(self, access: Optional[str], max_value_length: int = MAX_VALUE_LENGTH):
+        self.access = access
+        self.set_authorizer(self._authorize if access else None)
+        if access:
+            self.setlimit(sqlite3.SQLITE_LIMIT_LENGTH, max_value_length)
+            self.setlimit(sqlite3.SQLITE_LIMIT_SQL_LENGTH, MAX_SQL_LENGTH)
+        else:
+            for limit, value in self._default_limits.items():
+                self.setlimit(limit, value)
+
+    def _authorize(self, action, name, detail, database, trigger) -> int:
+        if action in READ_ACTIONS:
+            return sqlite3.SQLITE_OK
+        if action == sqlite3.SQLITE_PRAGMA:
+            return sqlite3.SQLITE_OK if name in INTROSPECTION_PRAGMAS else sqlite3.SQLITE_DENY
+        if action in WRITE_ACTIONS:
+            if self.access == SANDBOX and database in (None, 'main'):
+                return sqlite3.SQLITE_OK
+            self.denied_write = True
+        return sqlite3.SQLITE_DENY
+
+    def execute(self, sql, *args):
+        self.statements.record(sql)
+        return super().execute(sql, *args)
+
+
+def statement_cache_stats(pools: Iterable['ZonePool']) -> dict:
+    """Combined statement cache counters of every connection in the pools."""
+    hits = misses = entries = 0
+    for conn in (conn for pool in pools for conn in pool._all):
+        hits += conn.statements.hits
+        misses += conn.statements.misses
+        entries += len(conn.statements)
+    lookups = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_rate': round(hits / lookups, 4) if lookups else None,
+        'entries': entries,
+    }
+
+
+def create_zone_database(image: bytes, read_only: bool = False, sandbox: bool = False) -> sqlite3.Connection:
+    """Open a private in-memory copy of a zone image.
+
+    read_only and sandbox connections run player SQL and get the matching
+    authorizer (see ZoneConnection). Without either, the connection is
+    unrestricted, for the server's own setup work.
+    """
+    conn = sqlite3.connect(
+        ':memory:', check_same_thread=False, isolation_level=None,
+        factory=ZoneConnection, cached_statements=STATEMENT_CACHE_SIZE,
+    )
+    conn.deserialize(image)
+    if read_only:
+        conn.execute("PRAGMA query_only = ON")
+        conn.restrict(READ_ONLY)
+    elif sandbox:
+        page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+        conn.execute(f"PRAGMA max_page_count = {MAX_SANDBOX_DATABASE_BYTES // page_size}")
+        conn.restrict(SANDBOX)
+    return conn
+
+
+def scale_zone_image(image: bytes, factor: int) -> bytes:
+    """Return a copy of a zone image with every table's rows repeated `factor` times.
+
+    Copies get primary keys offset past the original rows, and foreign keys
+    are offset the same way, so joins in a copy match that copy's rows.
+    """
+    conn = create_zone_database(image)
+    try:
+        tables = [row[0] for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%'"
+        )]
+        keys = {}
+        for table in tables:
+            primary_key = next(
+                (column[1] for column in conn.execute(f'PRAGMA table_info("{table}")') if column[5]), None
+            )
+            # Tables without a declared key are repeated by rowid
+            key_expression = f'"{primary_key}"' if primary_key else 'rowid'
+            stride = conn.execute(f'SELECT MAX({key_expression}) FROM "{table}"').fetchone()[0]
+            keys[table] = (primary_key, key_expression, stride or 0)
+
+        conn.execute("BEGIN")
+        for table, (primary_key, key_expression, stride) in keys.items():
+            offsets = {
+                foreign_key[3]: keys[foreign_key[2]][2] if foreign_key[2] in keys else 0
+                for foreign_key in conn.execute(f'PRAGMA foreign_key_list("{table}")')
+            }
+            if primary_key:
+                offsets[primary_key] = stride
+            columns = [column[1] for column in conn.execute(f'PRAGMA table_info("{table}")')]
+            original = f'WHERE {key_expression} <= {stride}'
+            for copy in range(1, factor):
+                select = ', '.join(
+                    f'"{column}" + {offsets[column] * copy}' if offsets.get(column) else f'"{column}"'
+                    for column in columns
+                )
+                conn.execute(f'INSERT INTO "{table}" SELECT {select} FROM "{table}" {original}')
+        conn.execute("COMMIT")
+        return conn.serialize()
+    finally:
+        conn.close()
+
+
+def database_size(conn: sqlite3.Connection) -> int:
+    """Bytes held by an in-memory database (page_count * page_size)."""
+    page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+    page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+    return page_count * page_size
+
+
+class ZonePool:
+    """A fixed-size pool of read-only connections opened from one zone image."""
+
+    def __init__(self, zone: str, image: bytes, size: int = 4):
+        self.zone = zone
+        self.image = image
+        self._all = [create_zone_database(image, read_only=True) for _ in range(size)]
+        self._connections = queue.Queue()
+        for conn in self._all:
+            self._connections.put(conn)
+
+    @contextmanager
+    def connection(self):
+        conn = self._connections.get()
+        try:
+            yield conn
+        finally:
+            self._connections.put(conn)
+
+    def warm(self, queries: Iterable[str]):
+        """Compile queries into every connection's statement cache ahead of the first request."""
+        queries = [normalize_sql(query) for query in queries]
+        connections = [self._connections.get() for _ in self._all]
+        try:
+            for conn in connections:
+                for query in queries:
+                    try:
+                        conn.execute(query).fetchall()
+                    except (sqlite3.Error, sqlite3.Warning):
+                        pass
+                # Hit rates describe traffic after warm-up
+                conn.statements.hits = conn.statements.misses = 0
+        finally:
+            for conn in connections:
+                self._connections.put(conn)
+
+    def statement_stats(self) -> dict:
+        return statement_cache_stats([self])
+
+    def close(self):
+        while not self._connections.empty():
+            self._connections.get_nowait().close()
+
+
+# VM steps one call may run before it is stopped: about half a second of work,
+# and a hundred times what the heaviest reference query needs at 100x data
+QUERY_STEP_BUDGET = 20_000_000
+
+QUERY_TOO_EXPENSIVE = (
+    "Query is too expensive and was stopped. "
+    "Check for a join without a condition or a recursive query without a limit."
+)
+
+
+class StepCounter:
+    """Approximate count of SQLite VM instructions run on a connection.
+
+    With a budget, the statement is interrupted once the count passes it.
+    """
+
+    GRANULARITY = 1000
+
+    def __init__(self, granularity: int = GRANULARITY, budget: Optional[int] = None):
+        self.granularity = granularity
+        self.budget = budget
+        self.steps = 0
+
+    @property
+    def exhausted(self) -> bool:
+        return self.budget is not None and self.steps > self.budget
+
+    def _tick(self) -> int:
+        self.steps += self.granularity
+        return self.exhausted
+
+
+@contextmanager
+def count_vm_steps(
+    database: sqlite3.Connection,
+    granularity: int = StepCounter.GRANULARITY,
+    budget: Optional[int] = None,
+):
+    """Count VM steps in multiples of `granularity`. Finer counts cost more per instruction.
+
+    Statements that run past `budget` steps fail with sqlite3.OperationalError('interrupted').
+    """
+    counter = StepCounter(granularity, budget)
+    database.set_progress_handler(counter._tick, granularity)
+    try:
+        yield counter
+    finally:
+        database.set_progress_handler(None, granularity)
+
+
+def execute_user_query(query: str, database: sqlite3.Connection) -> dict:
+    """Execute a query and return {success, result, error} like the client engine."""
+    try:
+        clean_query = normalize_sql(query)
+        if not clean_query:
+            return {
+                'success': False,
+                'result': None,
+                'error': 'Query cannot be empty'
+            }
+
+        cursor = database.execute(clean_query)
+        if cursor.description is None:
+            return {
+                'success': True,
+                'result': [],
+                'error': None
+            }
+
+        columns = [column[0] for column in cursor.description]
+        rows = [dict(zip(columns, row)) for row in cursor.fetchall()]
+        return {
+            'success': True,
+            'result': rows,
+            'error': None
+        }
+
+    except (sqlite3.Error, sqlite3.Warning) as error:
+        message = str(error)
+        if message == 'interrupted':
+            # The step budget's progress handler stopped it (see count_vm_steps)
+            message = QUERY_TOO_EXPENSIVE
+        return {
+            'success': False,
+            'result': None,
+            'error': message
+        }
+
+
+def get_database_schema(database: sqlite3.Connection) -> Dict[str, List[str]]:
+    """Map each table name to its column names."""
+    schema = {}
+    tables = database.execute(
+        "SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%'"
+    ).fetchall()
+    for (table_name,) in tables:
+        columns = database.execute(f'PRAGMA table_info("{table_name}")').fetchall()
+        schema[table_name] = [column[1] for column in columns]
+    return schema
+
+
+def compare_results(user_result: Optional[list], expected_result: Optional[list]) -> bool:
+    """Row-by-row comparison with the same string coercion as compareResults."""
+    if user_result is None or expected_result is None:
+        return False
+
+    if len(user_result) != len(expected_result):
+        return False
+
+    for user_row, expected_row in zip(user_result, expected_result):
+        if sorted(user_row) != sorted(expected_row):
+            return False
+        for key in user_row:
+            if to_js_string(user_row[key]) != to_js_string(expected_row[key]):
+                return False
+
+    return True
+
+
+def to_js_string(value) -> str:
+    """String form of a value as JavaScript's String() would render it."""
+    if value is None:
+        return 'null'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Cold-start benchmark with an enforceable budget.
+
+Measures, each in a fresh interpreter:
+
+- import time of the app module, which must not build the app or read
+  settings
+- time for the app factory to build the app, measured separately
+- time to first response: from spawning uvicorn until GET /api/health
+  answers. The health response also carries the per-phase startup timings
+  that Services recorded.
+
+Exits non-zero when the median of any measurement exceeds its budget,
+so CI can run it as a gate. A real MongoDB at MONGO_URL is needed for the
+first-response run, because startup loads the leaderboard.
+
+Usage: python startup_benchmark.py [--runs 3] [--import-budget 1.5] [--build-budget 0.5]
+                                   [--first-response-budget 5]
+"""
+
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+
+BACKEND_DIR = Path(__file__).parent
+
+IMPORT_SNIPPET = (
+    "import time, importlib; started_at = time.perf_counter(); "
+    "module = importlib.import_module({module!r}); imported_at = time.perf_counter(); "
+    "getattr(module, {factory!r})(); "
+    "print(imported_at - started_at, time.perf_counter() - imported_at)"
+)
+
+
+def measure_import(module: str, factory: str):
+    """Seconds to import the app module, and then to build the app with its factory."""
+    output = subprocess.run(
+        [sys.executable, '-c', IMPORT_SNIPPET.format(module=module, factory=factory)],
+        cwd=BACKEND_DIR, capture_output=True, text=True, check=True,
+    ).stdout
+    import_time, build_time = output.strip().splitlines()[-1].split()
+    return float(import_time), float(build_time)
+
+
+def slowest_imports(module: str, count: int = 10):
+    """Modules with the highest cumulative import time, from `python -X importtime`."""
+    stderr = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f"import {module}"],
+        cwd=BACKEND_DIR, capture_output=True, text=True, check=True,
+    ).stderr
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        rows.append((int(cumulative) / 1e6, name.strip()))
+    return sorted(rows, reverse=True)[:count]
+
+
+def measure_first_response(app: str, timeout: float):
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+
+    started_at = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'uvicorn', app, '--factory', '--port', str(port), '--log-level', 'warning'],
+        cwd=BACKEND_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+    )
+    try:
+        while time.perf_counter() - started_at < timeout:
+            if process.poll() is not None:
+                raise RuntimeError(f"Server exited during startup:\n{process.stderr.read().decode()}")
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/api/health", timeout=1) as response:
+                    health = json.loads(response.read())
+                return time.perf_counter() - started_at, health['startup_phases']
+            except (urllib.error.URLError, ConnectionError):
+                time.sleep(0.02)
+        raise RuntimeError(f"No response within {timeout}s")
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def main():
+    load_dotenv(BACKEND_DIR / '.env')
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--app', default='server:create_app', help='uvicorn app factory to start')
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--import-budget', type=float, default=float(os.environ.get('IMPORT_BUDGET_SECONDS', '1.5')))
+    parser.add_argument('--build-budget', type=float, default=float(os.environ.get('BUILD_BUDGET_SECONDS', '0.5')))
+    parser.add_argument('--first-response-budget', type=float,
+                        default=float(os.environ.get('FIRST_RESPONSE_BUDGET_SECONDS', '5')))
+    args = parser.parse_args()
+    module, factory = args.app.split(':')
+
+    import_times, build_times = zip(*(measure_import(module, factory) for _ in range(args.runs)))
+    import_time = statistics.median(import_times)
+    print(f"import {module}: {import_time:.3f}s median of {args.runs} (budget {args.import_budget}s)")
+    for seconds, name in slowest_imports(module):
+        print(f"  {seconds:7.3f}s  {name}")
+    build_time = statistics.median(build_times)
+    print(f"build {args.app}: {build_time:.3f}s median of {args.runs} (budget {args.build_budget}s)")
+
+    first_responses = []
+    for _ in range(args.runs):
+        seconds, phases = measure_first_response(args.app, timeout=args.first_response_budget * 3)
+        first_responses.append(seconds)
+    first_response = statistics.median(first_responses)
+    print(f"first response: {first_response:.3f}s median of {args.runs} (budget {args.first_response_budget}s)")
+    for name, seconds in phases.items():
+        print(f"  {seconds:7.3f}s  {name}")
+
+    over_budget = []
+    if import_time > args.import_budget:
+        over_budget.append('import')
+    if build_time > args.build_budget:
+        over_budget.append('build')
+    if first_response > args.first_response_budget:
+        over_budget.append('first response')
+    if over_budget:
+        print(f"Over budget: {', '.join(over_budget)}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
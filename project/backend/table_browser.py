@@ -0,0 +1,122 @@
+"""
+Keyset-paginated table browsing for the schema panel.
+
+A page is read as `WHERE key > :after ORDER BY key LIMIT n` on the table's
+primary key, or on its rowid when it has no single-column key. Each page
+costs one index seek plus n rows however deep the player has scrolled,
+whereas OFFSET would step over every earlier row. Table names are looked
+up in the zone schema before any SQL is built.
+
+Row counts are estimates from ANALYZE statistics (sqlite_stat1), gathered
+once per content release on a scratch copy of each zone. analysis_limit
+samples large tables instead of scanning them. The zone images themselves
+are not analyzed, so query plans stay the same as in the client's sql.js.
+"""
+
+import sqlite3
+from typing import Dict, List, Optional
+
+from sql_engine import ZonePool, create_zone_database
+
+
+MAX_PAGE_SIZE = 100
+ANALYSIS_LIMIT = 1000
+
+
+class TableInfo:
+    def __init__(self, name: str, columns: List[str], key: Optional[str], key_is_integer: bool, estimated_rows: int):
+        self.name = name
+        self.columns = columns
+        self.key = key
+        self.key_is_integer = key_is_integer
+        self.estimated_rows = estimated_rows
+
+    @property
+    def key_expression(self) -> str:
+        return f'"{self.key}"' if self.key else 'rowid'
+
+    def describe(self) -> dict:
+        return {
+            'table': self.name,
+            'key': self.key or 'rowid',
+            'columns': self.columns,
+            'estimated_rows': self.estimated_rows,
+        }
+
+
+def estimate_row_counts(image: bytes) -> Dict[str, int]:
+    """Approximate rows per table from sqlite_stat1, computed on a scratch copy of the image."""
+    conn = create_zone_database(image)
+    try:
+        conn.execute(f"PRAGMA analysis_limit = {ANALYSIS_LIMIT}")
+        conn.execute("ANALYZE")
+        estimates: Dict[str, int] = {}
+        for table, stat in conn.execute("SELECT tbl, stat FROM sqlite_stat1"):
+            # The first number of every stat row is the (estimated) row count
+            estimates[table] = max(estimates.get(table, 0), int(stat.split()[0]))
+        return estimates
+    finally:
+        conn.close()
+
+
+def describe_tables(conn: sqlite3.Connection, estimates: Dict[str, int]) -> Dict[str, TableInfo]:
+    tables = {}
+    for (name,) in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%' ORDER BY name"
+    ).fetchall():
+        columns = conn.execute(f'PRAGMA table_info("{name}")').fetchall()
+        key_columns = [column for column in columns if column[5]]
+        # A single-column key is ordered by its index; anything else pages by rowid
+        key = key_columns[0] if len(key_columns) == 1 else None
+        tables[name] = TableInfo(
+            name,
+            [column[1] for column in columns],
+            key[1] if key else None,
+            key is None or 'INT' in key[2].upper(),
+            estimates.get(name, 0),
+        )
+    return tables
+
+
+class TableBrowser:
+    def __init__(self, pool: ZonePool):
+        self.pool = pool
+        with pool.connection() as conn:
+            self.tables = describe_tables(conn, estimate_row_counts(pool.image))
+
+    def page(self, table: str, after: Optional[str] = None, limit: int = 20) -> dict:
+        """Rows with keys after `after`, in key order. Pass `next_after` back to get the next page."""
+        info = self.tables.get(table)
+        if info is None:
+            raise KeyError(table)
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+        parameters: list = []
+        where = ''
+        if after is not None:
+            try:
+                parameters.append(int(after) if info.key_is_integer else after)
+            except ValueError:
+                raise ValueError(f"Invalid cursor for {table}: {after!r}")
+            where = f'WHERE {info.key_expression} > ?'
+        parameters.append(limit + 1)
+
+        with self.pool.connection() as conn:
+            cursor = conn.execute(
+                f'SELECT {info.key_expression}, * FROM "{info.name}" {where} '
+                f'ORDER BY {info.key_expression} LIMIT ?',
+                parameters,
+            )
+            columns = [column[0] for column in cursor.description[1:]]
+            rows = cursor.fetchall()
+
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        return {
+            **info.describe(),
+            'rows': [dict(zip(columns, row[1:])) for row in rows],
+            'next_after': rows[-1][0] if has_more else None,
+        }
+
+
+def build_table_browsers(pools: Dict[str, ZonePool]) -> Dict[str, TableBrowser]:
+    return {zone: TableBrowser(pool) for zone, pool in pools.items()}
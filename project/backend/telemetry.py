@@ -0,0 +1,218 @@
+"""
+Gameplay telemetry ingest.
+
+Clients batch events locally and POST them as NDJSON, one event per line:
+
+    {"type": "hint", "zone": "beach", "level": 3, "ts": 1760000000000, "player_id": "p1"}
+
+Validation is a fast path of plain type checks on the decoded dicts. No
+Pydantic model is built per event, which costs more than the JSON decode
+itself at these volumes. The zone and level must name a real task, so
+rollup documents stay bounded, and `ts` must be a finite time within a day
+of the server clock. Each event bumps the matching rollup counter (see
+analytics), except `query` events: submissions and correct answers are
+counted once, by /api/grade, which grades the query itself. Query events
+are still stored for the daily summaries and offline analysis.
+
+Accepted events are buffered across requests and stored in
+`event_buckets`, not as one document each. A bucket holds up to
+batch_size events from the same UTC hour as one zlib-compressed NDJSON
+payload, with the time range, count, types and zones stored alongside:
+
+    {"start": <datetime>, "end": <datetime>, "count": 5000,
+     "types": ["hint", "query"], "zones": ["beach"], "payload": <binary>}
+
+A day of events is a few dozen small documents, so the indexes and the
+hot buckets stay in RAM. Readers select buckets by `end` and decompress
+them with iter_bucket_events. retention.py expires old buckets after
+summarizing them.
+"""
+
+import asyncio
+import json
+import logging
+import zlib
+from collections import Counter, defaultdict
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from bson import Binary
+from pymongo.errors import BulkWriteError
+
+from analytics import PeriodicFlusher, RollupWriter
+from progress import ZONE_LEVEL_COUNTS
+
+try:
+    import orjson
+    _loads = orjson.loads
+except ImportError:
+    _loads = json.loads
+
+
+logger = logging.getLogger(__name__)
+
+EVENTS_COLLECTION = 'event_buckets'
+
+# The time-series collection events were written to before buckets
+LEGACY_EVENTS_COLLECTION = 'events'
+
+# Event type -> rollup counter it increments, if any
+EVENT_TYPES = {
+    'query': None,
+    'hint': 'hints',
+    'skip': 'skips',
+    'completion': 'completions',
+}
+
+MAX_EVENTS_PER_REQUEST = 10_000
+MAX_CLOCK_SKEW_MS = 24 * 60 * 60 * 1000
+MAX_EXTRA_FIELDS = 8
+COMPRESSION_LEVEL = 6
+
+
+def parse_events(body: bytes, now_ms: float,
+                 level_counts: Optional[Dict[str, int]] = None) -> Tuple[List[dict], List[int]]:
+    """Decode and validate an NDJSON batch. Returns (documents, rejected line numbers).
+
+    level_counts maps each zone to its number of levels, ZONE_LEVEL_COUNTS by default.
+    """
+    level_counts = ZONE_LEVEL_COUNTS if level_counts is None else level_counts
+    lines = body.split(b'\n')
+    if len(lines) > MAX_EVENTS_PER_REQUEST + 1:
+        raise ValueError(f"At most {MAX_EVENTS_PER_REQUEST} events per request")
+
+    documents = []
+    rejected = []
+    for line_number, line in enumerate(lines):
+        if not line.strip():
+            continue
+        try:
+            event = _loads(line)
+        except ValueError:
+            rejected.append(line_number)
+            continue
+
+        if type(event) is not dict:
+            rejected.append(line_number)
+            continue
+        event_type = event.pop('type', None)
+        zone = event.pop('zone', None)
+        level = event.pop('level', None)
+        ts = event.pop('ts', None)
+        player_id = event.pop('player_id', None)
+        if (
+            event_type not in EVENT_TYPES
+            or type(zone) is not str
+            or type(level) is not int or not 1 <= level <= level_counts.get(zone, 0)
+            # Chained comparisons also reject NaN, and never convert a huge int to float
+            or type(ts) not in (int, float) or not now_ms - MAX_CLOCK_SKEW_MS <= ts <= now_ms + MAX_CLOCK_SKEW_MS
+            or (player_id is not None and type(player_id) is not str)
+            or len(event) > MAX_EXTRA_FIELDS
+        ):
+            rejected.append(line_number)
+            continue
+
+        documents.append({
+            'ts': datetime.utcfromtimestamp(ts / 1000),
+            'meta': {'type': event_type, 'zone': zone, 'level': level},
+            'player_id': player_id,
+            'data': event,
+        })
+    return documents, rejected
+
+
+def encode_buckets(documents: List[dict], bucket_size: int) -> List[dict]:
+    """Group parsed events by UTC hour into bucket documents of at most bucket_size events."""
+    by_hour: Dict[datetime, List[dict]] = defaultdict(list)
+    for document in documents:
+        by_hour[document['ts'].replace(minute=0, second=0, microsecond=0)].append(document)
+
+    buckets = []
+    for hour_documents in by_hour.values():
+        for offset in range(0, len(hour_documents), bucket_size):
+            chunk = hour_documents[offset:offset + bucket_size]
+            lines = [
+                json.dumps({
+                    'ts': int(_epoch_ms(document['ts'])),
+                    **document['meta'],
+                    'player_id': document['player_id'],
+                    'data': document['data'],
+                }, separators=(',', ':'))
+                for document in chunk
+            ]
+            buckets.append({
+                'start': min(document['ts'] for document in chunk),
+                'end': max(document['ts'] for document in chunk),
+                'count': len(chunk),
+                'types': sorted({document['meta']['type'] for document in chunk}),
+                'zones': sorted({document['meta']['zone'] for document in chunk}),
+                'payload': Binary(zlib.compress('\n'.join(lines).encode(), COMPRESSION_LEVEL)),
+            })
+    return buckets
+
+
+def iter_bucket_events(bucket: dict) -> Iterator[dict]:
+    """The events of one bucket, in the shape parse_events produces."""
+    for line in zlib.decompress(bucket['payload']).split(b'\n'):
+        event = _loads(line)
+        yield {
+            'ts': datetime.utcfromtimestamp(event['ts'] / 1000),
+            'meta': {'type': event['type'], 'zone': event['zone'], 'level': event['level']},
+            'player_id': event['player_id'],
+            'data': event['data'],
+        }
+
+
+def _epoch_ms(value: datetime) -> float:
+    return (value - datetime(1970, 1, 1)).total_seconds() * 1000
+
+
+class EventWriter(PeriodicFlusher):
+    def __init__(
+        self,
+        collection,
+        rollups: RollupWriter,
+        flush_interval: float = 0.5,
+        batch_size: int = 5000,
+        max_buffered: int = 500_000,
+    ):
+        super().__init__(flush_interval)
+        self.collection = collection
+        self.rollups = rollups
+        self.batch_size = batch_size
+        self.max_buffered = max_buffered
+        self._buffer: List[dict] = []
+
+    def accept(self, documents: List[dict]) -> int:
+        """Buffer parsed events and update rollups. Returns how many were accepted."""
+        if len(self._buffer) + len(documents) > self.max_buffered:
+            return 0
+
+        self._buffer.extend(documents)
+
+        # Collapse the batch to one rollup increment per (zone, level, day).
+        increments = defaultdict(Counter)
+        for document in documents:
+            meta = document['meta']
+            counter = EVENT_TYPES[meta['type']]
+            if counter is not None:
+                increments[(meta['zone'], meta['level'], document['ts'].date())][counter] += 1
+        for (zone, level, day), counts in increments.items():
+            self.rollups.record(zone, level, counts, datetime.combine(day, datetime.min.time()))
+
+        if len(self._buffer) >= self.batch_size:
+            self.request_flush()
+        return len(documents)
+
+    async def flush(self):
+        while self._buffer:
+            batch, self._buffer = self._buffer[:self.batch_size], self._buffer[self.batch_size:]
+            buckets = await asyncio.to_thread(encode_buckets, batch, self.batch_size)
+            try:
+                await self.collection.insert_many(buckets, ordered=False)
+            except BulkWriteError as error:
+                logger.warning("Dropped %d invalid telemetry buckets", len(error.details.get('writeErrors', [])))
+            except Exception:
+                logger.exception("Telemetry flush failed; keeping %d events for retry", len(batch))
+                self._buffer[:0] = batch
+                return
@@ -1,6 +1,7 @@
 import React, { createContext, useContext, useState, useEffect } from 'react';
 import { createZoneDatabase, executeUserQuery, getDatabaseSchema, compareResults } from '../utils/sqlEngine';
-import { gameTasks } from '../utils/gameData';
+import { loadZoneTasks } from '../utils/contentLoader';
+import { serializeGameState, parseGameState } from '../utils/progressCodec';
 
 const GameContext = createContext();
 
@@ -64,6 +65,7 @@ export const GameProvider = ({ children }) => {
 
   const [databases, setDatabases] = useState({});
   const [isLoading, setIsLoading] = useState(false);
+  const [zoneTasks, setZoneTasks] = useState({});
 
   // Load progress from localStorage on mount
   useEffect(() => {
@@ -71,7 +73,7 @@ export const GameProvider = ({ children }) => {
       try {
         const saved = localStorage.getItem('sqlSurvivalProgress');
         if (saved) {
-          const parsedState = JSON.parse(saved);
+          const parsedState = parseGameState(saved);
           
           // Validate the loaded state and merge with defaults
           const defaultState = getDefaultGameState();
@@ -124,7 +126,7 @@ export const GameProvider = ({ children }) => {
   useEffect(() => {
     const saveGameProgress = () => {
       try {
-        localStorage.setItem('sqlSurvivalProgress', JSON.stringify(gameState));
+        localStorage.setItem('sqlSurvivalProgress', serializeGameState(gameState));
         console.log('Game progress saved to localStorage:', {
           score: gameState.score,
           levelsCompleted: gameState.statistics.levelsCompleted,
@@ -231,7 +233,7 @@ export const GameProvider = ({ children }) => {
       // Manually save to localStorage immediately after state update
       setTimeout(() => {
         try {
-          localStorage.setItem('sqlSurvivalProgress', JSON.stringify(newState));
+          localStorage.setItem('sqlSurvivalProgress', serializeGameState(newState));
           console.log('IMMEDIATE SAVE: Game progress saved to localStorage after unlockNextLevel');
         } catch (error) {
           console.error('IMMEDIATE SAVE FAILED:', error);
@@ -317,7 +319,8 @@ export const GameProvider = ({ children }) => {
       }
 
       // Get the expected result by executing the expected query
-      const task = gameTasks[zone]?.[level - 1];
+      const tasks = await loadTasks(zone);
+      const task = tasks[level - 1];
       if (!task) {
         return {
           success: false,
@@ -392,9 +395,19 @@ export const GameProvider = ({ children }) => {
     }
   };
 
-  // Get task data for a zone and level
+  // Fetch a zone's tasks the first time it is entered
+  const loadTasks = async (zone) => {
+    const tasks = await loadZoneTasks(zone);
+    setZoneTasks(prev => (prev[zone] === tasks ? prev : { ...prev, [zone]: tasks }));
+    return tasks;
+  };
+
+  // Whether loadTasks has finished for a zone
+  const hasTasks = (zone) => zone in zoneTasks;
+
+  // Get task data for a zone and level, once the zone's tasks are loaded
   const getTask = (zone, level) => {
-    return gameTasks[zone]?.[level - 1] || null;
+    return zoneTasks[zone]?.[level - 1] || null;
   };
 
   // Reset game progress
@@ -455,7 +468,7 @@ export const GameProvider = ({ children }) => {
   // Manual save function for testing
   const manualSave = () => {
     try {
-      localStorage.setItem('sqlSurvivalProgress', JSON.stringify(gameState));
+      localStorage.setItem('sqlSurvivalProgress', serializeGameState(gameState));
       console.log('Manual save completed:', {
         score: gameState.score,
         levelsCompleted: gameState.statistics.levelsCompleted,
@@ -495,6 +508,8 @@ export const GameProvider = ({ children }) => {
     getZoneSchema,
     getTableData,
     getTask,
+    loadTasks,
+    hasTasks,
     initializeZoneDatabase,
     isLoading,
     resetGameProgress,
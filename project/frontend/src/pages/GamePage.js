@@ -10,7 +10,7 @@ import QueryExplanation from '../components/QueryExplanation';
 const GamePage = () => {
   const { zone } = useParams();
   const navigate = useNavigate();
-  const { gameState, unlockNextLevel, skipLevel, executeQuery, getZoneSchema, getTableData, getTask, isLoading, resetGameProgress, manualSave, isZoneCompleted } = useGame();
+  const { gameState, unlockNextLevel, skipLevel, executeQuery, getZoneSchema, getTableData, getTask, loadTasks, hasTasks, isLoading, resetGameProgress, manualSave, isZoneCompleted } = useGame();
   
   const [query, setQuery] = useState('');
   const [result, setResult] = useState(null);
@@ -60,6 +60,11 @@ const GamePage = () => {
 
   const theme = themes[zone] || themes.beach;
 
+  // Load this zone's tasks
+  useEffect(() => {
+    loadTasks(zone).catch(error => console.error('Failed to load tasks:', error));
+  }, [zone]);
+
   // Load schema on mount and when zone changes
   useEffect(() => {
     const loadSchema = async () => {
@@ -213,6 +218,14 @@ const GamePage = () => {
 
   const canSkip = currentLevelData?.attempts >= 3;
 
+  if (!hasTasks(zone)) {
+    return (
+      <div className="min-h-screen bg-gray-900 text-white flex items-center justify-center">
+        <Loader2 className="w-8 h-8 animate-spin text-gray-400" />
+      </div>
+    );
+  }
+
   if (!currentTask) {
     return (
       <div className="min-h-screen bg-gray-900 text-white flex items-center justify-center">
@@ -3,18 +3,19 @@ import { useNavigate } from 'react-router-dom';
 import { Button } from '../components/ui/button';
 import { Card, CardContent, CardHeader, CardTitle } from '../components/ui/card';
 import { Textarea } from '../components/ui/textarea';
-import { ArrowLeft, ArrowRight, Play, CheckCircle, BookOpen, ChevronRight, Eye, EyeOff, FileText, Database, Code, Target, Clock, AlertCircle } from 'lucide-react';
-import { lessons } from '../utils/lessonsData';
+import { ArrowLeft, ArrowRight, Play, CheckCircle, BookOpen, ChevronRight, Eye, EyeOff, FileText, Database, Code, Target, Clock, AlertCircle, Loader2 } from 'lucide-react';
+import { loadLessonIndex, loadLesson } from '../utils/contentLoader';
 import { createZoneDatabase, executeUserQuery, compareResults } from '../utils/sqlEngine';
 import QueryExplanation from '../components/QueryExplanation';
 
 // Helper function to get initial lesson index from localStorage
+// (checked against the lesson count once the lesson index has loaded)
 const getInitialLessonIndex = () => {
   try {
     const lastLesson = localStorage.getItem('sqlSurvivalLastLesson');
     if (lastLesson !== null) {
       const lessonIndex = parseInt(lastLesson, 10);
-      if (lessonIndex >= 0 && lessonIndex < lessons.length) {
+      if (lessonIndex >= 0) {
         return lessonIndex;
       }
     }
@@ -41,11 +42,39 @@ const LessonsPage = () => {
   const [expandedTasks, setExpandedTasks] = useState({});
   const [rowCount, setRowCount] = useState(null);
   const [executionTimestamp, setExecutionTimestamp] = useState(null);
+  const [lessons, setLessons] = useState(null);
+  const [currentLesson, setCurrentLesson] = useState(null);
 
-  const currentLesson = lessons[currentLessonIndex];
+  // Load the lesson index (titles and task ids); lesson content loads when a lesson is opened
+  useEffect(() => {
+    loadLessonIndex()
+      .then(setLessons)
+      .catch(error => {
+        console.error('Failed to load lessons:', error);
+        setError('Failed to load lessons. Please refresh the page.');
+      });
+  }, []);
+
+  useEffect(() => {
+    const entry = lessons?.[currentLessonIndex];
+    if (!entry) return;
+    let active = true;
+    loadLesson(entry.id)
+      .then(lesson => {
+        if (active) setCurrentLesson(lesson);
+      })
+      .catch(error => {
+        console.error('Failed to load lesson:', error);
+        setError('Failed to load lesson. Please refresh the page.');
+      });
+    return () => {
+      active = false;
+    };
+  }, [lessons, currentLessonIndex]);
 
-  // Load lesson progress and current lesson from localStorage on mount
+  // Load lesson progress and current lesson from localStorage once the lesson index is loaded
   useEffect(() => {
+    if (!lessons) return;
     try {
       const savedProgress = localStorage.getItem('sqlSurvivalLessonsProgress');
       if (savedProgress) {
@@ -56,8 +85,8 @@ const LessonsPage = () => {
         
         const updatedCompletedLessons = {};
         lessons.forEach((lesson, lessonIndex) => {
-          const allTasksCompleted = lesson.tasks.every(task => 
-            parsedProgress[`${lessonIndex}-${task.id}`] === true
+          const allTasksCompleted = lesson.taskIds.every(taskId => 
+            parsedProgress[`${lessonIndex}-${taskId}`] === true
           );
           if (allTasksCompleted) {
             updatedCompletedLessons[lessonIndex] = true;
@@ -88,6 +117,8 @@ const LessonsPage = () => {
           if (lessonIndex !== currentLessonIndex) {
             setCurrentLessonIndex(lessonIndex);
           }
+        } else if (currentLessonIndex >= lessons.length) {
+          setCurrentLessonIndex(0);
         }
       }
       
@@ -96,7 +127,7 @@ const LessonsPage = () => {
       console.error('Failed to load lesson progress:', error);
       setIsInitialized(true);
     }
-  }, []);
+  }, [lessons]);
 
   useEffect(() => {
     if (isInitialized && Object.keys(completedTasks).length > 0) {
@@ -327,13 +358,13 @@ const LessonsPage = () => {
 
   const getLessonProgress = (lessonIndex) => {
     const lesson = lessons[lessonIndex];
-    const completedCount = lesson.tasks.filter(task => 
-      completedTasks[`${lessonIndex}-${task.id}`]
+    const completedCount = lesson.taskIds.filter(taskId => 
+      completedTasks[`${lessonIndex}-${taskId}`]
     ).length;
     return {
       completed: completedCount,
-      total: lesson.tasks.length,
-      percentage: Math.round((completedCount / lesson.tasks.length) * 100)
+      total: lesson.taskIds.length,
+      percentage: Math.round((completedCount / lesson.taskIds.length) * 100)
     };
   };
 
@@ -341,9 +372,9 @@ const LessonsPage = () => {
     let totalCompleted = 0;
     let totalTasks = 0;
     lessons.forEach((lesson, index) => {
-      totalTasks += lesson.tasks.length;
-      totalCompleted += lesson.tasks.filter(task => 
-        completedTasks[`${index}-${task.id}`]
+      totalTasks += lesson.taskIds.length;
+      totalCompleted += lesson.taskIds.filter(taskId => 
+        completedTasks[`${index}-${taskId}`]
       ).length;
     });
     return {
@@ -357,8 +388,8 @@ const LessonsPage = () => {
     setTimeout(() => {
       const lesson = lessons[currentLessonIndex];
       const updatedCompletedTasks = JSON.parse(localStorage.getItem('sqlSurvivalLessonsProgress') || '{}');
-      const reallyAllCompleted = lesson.tasks.every(task => 
-        updatedCompletedTasks[`${currentLessonIndex}-${task.id}`] === true
+      const reallyAllCompleted = lesson.taskIds.every(taskId => 
+        updatedCompletedTasks[`${currentLessonIndex}-${taskId}`] === true
       );
 
       if (reallyAllCompleted) {
@@ -511,6 +542,18 @@ const LessonsPage = () => {
     );
   };
 
+  if (!lessons || !currentLesson || currentLesson.id !== lessons[currentLessonIndex]?.id) {
+    return (
+      <div className="min-h-screen bg-gray-900 text-white flex items-center justify-center">
+        {error ? (
+          <p className="text-sm text-red-400">{error}</p>
+        ) : (
+          <Loader2 className="w-8 h-8 animate-spin text-gray-400" />
+        )}
+      </div>
+    );
+  }
+
   const progress = getLessonProgress(currentLessonIndex);
   const overall = getOverallProgress();
 
@@ -1,10 +1,10 @@
-import React, { useState } from 'react';
+import React, { useState, useEffect } from 'react';
 import { useNavigate } from 'react-router-dom';
 import { Button } from '../components/ui/button';
 import { Card, CardContent, CardHeader, CardTitle } from '../components/ui/card';
 import { Input } from '../components/ui/input';
-import { ArrowLeft, Search, Copy, Check, BookOpen, FileText, Code, Play, Filter } from 'lucide-react';
-import { syntaxReference, examplesLibrary, commonPatterns } from '../utils/referenceData';
+import { ArrowLeft, Search, Copy, Check, BookOpen, FileText, Code, Play, Filter, Loader2 } from 'lucide-react';
+import { loadReference } from '../utils/contentLoader';
 
 const ReferencePage = () => {
   const navigate = useNavigate();
@@ -13,6 +13,25 @@ const ReferencePage = () => {
   const [selectedDifficulty, setSelectedDifficulty] = useState('all');
   const [selectedCategory, setSelectedCategory] = useState('all');
   const [copiedId, setCopiedId] = useState(null);
+  const [reference, setReference] = useState(null);
+
+  useEffect(() => {
+    let active = true;
+    loadReference()
+      .then(loaded => {
+        if (active) setReference(loaded);
+      })
+      .catch(error => console.error('Failed to load reference:', error));
+    return () => {
+      active = false;
+    };
+  }, []);
+
+  const { syntaxReference, examplesLibrary, commonPatterns } = reference || {
+    syntaxReference: [],
+    examplesLibrary: [],
+    commonPatterns: [],
+  };
 
   const handleCopy = async (text, id) => {
     try {
@@ -175,6 +194,13 @@ const ReferencePage = () => {
 
         {/* Content */}
         <div className="space-y-6">
+          {!reference && (
+            <p className="text-sm text-gray-500 flex items-center">
+              <Loader2 className="w-4 h-4 mr-2 animate-spin" />
+              Loading reference...
+            </p>
+          )}
+
           {/* Syntax Reference Tab */}
           {activeTab === 'syntax' && (
             <div className="space-y-6">
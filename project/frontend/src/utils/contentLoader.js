@@ -0,0 +1,81 @@
+// Content Loader - Fetches game content on demand instead of bundling it
+//
+// The backend serves content as hashed JSON artifacts (backend/catalog.py):
+//
+//   /content/manifest         { version, artifacts: { name: filename } }, revalidated with its ETag
+//   /content/tasks-<zone>     tasks for one zone
+//   /content/lesson-<id>      one lesson with theory, example, tasks and practice data
+//   /content/lessons          lesson index: id, title, description and taskIds
+//   /content/reference        { syntaxReference, examplesLibrary, commonPatterns }
+//
+// Artifacts are immutable, so the browser cache keeps them across visits and
+// each one is requested at most once per page load. When no API URL is
+// configured, or the backend cannot be reached, the same content comes from
+// code-split chunks of the bundled data modules, which the browser also
+// loads only when they are first needed.
+
+const API_BASE_URL = process.env.REACT_APP_API_BASE_URL;
+
+const cache = new Map();
+
+const once = (key, load) => {
+  if (!cache.has(key)) {
+    const promise = load();
+    // A failed load is retried the next time it is requested
+    promise.catch(() => cache.delete(key));
+    cache.set(key, promise);
+  }
+  return cache.get(key);
+};
+
+const fetchJson = async (url) => {
+  const response = await fetch(url);
+  if (!response.ok) {
+    throw new Error(`Failed to load ${url}: ${response.status}`);
+  }
+  return response.json();
+};
+
+const loadManifest = () => once('manifest', () => fetchJson(`${API_BASE_URL}/content/manifest`));
+
+const loadArtifact = (name, fallback) => once(name, async () => {
+  if (API_BASE_URL) {
+    try {
+      const manifest = await loadManifest();
+      const filename = manifest.artifacts[name];
+      if (filename) {
+        return await fetchJson(`${API_BASE_URL}/content/${filename}`);
+      }
+    } catch (error) {
+      console.error(`Failed to fetch ${name}, using bundled content:`, error);
+    }
+  }
+  return fallback();
+});
+
+const bundledLessons = () => import('./lessonsData').then(module => module.lessons);
+
+export const loadZoneTasks = (zone) => loadArtifact(`tasks-${zone}`, () =>
+  import('./gameData').then(module => module.gameTasks[zone] || [])
+);
+
+export const loadLessonIndex = () => loadArtifact('lessons', () =>
+  bundledLessons().then(lessons => lessons.map(({ id, title, description, tasks }) => ({
+    id,
+    title,
+    description,
+    taskIds: tasks.map(task => task.id),
+  })))
+);
+
+export const loadLesson = (id) => loadArtifact(`lesson-${id}`, () =>
+  bundledLessons().then(lessons => lessons.find(lesson => lesson.id === id))
+);
+
+export const loadReference = () => loadArtifact('reference', () =>
+  import('./referenceData').then(({ syntaxReference, examplesLibrary, commonPatterns }) => ({
+    syntaxReference,
+    examplesLibrary,
+    commonPatterns,
+  }))
+);
@@ -0,0 +1,180 @@
+// Progress Codec - Bit-packed encoding of level progress
+//
+// Same layout as encode_levels in backend/progress.py, so the text written
+// here can be sent to or read from /api/progress/{id}?packed=true:
+//
+//   1 byte     format version
+//   varint     level count N (beach, jungle, ruins in level order)
+//   ceil(N/4)  status, 2 bits per level
+//   ceil(N/8)  bitmap of levels with attempts, then one varint per set bit
+//   ceil(N/8)  bitmap of levels with a bestTime, then one varint per set bit (tenths of a second)
+//   ceil(N/8)  bitmap of levels with a completedAt, then one zigzag varint per set bit
+//              (seconds since the previous set level, the first since the epoch)
+//
+// The bytes are stored as unpadded base64url. completedAt keeps whole
+// seconds and bestTime tenths of a second. Attempts and bestTime must be
+// non-negative; encodeProgress throws a RangeError otherwise.
+
+export const PACKED_FORMAT_VERSION = 1;
+
+export const ZONE_LEVEL_COUNTS = { beach: 15, jungle: 20, ruins: 15 };
+
+const STATUSES = ['locked', 'active', 'skipped', 'completed'];
+
+const levelSlots = () =>
+  Object.entries(ZONE_LEVEL_COUNTS).flatMap(([zone, count]) =>
+    Array.from({ length: count }, (_, i) => ({ zone, index: i }))
+  );
+
+// Varints use arithmetic rather than bitwise operators, which truncate to 32 bits
+const writeVarint = (out, value) => {
+  if (!Number.isSafeInteger(value) || value < 0) {
+    throw new RangeError(`Packed progress value out of range: ${value}`);
+  }
+  while (value >= 0x80) {
+    out.push((value % 0x80) + 0x80);
+    value = Math.floor(value / 0x80);
+  }
+  out.push(value);
+};
+
+const readVarint = (bytes, cursor) => {
+  let value = 0;
+  let scale = 1;
+  for (;;) {
+    const byte = bytes[cursor.position++];
+    if (byte === undefined || scale > Number.MAX_SAFE_INTEGER) {
+      throw new Error('Packed progress is truncated or has an oversized value');
+    }
+    value += (byte % 0x80) * scale;
+    if (byte < 0x80) {
+      return value;
+    }
+    scale *= 0x80;
+  }
+};
+
+const zigzag = (value) => (value >= 0 ? value * 2 : -value * 2 - 1);
+
+const unzigzag = (value) => (value % 2 === 0 ? value / 2 : -(value + 1) / 2);
+
+const writeSection = (out, values) => {
+  const bitmap = new Array(Math.ceil(values.length / 8)).fill(0);
+  values.forEach((value, i) => {
+    if (value !== null) {
+      bitmap[i >> 3] |= 1 << (i & 7);
+    }
+  });
+  out.push(...bitmap);
+  values.forEach((value) => {
+    if (value !== null) {
+      writeVarint(out, value);
+    }
+  });
+};
+
+const readSection = (bytes, cursor, count) => {
+  const bitmapStart = cursor.position;
+  cursor.position += Math.ceil(count / 8);
+  if (cursor.position > bytes.length) {
+    throw new Error('Packed progress is truncated');
+  }
+  return Array.from({ length: count }, (_, i) =>
+    (bytes[bitmapStart + (i >> 3)] >> (i & 7)) & 1 ? readVarint(bytes, cursor) : null
+  );
+};
+
+const toBase64Url = (bytes) =>
+  btoa(String.fromCharCode(...bytes)).replace(/\+/g, '-').replace(/\//g, '_').replace(/=+$/, '');
+
+const fromBase64Url = (text) => {
+  const binary = atob(text.replace(/-/g, '+').replace(/_/g, '/'));
+  return Uint8Array.from(binary, (char) => char.charCodeAt(0));
+};
+
+/**
+ * Encode a gameState.progress object as packed base64url text
+ */
+export const encodeProgress = (progress) => {
+  const records = levelSlots().map(({ zone, index }) => (progress[zone] || [])[index] || {});
+  const count = records.length;
+  const out = [PACKED_FORMAT_VERSION];
+  writeVarint(out, count);
+
+  const statuses = new Array(Math.ceil(count / 4)).fill(0);
+  records.forEach((record, i) => {
+    statuses[i >> 2] |= Math.max(0, STATUSES.indexOf(record.status)) << ((i & 3) * 2);
+  });
+  out.push(...statuses);
+
+  writeSection(out, records.map((record) => record.attempts || null));
+  writeSection(out, records.map((record) => (record.bestTime == null ? null : Math.round(record.bestTime * 10))));
+
+  let previous = 0;
+  writeSection(out, records.map((record) => {
+    if (!record.completedAt) {
+      return null;
+    }
+    const seconds = Math.floor(new Date(record.completedAt).getTime() / 1000);
+    const delta = zigzag(seconds - previous);
+    previous = seconds;
+    return delta;
+  }));
+
+  return toBase64Url(out);
+};
+
+/**
+ * Decode packed text back into the gameState.progress shape
+ */
+export const decodeProgress = (text) => {
+  const bytes = fromBase64Url(text);
+  if (bytes[0] !== PACKED_FORMAT_VERSION) {
+    throw new Error(`Unsupported packed progress version: ${bytes[0]}`);
+  }
+  const cursor = { position: 1 };
+  const count = readVarint(bytes, cursor);
+  if (count > levelSlots().length || cursor.position + Math.ceil(count / 4) > bytes.length) {
+    throw new Error('Packed progress is truncated or has too many levels');
+  }
+  const statusStart = cursor.position;
+  cursor.position += Math.ceil(count / 4);
+
+  const attempts = readSection(bytes, cursor, count);
+  const bestTimes = readSection(bytes, cursor, count);
+  const completed = readSection(bytes, cursor, count);
+
+  const progress = {};
+  let previous = 0;
+  levelSlots().forEach(({ zone, index }, i) => {
+    let completedAt = null;
+    if (i < count && completed[i] !== null) {
+      previous += unzigzag(completed[i]);
+      completedAt = new Date(previous * 1000).toISOString();
+    }
+    (progress[zone] = progress[zone] || []).push({
+      level: index + 1,
+      status: i < count ? STATUSES[(bytes[statusStart + (i >> 2)] >> ((i & 3) * 2)) & 3] : 'locked',
+      attempts: (i < count && attempts[i]) || 0,
+      completedAt,
+      bestTime: i < count && bestTimes[i] !== null ? bestTimes[i] / 10 : null
+    });
+  });
+  return progress;
+};
+
+/**
+ * Game state as saved to localStorage, with progress packed
+ */
+export const serializeGameState = (state) => {
+  const { progress, ...rest } = state;
+  return JSON.stringify({ ...rest, packedProgress: encodeProgress(progress) });
+};
+
+/**
+ * Parse a saved game state, reading both packed and older unpacked saves
+ */
+export const parseGameState = (saved) => {
+  const { packedProgress, ...rest } = JSON.parse(saved);
+  return packedProgress ? { ...rest, progress: decodeProgress(packedProgress) } : rest;
+};
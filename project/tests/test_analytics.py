@@ -0,0 +1,86 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+
+from analytics import RollupWriter, daily_dashboard, read_rollups, zone_dashboard
+
+DAY = datetime(2026, 10, 19, 12)
+
+
+class Rollups:
+    """A rollups collection that counts bulk writes and fails the first `failures` of them."""
+
+    def __init__(self, failures=0):
+        mongomock_motor = pytest.importorskip('mongomock_motor')
+        self.collection = mongomock_motor.AsyncMongoMockClient()['test']['rollups']
+        self.failures = failures
+        self.writes = []
+
+    async def bulk_write(self, operations, ordered):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("primary stepped down")
+        self.writes.append(len(operations))
+        return await self.collection.bulk_write(operations, ordered=ordered)
+
+    def find(self, *args, **kwargs):
+        return self.collection.find(*args, **kwargs)
+
+
+def counts(rollups, *rollup_ids):
+    documents = asyncio.run(read_rollups(rollups, list(rollup_ids)))
+    return {
+        rollup_id: {counter: value for counter, value in document.items() if counter in ('submissions', 'correct', 'hints')}
+        for rollup_id, document in documents.items()
+    }
+
+
+def test_a_burst_of_submissions_becomes_one_update_per_rollup():
+    rollups = Rollups()
+    writer = RollupWriter(rollups)
+    for correct in (True, False, False, True):
+        writer.record_submission('beach', 3, correct, DAY)
+    writer.record('beach', 4, {'hints': 1}, DAY)
+    asyncio.run(writer.flush())
+
+    assert rollups.writes == [4]
+    assert counts(rollups, 'level:beach:3', 'level:beach:4', 'zone:beach', 'day:2026-10-19') == {
+        'level:beach:3': {'submissions': 4, 'correct': 2, 'hints': 0},
+        'level:beach:4': {'submissions': 0, 'correct': 0, 'hints': 1},
+        'zone:beach': {'submissions': 4, 'correct': 2, 'hints': 1},
+        'day:2026-10-19': {'submissions': 4, 'correct': 2, 'hints': 1},
+    }
+
+
+def test_failed_flush_keeps_the_counts_for_the_next_one():
+    rollups = Rollups(failures=1)
+    writer = RollupWriter(rollups)
+    writer.record_submission('beach', 1, True, DAY)
+    asyncio.run(writer.flush())
+    writer.record_submission('beach', 1, False, DAY)
+    asyncio.run(writer.flush())
+
+    assert rollups.writes == [3]
+    assert counts(rollups, 'level:beach:1') == {'level:beach:1': {'submissions': 2, 'correct': 1, 'hints': 0}}
+
+
+def test_dashboards_read_the_rollups():
+    rollups = Rollups()
+    writer = RollupWriter(rollups)
+
+    async def run():
+        for correct in (True, True, False, True):
+            writer.record_submission('beach', 2, correct, DAY)
+        await writer.flush()
+        writer.record_submission('beach', 2, False, DAY)
+        await writer.flush()
+        return await zone_dashboard(rollups, 'beach', 3), await daily_dashboard(rollups, DAY, 2)
+
+    zone, days = asyncio.run(run())
+    assert [level['submissions'] for level in zone['levels']] == [0, 5, 0]
+    assert zone['levels'][1]['accuracy'] == 3 / 5
+    assert zone['levels'][0]['accuracy'] is None
+    assert zone['zone']['id'] == 'zone:beach'
+    assert [day['submissions'] for day in days] == [5, 0]
+    assert days[0]['day'] == '2026-10-19'
@@ -0,0 +1,106 @@
+import asyncio
+
+import pytest
+
+import regrade
+from archive import SegmentWriter, SubmissionArchive, find_blocks, read_block
+from settings import Settings
+
+DAY_MS = 24 * 60 * 60 * 1000
+# 2026-10-19T00:00:00Z
+MIDNIGHT_MS = 1792368000000
+
+
+def submission(t, zone, level, query='SELECT 1', correct=True):
+    return {'t': t, 'zone': zone, 'level': level, 'query': query, 'correct': correct}
+
+
+def test_blocks_are_appended_and_read_back_by_level(tmp_path):
+    writer = SegmentWriter(tmp_path / '2026-10-19')
+    first = [submission(MIDNIGHT_MS + 1, 'beach', 1), submission(MIDNIGHT_MS + 2, 'beach', 2)]
+    second = [submission(MIDNIGHT_MS + 3, 'jungle', 1, query='SELECT 2')]
+    writer.append(first)
+    writer.append(second)
+
+    blocks = list(find_blocks(tmp_path))
+    assert [block.count for block in blocks] == [2, 1]
+    assert [block.segment for block in blocks] == [str(writer.path)] * 2
+    assert read_block(blocks[0]) == first
+    assert read_block(blocks[1]) == second
+
+    [beach] = find_blocks(tmp_path, zone='beach', level=2)
+    assert read_block(beach, 'beach', 2) == [first[1]]
+    assert list(find_blocks(tmp_path, zone='ruins')) == []
+    assert list(find_blocks(tmp_path, since='2026-10-20')) == []
+
+
+def test_torn_segment_rotates_to_a_fresh_file(tmp_path, monkeypatch):
+    writer = SegmentWriter(tmp_path / 'day')
+    writer.append([submission(MIDNIGHT_MS, 'beach', 1)])
+    torn = writer.path
+
+    def fail(*args, **kwargs):
+        raise OSError("disk full")
+
+    with monkeypatch.context() as patch:
+        patch.setattr('archive.os.fsync', fail)
+        with pytest.raises(OSError):
+            writer.append([submission(MIDNIGHT_MS, 'beach', 2)])
+    writer.append([submission(MIDNIGHT_MS, 'beach', 3)])
+
+    assert writer.path != torn
+    records = [record for block in find_blocks(tmp_path) for record in read_block(block)]
+    assert [record['level'] for record in records] == [1, 3]
+
+
+def test_only_the_failed_day_is_retried(tmp_path, monkeypatch):
+    archive = SubmissionArchive(tmp_path)
+    archive._pending = [submission(MIDNIGHT_MS - 1, 'beach', 1), submission(MIDNIGHT_MS + 1, 'beach', 2)]
+    append = SegmentWriter.append
+
+    def fail_second_day(writer, records):
+        if writer.directory.name == '2026-10-19':
+            raise OSError("disk full")
+        return append(writer, records)
+
+    monkeypatch.setattr(SegmentWriter, 'append', fail_second_day)
+    asyncio.run(archive.flush())
+    assert [record['level'] for record in archive._pending] == [2]
+
+    monkeypatch.setattr(SegmentWriter, 'append', append)
+    asyncio.run(archive.flush())
+    assert archive.stats()['pending'] == 0
+    assert archive.stats()['archived'] == 2
+    archived = {block.segment.split('/')[-2]: read_block(block) for block in find_blocks(tmp_path)}
+    assert {day: [record['level'] for record in records] for day, records in archived.items()} == {
+        '2026-10-18': [1], '2026-10-19': [2],
+    }
+
+
+def test_default_archive_dir_is_outside_the_source_tree(tmp_path):
+    settings = Settings({'XDG_DATA_HOME': str(tmp_path)})
+    assert settings.submission_archive_dir == tmp_path / 'sql-survival' / 'submission-archive'
+
+
+def test_regrade_reports_flipped_submissions(tmp_path):
+    regrade._init_worker(variant_count=1)
+    SegmentWriter(tmp_path / '2026-10-19').append([
+        # Now correct, but graded incorrect when it was archived
+        submission(MIDNIGHT_MS, 'beach', 1, query="SELECT * FROM survivors", correct=False),
+        # Graded correct when it was archived, but wrong
+        submission(MIDNIGHT_MS, 'beach', 1, query="SELECT name FROM survivors", correct=True),
+        submission(MIDNIGHT_MS, 'beach', 1, query="SELECT * FROM survivors", correct=True),
+        submission(MIDNIGHT_MS, 'beach', 999, correct=True),
+    ])
+
+    report = {'levels': {}, 'examples': {}}
+    for block in find_blocks(tmp_path, zone='beach'):
+        regrade.merge(report, regrade.regrade_block(block, 'beach', None))
+
+    assert dict(report['levels']['beach:1']) == {
+        'submissions': 3, 'was_correct': 2, 'now_correct': 2, 'newly_correct': 1, 'newly_incorrect': 1,
+    }
+    assert report['levels']['beach:999']['task_removed'] == 1
+    assert [example['query'] for example in report['examples']['beach:1']['newly_incorrect']] == [
+        "SELECT name FROM survivors",
+    ]
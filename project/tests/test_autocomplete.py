@@ -0,0 +1,46 @@
+import pytest
+
+from autocomplete import PrefixIndex, build_completers
+
+SCHEMA = {
+    'survivors': ['survivor_id', 'name', 'profession', 'status'],
+    'supplies': ['supply_id', 'name', 'quantity', 'survivor_id'],
+}
+
+SYNTAX_REFERENCE = [{'items': [
+    {'name': 'SELECT', 'syntax': 'SELECT column FROM table'},
+    {'name': 'SUM', 'syntax': 'SUM(column)'},
+    {'name': 'SUBSTR', 'syntax': 'SUBSTR(text, start, length)'},
+]}]
+
+
+@pytest.fixture(scope='module')
+def completer():
+    return build_completers({'beach': SCHEMA}, SYNTAX_REFERENCE)['beach']
+
+
+def labels(result):
+    return [suggestion['label'] for suggestion in result['suggestions']]
+
+
+def test_prefix_index_is_case_insensitive_and_sorted():
+    index = PrefixIndex([(label, {'label': label}) for label in ('status', 'Supply', 'survivor_id', 'name', 'su')])
+    assert [item['label'] for item in index.search('SU', limit=10)] == ['su', 'Supply', 'survivor_id']
+    assert [item['label'] for item in index.search('su', limit=2)] == ['su', 'Supply']
+    assert index.search('x', limit=10) == []
+
+
+def test_table_names_after_from(completer):
+    assert labels(completer.complete("SELECT * FROM su")) == ['supplies', 'survivors']
+
+
+def test_alias_completes_its_tables_columns(completer):
+    result = completer.complete("SELECT s.s FROM survivors s JOIN supplies p ON p.survivor_id = s.survivor_id", cursor=10)
+    assert result['qualifier'] == 's'
+    assert labels(result) == ['status', 'survivor_id']
+
+
+def test_columns_of_tables_in_the_query_come_before_keywords_and_functions(completer):
+    assert labels(completer.complete("SELECT * FROM supplies WHERE su")) == [
+        'supply_id', 'survivor_id', 'supplies', 'survivors', 'SUBSTR()', 'SUM()',
+    ]
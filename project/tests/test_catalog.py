@@ -0,0 +1,40 @@
+import gzip
+import json
+
+import pytest
+
+from catalog import ContentCatalog
+from content import load_game_content
+
+
+@pytest.fixture(scope='module')
+def catalog():
+    return ContentCatalog(load_game_content())
+
+
+def test_each_encoding_has_its_own_etag(catalog):
+    plain = catalog.respond(None, accept_encoding='')
+    compressed = catalog.respond(None, accept_encoding='gzip')
+
+    assert plain[0] == compressed[0] == 200
+    assert plain[2]['ETag'] != compressed[2]['ETag']
+    assert plain[2]['Vary'] == compressed[2]['Vary'] == 'Accept-Encoding'
+    assert gzip.decompress(compressed[1]) == plain[1]
+
+
+def test_if_none_match_is_checked_against_the_negotiated_encoding(catalog):
+    etag = catalog.respond(None, accept_encoding='gzip')[2]['ETag']
+
+    assert catalog.respond(None, accept_encoding='gzip', if_none_match=etag)[0] == 304
+    assert catalog.respond(None, accept_encoding='gzip', if_none_match=f"W/{etag}")[0] == 304
+    assert catalog.respond(None, accept_encoding='', if_none_match=etag)[0] == 200
+
+
+def test_lesson_index_lists_task_ids(catalog):
+    manifest = json.loads(catalog.respond(None)[1])
+    status, body, _ = catalog.respond(manifest['artifacts']['lessons'])
+    index = json.loads(body)
+
+    assert status == 200
+    lessons = load_game_content()['lessons']
+    assert [entry['taskIds'] for entry in index] == [[task['id'] for task in lesson['tasks']] for lesson in lessons]
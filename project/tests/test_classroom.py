@@ -0,0 +1,90 @@
+import asyncio
+import json
+
+import pytest
+
+from classroom import MAX_QUEUED_FRAMES, ClassKeys, ClassroomHub
+
+
+def parse(frame):
+    fields = dict(line.split(': ', 1) for line in frame.decode().strip().split('\n'))
+    return fields['event'], json.loads(fields['data'])
+
+
+@pytest.fixture
+def hub():
+    return ClassroomHub(ClassKeys(b'secret'))
+
+
+def test_snapshot_then_one_coalesced_diff(hub):
+    class_id, _ = hub.keys.mint()
+    hub.record(class_id, 'ana', 'beach', 1, 'correct')
+
+    async def run():
+        async def connected():
+            return False
+
+        stream = hub.watch(class_id).stream(connected)
+        snapshot = await stream.__anext__()
+        for _ in range(5):
+            hub.record(class_id, 'ben', 'beach', 2, 'failed', error='no such column: nme')
+        hub.record(class_id, 'ana', 'beach', 2, 'correct')
+        await hub.flush()
+        diff = await stream.__anext__()
+        await stream.aclose()
+        return parse(snapshot), parse(diff)
+
+    (event, snapshot), (diff_event, diff) = asyncio.run(run())
+    assert event == 'snapshot'
+    assert [student['player_id'] for student in snapshot['students']] == ['ana']
+
+    assert diff_event == 'diff'
+    students = {student['player_id']: student for student in diff['students']}
+    assert students['ben']['failures'] == 5 and students['ben']['attempts'] == 5
+    assert students['ana']['levels_completed'] == 2
+    assert len(diff['failures']) == 5
+    assert diff['failures'][0]['error'] == 'no such column: nme'
+
+
+def test_a_viewer_that_falls_behind_gets_a_fresh_snapshot(hub):
+    class_id, _ = hub.keys.mint()
+
+    async def run():
+        async def connected():
+            return False
+
+        broadcaster = hub.watch(class_id)
+        stream = broadcaster.stream(connected)
+        await stream.__anext__()
+        for attempt in range(MAX_QUEUED_FRAMES + 5):
+            hub.record(class_id, f"p{attempt}", 'beach', 1, 'failed')
+            await hub.flush()
+        frame = await stream.__anext__()
+        await stream.aclose()
+        return parse(frame), broadcaster.seq
+
+    (event, snapshot), seq = asyncio.run(run())
+    assert event == 'snapshot'
+    assert len(snapshot['students']) == MAX_QUEUED_FRAMES + 5
+    assert seq == MAX_QUEUED_FRAMES + 5
+
+
+def test_only_minted_class_ids_are_recorded(hub):
+    class_id, teacher_token = hub.keys.mint()
+    nonce = class_id.split('.')[0]
+    for guessed in ('room-1', nonce, f"{nonce}.0000000000000000", f"{nonce}.é"):
+        hub.record(guessed, 'mallory', 'beach', 1, 'failed')
+        assert hub.snapshot(guessed) is None
+    hub.record(class_id, 'ana', 'beach', 1, 'failed')
+    assert hub.snapshot(class_id)['students'][0]['player_id'] == 'ana'
+
+
+def test_teacher_token_belongs_to_one_class(hub):
+    class_id, teacher_token = hub.keys.mint()
+    other_id, other_token = hub.keys.mint()
+    assert hub.keys.is_teacher(class_id, teacher_token)
+    assert not hub.keys.is_teacher(class_id, other_token)
+    assert not hub.keys.is_teacher(class_id, None)
+    assert not hub.keys.is_teacher(class_id, 'é')
+    # Another secret, as on a misconfigured worker, accepts neither
+    assert not ClassKeys(b'other').is_teacher(class_id, teacher_token)
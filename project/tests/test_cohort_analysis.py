@@ -0,0 +1,78 @@
+import random
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from cohort_analysis import LEVEL_INDEX, decode_packed_levels, load_progress_arrays
+from progress import FLAT_LEVEL_KEYS, decode_levels, encode_levels
+
+
+COLUMNS = ('player', 'level', 'status', 'attempts', 'best_time', 'completed_at')
+
+
+def random_levels(rng):
+    levels = {}
+    at = datetime(2026, 1, 1) + timedelta(seconds=rng.randint(0, 10 ** 7))
+    for key in FLAT_LEVEL_KEYS:
+        if rng.random() < 0.2:
+            continue
+        record = {'status': rng.randint(0, 3), 'attempts': rng.choice([0, 1, 2, 7, 300, 70000])}
+        if rng.random() < 0.6:
+            record['bestTime'] = round(rng.uniform(0, 2000), 1)
+        if rng.random() < 0.5:
+            at += timedelta(seconds=rng.randint(-600, 90000))
+            record['completedAt'] = at
+        levels[key] = record
+    return levels
+
+
+def expected_rows(documents):
+    rows = []
+    for player, document in enumerate(documents):
+        levels = document.get('levels') or decode_levels(document['packed'])
+        for key, record in levels.items():
+            completed_at = record.get('completedAt')
+            rows.append((
+                player, LEVEL_INDEX[key], record['status'], record['attempts'], record.get('bestTime', np.nan),
+                (completed_at - datetime(1970, 1, 1)).total_seconds() if completed_at else np.nan,
+            ))
+    return sorted(rows)
+
+
+def rows(arrays):
+    return sorted(zip(*(arrays[name].tolist() for name in COLUMNS)))
+
+
+class FakeCollection:
+    def __init__(self, documents):
+        self.documents = documents
+
+    def find(self, *args, **kwargs):
+        return iter(self.documents)
+
+
+def test_bulk_decode_matches_decode_levels():
+    rng = random.Random(7)
+    documents = [{'packed': encode_levels(random_levels(rng))} for _ in range(200)]
+    documents.append({'packed': encode_levels({})})
+    decoded = decode_packed_levels([document['packed'] for document in documents])
+    np.testing.assert_equal(rows(decoded), expected_rows(documents))
+
+
+def test_packed_and_legacy_documents_load_together():
+    rng = random.Random(11)
+    documents = []
+    for index in range(300):
+        levels = random_levels(rng)
+        documents.append({'levels': decode_levels(encode_levels(levels))} if index % 3 == 0
+                         else {'packed': encode_levels(levels)})
+    arrays = load_progress_arrays(FakeCollection(documents), batch_size=1000)
+    assert arrays['player_count'] == 300
+    np.testing.assert_equal(rows(arrays), expected_rows(documents))
+
+
+def test_bulk_decode_rejects_truncated_blobs():
+    blob = encode_levels(random_levels(random.Random(3)))
+    with pytest.raises(ValueError):
+        decode_packed_levels([blob, blob[:-4]])
@@ -0,0 +1,45 @@
+import pytest
+
+from content import load_game_content
+from golden_benchmark import MIN_LATENCY_DELTA_MS, find_regressions, golden_tasks, run_scale
+from sql_engine import build_zone_images
+
+
+def result(min_ms, memory=100_000, correct=True):
+    return {'correct': correct, 'min_ms': min_ms, 'memory_peak_bytes': memory}
+
+
+def regressions(tasks, baseline_tasks):
+    return find_regressions({'scales': {'1': tasks}}, {'scales': {'1': baseline_tasks}}, tolerance=0.25,
+                            task_tolerance=1.0)
+
+
+def test_every_expected_query_runs_and_grades_correct():
+    content = load_game_content()
+    tasks = golden_tasks(content)
+    assert len(tasks['lessons']) == sum(len(lesson['tasks']) for lesson in content['lessons'])
+
+    results = run_scale(build_zone_images(), tasks, scale=1, repeats=1, variant_count=1)
+    assert len(results) == sum(len(zone_tasks) for zone_tasks in tasks.values())
+    assert all(task['correct'] for task in results.values())
+
+
+def test_within_tolerance_is_not_a_regression():
+    baseline = {'a': result(10.0), 'b': result(0.05)}
+    # b doubles, but by less than the absolute floor
+    assert regressions({'a': result(11.0), 'b': result(0.05 + MIN_LATENCY_DELTA_MS / 2)}, baseline) == []
+
+
+@pytest.mark.parametrize('tasks, message', [
+    ({'a': result(13.0), 'b': result(10.0)}, 'summed latency'),
+    ({'a': result(5.0), 'b': result(2.5)}, 'b: latency'),
+    ({'a': result(5.0), 'b': result(1.0, memory=1_000_000)}, 'b: memory peak'),
+    ({'a': result(5.0), 'b': result(1.0, correct=False)}, 'no longer grades as correct'),
+])
+def test_regressions_fail_the_gate(tasks, message):
+    baseline = {'a': result(5.0), 'b': result(1.0)}
+    assert any(message in regression for regression in regressions(tasks, baseline))
+
+
+def test_tasks_missing_from_the_baseline_are_skipped():
+    assert regressions({'a': result(5.0), 'new': result(100.0)}, {'a': result(5.0)}) == []
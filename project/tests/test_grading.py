@@ -0,0 +1,81 @@
+import pytest
+
+from content import load_game_content
+from grading import Grader, UnknownTaskError, perturb_zone_image, sorts_result
+from sql_engine import ZonePool, build_zone_images, create_zone_database
+
+
+@pytest.fixture(scope='module')
+def images():
+    return build_zone_images()
+
+
+@pytest.fixture(scope='module')
+def grader(images):
+    tasks = load_game_content()['gameTasks']
+    pools = {zone: ZonePool(zone, images[zone], size=2) for zone in tasks}
+    grader = Grader(tasks, pools, variant_count=4, max_workers=4)
+    yield grader
+    grader.close()
+    for pool in pools.values():
+        pool.close()
+
+
+def test_every_reference_query_passes_on_all_variants(grader):
+    for zone, tasks in grader.tasks.items():
+        for task in tasks:
+            result = grader.grade(zone, task['level'], task['expectedQuery'])
+            assert result['correct'], (zone, task['level'], result['error'])
+
+
+def test_hard_coded_answer_fails_on_the_variants(grader):
+    result = grader.grade('beach', 4, "SELECT * FROM survivors WHERE survivor_id = 3")
+    assert not result['correct']
+    assert 'only matches this exact data' in result['error']
+
+
+def test_near_miss_gets_a_row_diff(grader):
+    result = grader.grade('beach', 4, "SELECT * FROM survivors WHERE profession = 'Doctor' OR name = 'Lina'")
+    assert not result['correct']
+    diff = result['diff']
+    assert diff['row_count'] == {'expected': 1, 'actual': 2}
+    assert diff['columns'] == {'missing': [], 'extra': []}
+    assert (diff['rows']['missing_count'], diff['rows']['extra_count']) == (0, 1)
+    assert diff['rows']['extra_sample'][0]['name'] == 'Lina'
+
+
+def test_near_miss_gets_a_column_diff(grader):
+    result = grader.grade('beach', 2, "SELECT name FROM survivors")
+    assert result['diff']['columns'] == {'missing': ['profession'], 'extra': []}
+    assert result['diff']['rows']['missing_count'] == 0
+
+
+def test_unknown_task_raises(grader):
+    with pytest.raises(UnknownTaskError):
+        grader.grade('beach', 999, "SELECT 1")
+    with pytest.raises(UnknownTaskError):
+        grader.grade('moon', 1, "SELECT 1")
+
+
+def test_variants_permute_whole_rows(images):
+    original = create_zone_database(images['beach'])
+    variant = create_zone_database(perturb_zone_image(images['beach'], 'beach:0'))
+    query = "SELECT * FROM survivors ORDER BY survivor_id"
+    original_rows = original.execute(query).fetchall()
+    variant_rows = variant.execute(query).fetchall()
+
+    assert [row[0] for row in variant_rows] == [row[0] for row in original_rows]
+    assert sorted(row[1:] for row in variant_rows) == sorted(row[1:] for row in original_rows)
+    assert variant_rows != original_rows
+
+
+@pytest.mark.parametrize('query, ordered', [
+    ("SELECT name FROM survivors ORDER BY age", True),
+    ("WITH s AS (SELECT * FROM survivors) SELECT name FROM s ORDER\n BY age DESC", True),
+    ("SELECT name, rank() OVER (ORDER BY age) AS r FROM survivors", False),
+    ("SELECT name FROM (SELECT * FROM survivors ORDER BY age)", False),
+    ("SELECT group_concat(name ORDER BY age) FROM survivors", False),
+    ("SELECT 'order by' AS label FROM survivors -- ORDER BY age", False),
+])
+def test_only_a_top_level_order_by_sorts_the_result(query, ordered):
+    assert sorts_result(query) is ordered
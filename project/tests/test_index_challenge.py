@@ -0,0 +1,56 @@
+import pytest
+
+from index_challenge import CHALLENGES, IndexChallenge, IndexChallengeLab, score_attempt
+from sql_engine import build_zone_images
+
+
+@pytest.fixture(scope='module')
+def lab():
+    # Smaller scales than the real challenges, so the module runs in well under a second
+    challenges = {
+        challenge_id: IndexChallenge(challenge_id, challenge.zone, challenge.title, challenge.description,
+                                     challenge.query, scale=200)
+        for challenge_id, challenge in CHALLENGES.items()
+    }
+    return IndexChallengeLab(build_zone_images(), challenges)
+
+
+def test_an_index_that_cuts_the_steps_scores_higher(lab):
+    no_index = lab.attempt('logbook-by-author', [])
+    unrelated = lab.attempt('logbook-by-author', ["CREATE INDEX by_text ON logbook_entries(log_text)"])
+    covering = lab.attempt('logbook-by-author', [
+        "CREATE INDEX by_author ON logbook_entries(author_id, entry_date, entry_id)",
+    ])
+
+    assert no_index['score'] == 0
+    assert covering['result']['steps'] < no_index['result']['steps'] / 10
+    assert covering['result']['rows'] == no_index['result']['rows']
+    assert any('by_author' in step for step in covering['result']['plan'])
+    assert covering['score'] > unrelated['score'] >= 0
+    assert covering['score'] > 100
+
+
+def test_index_the_planner_cannot_use_only_costs(lab):
+    result = lab.attempt('email-domain', ["CREATE INDEX by_email ON customers(email)"])
+    assert result['speedup'] <= 1.1
+    assert result['size_penalty'] > 0
+    assert result['score'] == 0
+
+
+def test_penalties_grow_with_size_and_build_work():
+    cheap = score_attempt(100_000, 1_000, index_bytes=10_000, database_bytes=1_000_000, build_steps=50_000)
+    large = score_attempt(100_000, 1_000, index_bytes=500_000, database_bytes=1_000_000, build_steps=50_000)
+    slow = score_attempt(100_000, 1_000, index_bytes=10_000, database_bytes=1_000_000, build_steps=2_000_000)
+    assert cheap['speedup_points'] == 200.0
+    assert cheap['score'] > large['score']
+    assert cheap['score'] > slow['score']
+
+
+@pytest.mark.parametrize('statements', [
+    ["DROP TABLE logbook_entries"],
+    ["CREATE INDEX a ON logbook_entries(author_id)"] * 4,
+    ["CREATE INDEX a ON no_such_table(x)"],
+])
+def test_invalid_attempts_are_rejected(lab, statements):
+    with pytest.raises(ValueError):
+        lab.attempt('logbook-by-author', statements)
@@ -0,0 +1,47 @@
+import random
+
+import bson
+import pytest
+from pydantic import ValidationError
+
+from leaderboard import Leaderboard
+from progress import TOTAL_LEVELS
+from server import ScoreUpdate
+
+
+def naive_ranking(scores):
+    ordered = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+    return [(1 + sum(1 for other in scores.values() if other > score), player_id, score)
+            for player_id, score in ordered]
+
+
+def test_pages_and_neighbours_match_a_full_sort():
+    rng = random.Random(5)
+    board = Leaderboard(collection=None, max_score=500)
+    scores = {}
+    for _ in range(3000):
+        player_id = f"p{rng.randrange(400):03d}"
+        score = rng.choice([100, 200, 200, 300, rng.randrange(500)])
+        board.update(player_id, score)
+        scores[player_id] = max(scores.get(player_id, 0), score)
+
+    expected = naive_ranking(scores)
+    page = [(entry['rank'], entry['player_id'], entry['score']) for entry in board.page(0, len(scores))]
+    assert page == expected
+    assert [entry['player_id'] for entry in board.page(37, 25)] == [row[1] for row in expected[37:62]]
+
+    position = 150
+    player_id = expected[position][1]
+    assert [entry['player_id'] for entry in board.around(player_id, 3)] == [row[1] for row in expected[147:154]]
+
+
+def test_levels_completed_is_bounded_before_it_is_persisted():
+    with pytest.raises(ValidationError):
+        ScoreUpdate(player_id='p1', score=100, levels_completed=2 ** 70)
+    with pytest.raises(ValidationError):
+        ScoreUpdate(player_id='p1', score=100, levels_completed=-1)
+
+    board = Leaderboard(collection=None)
+    board.update('p1', 2 ** 70, 2 ** 70)
+    assert board._pending['p1']['levelsCompleted'] == TOTAL_LEVELS
+    bson.encode(board._pending['p1'])
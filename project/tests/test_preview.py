@@ -0,0 +1,70 @@
+import asyncio
+
+import pytest
+
+from preview import PreviewChannel
+from sql_engine import build_zone_images
+
+
+@pytest.fixture(scope='module')
+def beach_image():
+    return build_zone_images()['beach']
+
+
+def preview(image, *messages, on_steps=None):
+    """Feed raw messages to a channel and return the frames it sends back."""
+    async def run():
+        sent = []
+
+        async def send(frame):
+            sent.append(frame)
+
+        channel = PreviewChannel(image, send, debounce=0, on_steps=on_steps)
+        for message in messages:
+            await channel.handle(message)
+        for _ in range(100):
+            if channel._pending is None or channel._pending.done():
+                break
+            await asyncio.sleep(0.01)
+        await channel.close()
+        return sent
+
+    return asyncio.run(run())
+
+
+def test_query_message_gets_a_preview(beach_image):
+    [frame] = preview(beach_image, '{"query": "SELECT 1 AS one", "seq": 7}')
+    assert frame == {'seq': 7, 'success': True, 'result': [{'one': 1}], 'truncated': False, 'error': None}
+
+
+@pytest.mark.parametrize('message, error', [
+    ('{"query": ', 'not valid JSON'),
+    (b'\xff\xfe', 'not valid JSON'),
+    (None, 'not valid JSON'),
+    ('["SELECT 1"]', 'JSON object'),
+    ('"SELECT 1"', 'JSON object'),
+    ('{"query": 42, "seq": 3}', 'query must be a string'),
+    ('{"query": {"sql": "SELECT 1"}}', 'query must be a string'),
+])
+def test_malformed_messages_get_an_error_frame(beach_image, message, error):
+    [frame] = preview(beach_image, message)
+    assert not frame['success']
+    assert error in frame['error']
+
+
+def test_channel_keeps_serving_after_a_bad_message(beach_image):
+    frames = preview(beach_image, '[]', '{"query": "SELECT 2 AS two", "seq": 1}')
+    assert [frame['success'] for frame in frames] == [False, True]
+    assert frames[1]['result'] == [{'two': 2}]
+
+
+def test_vm_steps_of_each_preview_are_reported(beach_image):
+    charged = []
+
+    async def on_steps(steps):
+        charged.append(steps)
+
+    [frame] = preview(beach_image, '{"query": "WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n '
+                                   'WHERE i < 100000) SELECT count(*) AS c FROM n"}', on_steps=on_steps)
+    assert frame['result'] == [{'c': 100000}]
+    assert len(charged) == 1 and charged[0] > 100000
@@ -0,0 +1,111 @@
+from datetime import datetime, timedelta
+
+import bson
+import pytest
+from pydantic import ValidationError
+
+from progress import (
+    FLAT_LEVEL_KEYS,
+    LevelDelta,
+    decode_levels,
+    decode_versions,
+    document_versions,
+    encode_levels,
+    encode_versions,
+    merge_deltas,
+    pack_progress,
+    unpack_progress,
+)
+from server import ProgressSync
+
+
+def sync_body(device_id='laptop', **delta):
+    return {'device_id': device_id, 'deltas': [{'zone': 'beach', 'level': 1, 'version': 1, **delta}]}
+
+
+@pytest.mark.parametrize('device_id', ['$where', 'a.b', '', 'x' * 65, 'tab\tbed'])
+def test_sync_rejects_device_ids_that_are_not_plain_names(device_id):
+    with pytest.raises(ValidationError):
+        ProgressSync(**sync_body(device_id))
+    with pytest.raises(ValueError, match='device id'):
+        merge_deltas({}, device_id, [LevelDelta('beach', 1, 1)])
+
+
+@pytest.mark.parametrize('delta', [
+    {'best_time': -1.0},
+    {'best_time': float('inf')},
+    {'attempts': -1},
+    {'version': 0},
+])
+def test_sync_rejects_out_of_range_deltas(delta):
+    with pytest.raises(ValidationError):
+        ProgressSync(**sync_body(**delta))
+    with pytest.raises(ValueError):
+        LevelDelta(**{'zone': 'beach', 'level': 1, 'version': 1, **delta})
+
+
+def full_profile():
+    started = datetime(2026, 3, 1, 9, 30)
+    return {
+        key: {'status': 3, 'attempts': 1 + index % 5, 'bestTime': 12.3 + index,
+              'completedAt': started + timedelta(minutes=7 * index, seconds=index)}
+        for index, key in enumerate(FLAT_LEVEL_KEYS)
+    }
+
+
+def test_levels_round_trip_through_the_codec():
+    levels = full_profile()
+    levels['jungle-4'] = {'status': 1, 'attempts': 0}
+    del levels['ruins-15']
+    assert decode_levels(encode_levels(levels)) == levels
+    assert unpack_progress(pack_progress(levels)) == levels
+
+
+@pytest.mark.parametrize('record', [
+    {'status': 3, 'attempts': -1},
+    {'status': 3, 'bestTime': -0.5},
+    {'status': 4},
+    {'status': 1, 'attempts': 1.5},
+])
+def test_encoder_rejects_values_outside_the_format(record):
+    with pytest.raises(ValueError):
+        encode_levels({'beach-1': record})
+
+
+@pytest.mark.parametrize('data', [b'', b'\x02', b'\x01\x32', b'\x01\xff\xff', encode_levels(full_profile())[:-3]])
+def test_decoder_rejects_truncated_or_foreign_input(data):
+    with pytest.raises(ValueError):
+        decode_levels(data)
+
+
+def test_device_versions_are_packed_per_plain_device_id():
+    update, merged = merge_deltas({}, 'phone_2', [LevelDelta('beach', 1, 3, status='completed', best_time=0.0)])
+    assert merged['beach-1']['bestTime'] == 0.0
+    assert decode_versions(update['$set']['devices.phone_2']) == {'beach-1': 3}
+
+
+def test_replayed_deltas_are_skipped_with_packed_or_legacy_versions():
+    legacy = {'devices': {'phone': {'beach-1': 3}}}
+    packed = {'devices': {'phone': encode_versions({'beach-1': 3})}}
+    for document in (legacy, packed):
+        assert document_versions(document, 'phone') == {'beach-1': 3}
+        _, merged = merge_deltas(document, 'phone', [LevelDelta('beach', 1, 3, attempts=1)])
+        assert merged == {}
+
+
+def test_packed_document_is_over_ten_times_smaller():
+    levels = full_profile()
+    versions = {key: 2 + index % 3 for index, key in enumerate(FLAT_LEVEL_KEYS)}
+    common = {'_id': 'player-0001', 'updatedAt': datetime(2026, 3, 2), 'revision': 60}
+    legacy = {**common, 'levels': levels, 'devices': {'laptop': versions}}
+    packed = {**common, 'packed': encode_levels(levels), 'devices': {'laptop': encode_versions(versions)}}
+    assert len(bson.encode(legacy)) > 10 * len(bson.encode(packed))
+
+
+def test_client_timestamps_with_an_offset_merge_into_stored_records():
+    stored = {'packed': encode_levels({'beach-1': {'status': 3, 'attempts': 1, 'completedAt': datetime(2026, 3, 1, 10)}})}
+    body = sync_body('phone', status='completed', completed_at='2026-03-01T11:30:00+02:00')
+    deltas = [LevelDelta(**delta.model_dump()) for delta in ProgressSync(**body).deltas]
+
+    _, merged = merge_deltas(stored, 'phone', deltas)
+    assert merged['beach-1']['completedAt'] == datetime(2026, 3, 1, 9, 30)
@@ -0,0 +1,102 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException, Request, WebSocket
+
+from rate_limit import BASE_COST, STEPS_PER_TOKEN, LocalBucketStore, Policy, RateLimiter
+
+
+POLICIES = {'grade': (Policy(rate=0.001, burst=30), Policy(rate=0.001, burst=400))}
+
+
+def request(player_id='player', host='10.0.0.1'):
+    headers = [(b'x-player-id', player_id.encode())] if player_id else []
+    return Request({'type': 'http', 'headers': headers, 'client': (host, 1234)})
+
+
+async def run_burst(limiter, count, player_id='player', steps=0):
+    admitted = rejected = 0
+
+    async def one():
+        nonlocal admitted, rejected
+        try:
+            async with limiter.guard(request(player_id), 'grade') as usage:
+                admitted += 1
+                await asyncio.sleep(0.01)
+                usage.steps = steps
+        except HTTPException as error:
+            assert error.status_code == 429
+            rejected += 1
+
+    await asyncio.gather(*(one() for _ in range(count)))
+    return admitted, rejected
+
+
+def test_concurrent_burst_is_held_to_the_bucket():
+    limiter = RateLimiter(LocalBucketStore(), POLICIES)
+    admitted, rejected = asyncio.run(run_burst(limiter, 500))
+    assert admitted == 30
+    assert rejected == 470
+
+
+def test_rejection_refunds_the_other_bucket():
+    store = LocalBucketStore()
+    limiter = RateLimiter(store, POLICIES)
+    asyncio.run(run_burst(limiter, 500))
+
+    ip_policy = POLICIES['grade'][1]
+    # Only the 30 admitted requests were charged to the shared IP
+    assert asyncio.run(store.apply('grade:ip:10.0.0.1', 0, ip_policy)) == pytest.approx(370, abs=0.1)
+
+
+def test_measured_cost_is_settled_after_the_request():
+    store = LocalBucketStore()
+    limiter = RateLimiter(store, POLICIES)
+    asyncio.run(run_burst(limiter, 1, steps=9 * STEPS_PER_TOKEN))
+
+    player_policy = POLICIES['grade'][0]
+    left = asyncio.run(store.apply('grade:player:player', 0, player_policy))
+    assert left == pytest.approx(30 - BASE_COST - 9, abs=0.1)
+
+
+def test_strict_apply_takes_nothing_on_shortfall():
+    store = LocalBucketStore()
+    policy = Policy(rate=0.001, burst=2)
+    assert asyncio.run(store.apply('k', 3, policy, strict=True)) == pytest.approx(-1, abs=0.01)
+    assert asyncio.run(store.apply('k', 0, policy)) == pytest.approx(2, abs=0.01)
+
+
+def test_rotating_player_ids_stays_within_the_ip_bucket():
+    limiter = RateLimiter(LocalBucketStore(), POLICIES)
+
+    async def run():
+        admitted = 0
+        for index in range(1000):
+            try:
+                async with limiter.guard(request(f"player-{index}"), 'grade'):
+                    admitted += 1
+            except HTTPException:
+                pass
+        return admitted
+
+    assert asyncio.run(run()) == 400
+
+
+def test_websocket_messages_are_admitted_and_charged_per_message():
+    store = LocalBucketStore()
+    limiter = RateLimiter(store, POLICIES)
+    socket = WebSocket({'type': 'websocket', 'headers': [], 'client': ('10.0.0.2', 1234)}, None, None)
+
+    async def run():
+        admitted = 0
+        for _ in range(3):
+            await limiter.admit(socket, 'grade')
+            admitted += 1
+        await limiter.charge(socket, 'grade', 500)
+        with pytest.raises(HTTPException) as error:
+            await limiter.admit(socket, 'grade')
+        return admitted, error.value.status_code, await store.apply('grade:ip:10.0.0.2', 0, POLICIES['grade'][1])
+
+    admitted, status, left = asyncio.run(run())
+    assert (admitted, status) == (3, 429)
+    assert left == pytest.approx(400 - 3 - 500, abs=0.1)
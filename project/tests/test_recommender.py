@@ -0,0 +1,70 @@
+import asyncio
+
+import pytest
+
+from content import load_game_content
+from progress import STATUS_RANKS, encode_levels
+from recommender import ItemCatalog, RecommendationJob, progress_matrices, recommend
+
+COMPLETED, SKIPPED, ACTIVE = STATUS_RANKS['completed'], STATUS_RANKS['skipped'], STATUS_RANKS['active']
+
+# Player a finished beach 1-5 first try, skipped 6 and is on 7. Player b
+# needed six attempts at beach 3, a WHERE level, and is on 4.
+HISTORY = [
+    {'_id': 'a', 'levels': {
+        **{f'beach-{level}': {'status': COMPLETED, 'attempts': 1} for level in range(1, 6)},
+        'beach-6': {'status': SKIPPED, 'attempts': 3},
+        'beach-7': {'status': ACTIVE, 'attempts': 0},
+    }},
+    {'_id': 'b', 'levels': {
+        'beach-1': {'status': COMPLETED, 'attempts': 1},
+        'beach-2': {'status': COMPLETED, 'attempts': 1},
+        'beach-3': {'status': COMPLETED, 'attempts': 6},
+        'beach-4': {'status': ACTIVE, 'attempts': 2},
+    }},
+]
+
+
+@pytest.fixture(scope='module')
+def catalog():
+    return ItemCatalog(load_game_content())
+
+
+def labels(items):
+    return [f"{item['zone']}-{item['level']}" if item['kind'] == 'task' else f"lesson-{item['id']}" for item in items]
+
+
+def test_recommendations_for_a_fixed_history(catalog):
+    status, attempts = progress_matrices(HISTORY)
+    a, b = (labels(items) for items in recommend(status, attempts, catalog, top_k=20))
+
+    # Only the active level, skipped levels and hard-won completions are task candidates
+    assert [label for label in a if label.startswith('beach')] == ['beach-7', 'beach-6']
+    assert a[0] == 'beach-7'
+    assert b[:2] == ['beach-4', 'beach-3']
+    # b struggled with WHERE, so the WHERE lesson outranks the SELECT basics
+    assert b.index('lesson-2') < b.index('lesson-1')
+
+
+def test_packed_documents_get_the_same_recommendations(catalog):
+    packed = [{'_id': document['_id'], 'packed': encode_levels(document['levels'])} for document in HISTORY]
+    assert recommend(*progress_matrices(packed), catalog, 5) == recommend(*progress_matrices(HISTORY), catalog, 5)
+
+
+def test_one_job_runs_per_interval():
+    mongomock_motor = pytest.importorskip('mongomock_motor')
+    db = mongomock_motor.AsyncMongoMockClient()['test']
+    content = load_game_content()
+
+    async def scenario():
+        await db.progress.insert_many([dict(document) for document in HISTORY])
+        jobs = [RecommendationJob(db, lambda: content, interval=3600) for _ in range(3)]
+        for job in jobs:
+            await job.flush()
+        return [job.stats() for job in jobs], await db.recommendations.find().to_list(None)
+
+    stats, documents = asyncio.run(scenario())
+    assert [s['runs'] for s in stats] == [1, 0, 0]
+    assert [s['skipped'] for s in stats] == [0, 1, 1]
+    assert sorted(document['_id'] for document in documents) == ['a', 'b']
+    assert labels(next(d for d in documents if d['_id'] == 'b')['items'])[0] == 'beach-4'
@@ -0,0 +1,36 @@
+import asyncio
+import shutil
+
+from release import CONTENT_SOURCES, ReleaseManager, content_version, read_sources
+from sql_engine import CONTENT_DIR
+
+
+def test_content_change_swaps_releases_without_dropping_requests(tmp_path):
+    for filename in CONTENT_SOURCES:
+        shutil.copy(CONTENT_DIR / filename, tmp_path / filename)
+    swapped = []
+    manager = ReleaseManager(variant_count=1, on_swap=swapped.append, content_dir=tmp_path)
+    first = manager.current
+    assert not asyncio.run(manager.reload())
+
+    game_data = tmp_path / 'gameData.js'
+    game_data.write_text(game_data.read_text(encoding='utf-8').replace(
+        'title: "Check Survivors"', 'title: "Count the Survivors"', 1), encoding='utf-8')
+
+    closed = []
+    close = first.close
+    first.close = lambda: (closed.append(first), close())
+    with manager.acquire() as pinned:
+        assert asyncio.run(manager.reload())
+        # The request that pinned the old release finishes on it
+        assert pinned is first and not closed
+        assert pinned.grader.grade('beach', 1, "SELECT * FROM survivors")['correct']
+
+    assert closed == [first]
+    assert swapped == [manager.current]
+    release = manager.current
+    assert release.version == content_version(read_sources(tmp_path)) != first.version
+    assert release.game_content['gameTasks']['beach'][0]['title'] == 'Count the Survivors'
+    with manager.acquire() as current:
+        assert current is release
+    asyncio.run(manager.stop())
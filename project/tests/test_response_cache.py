@@ -0,0 +1,90 @@
+import asyncio
+
+from response_cache import MemoryBackend, ResponseCache
+
+
+class Source:
+    """A slow computation that counts how often it runs."""
+
+    def __init__(self):
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        await asyncio.sleep(0.01)
+        return {'calls': self.calls}
+
+
+class BrokenBackend:
+    async def get(self, key):
+        raise ConnectionError("shared tier down")
+
+    async def set(self, key, entry):
+        raise ConnectionError("shared tier down")
+
+    async def delete(self, key):
+        raise ConnectionError("shared tier down")
+
+
+def test_concurrent_misses_share_one_computation():
+    cache, source = ResponseCache(), Source()
+
+    async def run():
+        return await asyncio.gather(*(cache.get_or_compute('key', source, ttl=60, stale_ttl=60) for _ in range(10)))
+
+    assert asyncio.run(run()) == [{'calls': 1}] * 10
+    assert source.calls == 1
+    assert cache.stats()['misses'] == 1
+    assert cache.stats()['coalesced'] == 9
+
+
+def test_workers_reuse_results_through_the_shared_tier():
+    shared = MemoryBackend()
+    first, second = ResponseCache(shared=shared), ResponseCache(shared=shared)
+    source = Source()
+
+    async def run():
+        await first.get_or_compute('key', source, ttl=60, stale_ttl=60)
+        return await second.get_or_compute('key', source, ttl=60, stale_ttl=60)
+
+    assert asyncio.run(run()) == {'calls': 1}
+    assert source.calls == 1
+    assert second.stats()['shared_hits'] == 1
+    assert second.stats()['local_entries'] == 1
+
+
+def test_broken_shared_tier_falls_back_to_the_local_tier():
+    cache, source = ResponseCache(shared=BrokenBackend()), Source()
+
+    async def run():
+        return [await cache.get_or_compute('key', source, ttl=60, stale_ttl=60) for _ in range(3)]
+
+    assert asyncio.run(run()) == [{'calls': 1}] * 3
+    assert source.calls == 1
+    stats = cache.stats()
+    assert stats['misses'] == 1 and stats['hits'] == 2
+    # The first read and write of the shared tier failed; later reads are local hits
+    assert stats['errors'] == 2
+
+
+def test_invalidate_drops_the_entry_and_any_computation_in_flight():
+    cache, source = ResponseCache(shared=MemoryBackend()), Source()
+
+    @cache.cached(ttl=60)
+    async def route():
+        return await source()
+
+    async def run():
+        assert await route() == {'calls': 1}
+        await route.invalidate()
+        assert await route() == {'calls': 2}
+
+        # A computation that started before the write is not stored
+        await route.invalidate()
+        outdated = asyncio.ensure_future(route())
+        await asyncio.sleep(0)
+        await route.invalidate()
+        assert await outdated == {'calls': 3}
+        return await route()
+
+    assert asyncio.run(run()) == {'calls': 4}
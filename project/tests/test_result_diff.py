@@ -0,0 +1,42 @@
+from result_diff import diff_results, summarize_diff
+
+EXPECTED = [{'name': 'Ana', 'age': 30}, {'name': 'Ben', 'age': 41}, {'name': 'Ben', 'age': 41}]
+
+
+def test_missing_and_extra_rows_are_counted_as_multisets():
+    actual = [{'name': 'Ben', 'age': 41}, {'name': 'Cy', 'age': 19}]
+    diff = diff_results(actual, EXPECTED)
+
+    assert diff['row_count'] == {'expected': 3, 'actual': 2}
+    assert diff['rows']['missing_count'] == 2
+    assert diff['rows']['missing_sample'] == [{'name': 'Ana', 'age': 30}, {'name': 'Ben', 'age': 41}]
+    assert diff['rows']['extra_sample'] == [{'name': 'Cy', 'age': 19}]
+    assert summarize_diff(diff) == '2 expected row(s) missing, 1 unexpected row(s)'
+
+
+def test_same_rows_in_another_order():
+    diff = diff_results(list(reversed(EXPECTED)), EXPECTED)
+    assert diff['order_only']
+    assert summarize_diff(diff) == 'Right rows, wrong order'
+
+
+def test_missing_column_is_reported_first():
+    diff = diff_results([{'name': row['name']} for row in EXPECTED], EXPECTED)
+    assert diff['columns'] == {'missing': ['age'], 'extra': []}
+    assert diff['rows']['missing_count'] == diff['rows']['extra_count'] == 0
+    assert summarize_diff(diff) == 'Missing column(s): age'
+
+
+def test_type_mismatch_in_a_shared_column():
+    diff = diff_results([{**row, 'age': str(row['age'])} for row in EXPECTED], EXPECTED)
+    assert diff['type_mismatches'] == [{'column': 'age', 'expected': ['integer'], 'actual': ['text']}]
+    # Values compare as the JS game shows them, so only the types differ
+    assert diff['rows']['missing_count'] == 0
+    assert summarize_diff(diff) == 'Value types differ in column age'
+
+
+def test_sample_size_caps_the_sample():
+    actual = [{'name': f"P{index}", 'age': index} for index in range(10)]
+    diff = diff_results(actual, EXPECTED, sample_size=2)
+    assert diff['rows']['extra_count'] == 10
+    assert len(diff['rows']['extra_sample']) == 2
@@ -0,0 +1,71 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+from retention import SUMMARIES_COLLECTION, RetentionManager, default_policies
+from telemetry import EVENTS_COLLECTION, LEGACY_EVENTS_COLLECTION, encode_buckets
+
+mongomock_motor = pytest.importorskip('mongomock_motor')
+
+
+TODAY = datetime(2026, 10, 19)
+
+
+def event(ts, event_type='query', player_id='p1'):
+    return {'ts': ts, 'meta': {'type': event_type, 'zone': 'beach', 'level': 1}, 'player_id': player_id, 'data': {}}
+
+
+class Commands:
+    """Records collMod calls, which the in-memory client does not implement."""
+
+    def __init__(self):
+        self.calls = []
+
+    async def __call__(self, *args, **kwargs):
+        self.calls.append((args, kwargs))
+
+
+def manager_with_events(legacy_days_ago, bucket_days_ago, event_days=30):
+    db = mongomock_motor.AsyncMongoMockClient()['retention_test']
+    policies = default_policies(status_check_days=7, event_days=event_days)
+    manager = RetentionManager(db, policies)
+    commands = Commands()
+    db.command = commands
+
+    async def seed():
+        legacy = [event(TODAY - timedelta(days=days, hours=-10), player_id=f"old{days}") for days in legacy_days_ago]
+        await db[LEGACY_EVENTS_COLLECTION].insert_many(legacy)
+        recent = [event(TODAY - timedelta(days=days, hours=-12)) for days in bucket_days_ago]
+        await db[EVENTS_COLLECTION].insert_many(encode_buckets(recent, 100))
+
+    asyncio.run(seed())
+    return manager, commands, policies[1]
+
+
+def test_legacy_events_are_summarized_with_buckets():
+    manager, _, events = manager_with_events(legacy_days_ago=[5, 3], bucket_days_ago=[3, 3])
+
+    async def run():
+        await manager.roll_up(events, today=TODAY)
+        return await manager.db[SUMMARIES_COLLECTION].find_one({'_id': 'events:2026-10-16'})
+
+    summary = asyncio.run(run())
+    assert summary['count'] == 3
+    assert summary['players'] == 2
+
+
+def test_legacy_expiry_waits_until_expiring_days_are_summarized():
+    # Legacy events reach back 70 days; one run summarizes at most 31 of them
+    manager, commands, events = manager_with_events(legacy_days_ago=[70, 40, 10], bucket_days_ago=[2], event_days=30)
+
+    async def run():
+        await manager.roll_up(events, today=TODAY)
+        before = await manager.expire_legacy(events, now=TODAY)
+        await manager.roll_up(events, today=TODAY)
+        after = await manager.expire_legacy(events, now=TODAY)
+        return before, after
+
+    before, after = asyncio.run(run())
+    assert (before, after) == (False, True)
+    assert commands.calls == [(('collMod', LEGACY_EVENTS_COLLECTION), {'expireAfterSeconds': 30 * 24 * 60 * 60})]
@@ -0,0 +1,92 @@
+import threading
+
+import pytest
+
+from sandbox import SandboxManager
+from sql_engine import QUERY_TOO_EXPENSIVE, ZonePool, build_zone_images
+
+
+MARKER = "INSERT INTO survivors (name) VALUES ('marker')"
+COUNT_MARKERS = "SELECT count(*) AS n FROM survivors WHERE name = 'marker'"
+
+
+@pytest.fixture(scope='module')
+def images():
+    return build_zone_images()
+
+
+@pytest.fixture
+def pools(images):
+    pools = {'beach': ZonePool('beach', images['beach'], size=4)}
+    yield pools
+    for pool in pools.values():
+        pool.close()
+
+
+@pytest.fixture
+def sandboxes(pools, images, tmp_path):
+    # Room for one beach sandbox, so a second one spills the first
+    return SandboxManager(pools, memory_limit=len(images['beach']) + 1024, spill_dir=tmp_path)
+
+
+def markers(sandboxes, session_id):
+    result = sandboxes.execute('beach', session_id, COUNT_MARKERS)
+    assert result['success'], result
+    return result['result'][0]['n']
+
+
+def spill(sandboxes, session_id):
+    assert sandboxes.execute('beach', session_id, MARKER)['success']
+    assert sandboxes.execute('beach', 'other', "DELETE FROM logbook_entries")['success']
+    assert sandboxes.stats()['spilled_sandboxes'] == 1
+
+
+def test_spilled_sandbox_keeps_its_writes(sandboxes):
+    spill(sandboxes, 'player')
+    assert markers(sandboxes, 'player') == 1
+    assert sandboxes.stats()['restored'] == 1
+
+
+def test_concurrent_queries_restore_a_spilled_sandbox_once(sandboxes):
+    spill(sandboxes, 'player')
+    barrier = threading.Barrier(8)
+    counts = []
+
+    def query():
+        barrier.wait()
+        counts.append(markers(sandboxes, 'player'))
+
+    threads = [threading.Thread(target=query) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert counts == [1] * 8
+    assert sandboxes.stats()['created'] == 2
+
+
+def test_idle_spilled_sandboxes_expire(sandboxes, tmp_path):
+    spill(sandboxes, 'player')
+    assert list(tmp_path.glob('*.db.z'))
+
+    sandboxes.spill_ttl = 0
+    assert sandboxes.expire_spilled() == 1
+    assert not list(tmp_path.glob('*.db.z'))
+    assert markers(sandboxes, 'player') == 0
+
+
+def test_reset_discards_a_spilled_sandbox(sandboxes, tmp_path):
+    spill(sandboxes, 'player')
+    sandboxes.reset('beach', 'player')
+    assert not list(tmp_path.glob('beach--player.db.z'))
+    assert markers(sandboxes, 'player') == 0
+
+
+def test_sandbox_queries_have_a_step_budget(sandboxes):
+    assert sandboxes.execute('beach', 'player', MARKER)['success']
+    result = sandboxes.execute(
+        'beach', 'player',
+        "WITH RECURSIVE r(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM r) SELECT count(*) FROM r",
+    )
+    assert result['error'] == QUERY_TOO_EXPENSIVE
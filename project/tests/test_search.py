@@ -0,0 +1,45 @@
+from search import SearchIndex, tokenize
+
+
+def document(title, text):
+    return {'kind': 'syntax', 'title': title, 'text': text, 'ref': {'name': title}}
+
+
+def titles(results):
+    return [result['title'] for result in results]
+
+
+def test_sql_aware_tokens():
+    assert tokenize("SELECT team, COUNT(*) FROM survivors GROUP  BY team") == [
+        'group_by', 'select', 'team', 'count', 'from', 'survivors', 'group', 'by', 'team',
+    ]
+    assert tokenize("survivor_id") == ['survivor_id', 'survivor', 'id']
+
+
+def test_bm25_prefers_titles_rare_terms_and_short_documents():
+    index = SearchIndex([
+        document('Sorting', 'ORDER BY sorts rows by one or more columns'),
+        document('Limiting rows', 'LIMIT keeps the first rows of a sorted result'),
+        document('Filtering', 'WHERE keeps the rows that match a condition on columns ' + 'padding ' * 30),
+        document('Conditions', 'WHERE keeps the rows that match a condition on columns'),
+        document('Grouping', 'GROUP BY collects rows into groups before aggregates'),
+    ])
+
+    # The title match outranks the body-only match
+    assert titles(index.search('limiting '))[0] == 'Limiting rows'
+    # Same text, but the padded document is longer and scores lower
+    where = titles(index.search('where condition '))
+    assert where.index('Conditions') < where.index('Filtering')
+    # "rows" appears everywhere, "sorts" once: the rare term decides the order
+    assert titles(index.search('rows sorts '))[0] == 'Sorting'
+    # The compound keyword only matches where GROUP BY is written together
+    assert titles(index.search('group by '))[0] == 'Grouping'
+
+
+def test_last_word_matches_as_a_prefix_while_typing():
+    index = SearchIndex([
+        document('Aggregates', 'COUNT SUM AVG summarize rows'),
+        document('Aliases', 'AS renames a column'),
+    ])
+    assert titles(index.search('aggr')) == ['Aggregates']
+    assert index.search('aggr ') == []
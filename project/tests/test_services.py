@@ -0,0 +1,80 @@
+import asyncio
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from leaderboard import Leaderboard
+from response_cache import ResponseCache
+from services import Services
+from settings import Settings
+
+
+def test_unreachable_mongo_does_not_block_startup(tmp_path):
+    settings = Settings({
+        # Nothing listens on port 1, and server selection gives up quickly
+        'MONGO_URL': 'mongodb://127.0.0.1:1/?serverSelectionTimeoutMS=200',
+        'DB_NAME': 'startup_test',
+        'SANDBOX_SPILL_DIR': str(tmp_path / 'sandboxes'),
+        'SUBMISSION_ARCHIVE_DIR': str(tmp_path / 'archive'),
+    })
+    services = Services(ResponseCache())
+
+    async def run():
+        started_at = time.perf_counter()
+        await services.start(settings)
+        elapsed = time.perf_counter() - started_at
+        await asyncio.sleep(0.5)
+        states = dict(services.readiness)
+        ready = services.ready
+        await services.stop()
+        return elapsed, states, ready
+
+    elapsed, states, ready = asyncio.run(run())
+    assert elapsed < 5
+    assert set(states) == {'retention_indexes', 'leaderboard'}
+    assert set(states.values()) <= {'pending', 'retrying'}
+    assert not ready
+
+
+def test_importing_the_server_has_no_side_effects():
+    snippet = (
+        "import logging, server; "
+        "assert server.get_settings.cache_info().currsize == 0, 'settings were read'; "
+        "assert not logging.getLogger().handlers, 'logging was configured'; "
+        "assert not hasattr(server, 'app')"
+    )
+    backend = Path(__file__).resolve().parent.parent / 'backend'
+    result = subprocess.run([sys.executable, '-c', snippet], cwd=backend, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+
+
+class Documents:
+    """An async cursor that lets an update land while the leaderboard is loading."""
+
+    def __init__(self, documents, during_load):
+        self.documents = documents
+        self.during_load = during_load
+
+    def find(self, *args, **kwargs):
+        return self
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for index, document in enumerate(self.documents):
+            if index == 1:
+                self.during_load()
+            await asyncio.sleep(0)
+            yield document
+
+
+def test_updates_during_load_are_kept():
+    stored = [{'_id': 'a', 'score': 500, 'levelsCompleted': 5}, {'_id': 'b', 'score': 100, 'levelsCompleted': 1}]
+    board = Leaderboard(collection=None)
+    board.collection = Documents(stored, lambda: board.update('b', 300, 3) and board.update('c', 50))
+
+    asyncio.run(board.load())
+    assert board.loaded
+    assert [(entry['player_id'], entry['score']) for entry in board.page(0, 10)] == [('a', 500), ('b', 300), ('c', 50)]
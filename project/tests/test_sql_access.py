@@ -0,0 +1,89 @@
+import pytest
+
+from sandbox import SandboxManager
+from sql_engine import ZonePool, build_zone_images, create_zone_database
+
+
+@pytest.fixture(scope='module')
+def images():
+    return build_zone_images()
+
+
+@pytest.fixture
+def pools(images):
+    pools = {'beach': ZonePool('beach', images['beach'], size=1)}
+    yield pools
+    for pool in pools.values():
+        pool.close()
+
+
+@pytest.fixture
+def sandboxes(pools, tmp_path):
+    return SandboxManager(pools, spill_dir=tmp_path)
+
+
+def run(conn, query):
+    return conn.execute(query).fetchall()
+
+
+@pytest.mark.parametrize('query', [
+    "PRAGMA query_only = OFF",
+    "DROP TABLE survivors",
+    "DELETE FROM survivors",
+    "INSERT INTO survivors (name) VALUES ('x')",
+    "CREATE TABLE t (a)",
+    "ATTACH DATABASE ':memory:' AS other",
+    "VACUUM",
+    "BEGIN",
+])
+def test_read_only_connection_rejects_writes_and_escapes(images, query):
+    conn = create_zone_database(images['beach'], read_only=True)
+    with pytest.raises(Exception):
+        run(conn, query)
+    assert run(conn, "SELECT COUNT(*) FROM survivors")[0][0] > 0
+
+
+def test_read_only_connection_allows_reads_and_introspection(images):
+    conn = create_zone_database(images['beach'], read_only=True)
+    assert run(conn, "SELECT name FROM survivors LIMIT 1")
+    assert run(conn, "PRAGMA table_info(survivors)")
+    assert run(conn, "WITH RECURSIVE r(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM r LIMIT 3) SELECT * FROM r")
+
+
+def test_vacuum_into_cannot_write_files(images, tmp_path):
+    target = tmp_path / 'copy.db'
+    for conn in (create_zone_database(images['beach'], read_only=True),
+                 create_zone_database(images['beach'], sandbox=True)):
+        with pytest.raises(Exception):
+            run(conn, f"VACUUM INTO '{target}'")
+    assert not target.exists()
+
+
+def test_sandbox_connection_allows_dml_and_ddl_on_main_only(images):
+    conn = create_zone_database(images['beach'], sandbox=True)
+    run(conn, "CREATE TABLE notes (id INTEGER PRIMARY KEY, text TEXT)")
+    run(conn, "INSERT INTO notes (text) VALUES ('hello')")
+    run(conn, "DELETE FROM survivors WHERE survivor_id = 1")
+    run(conn, "CREATE INDEX notes_text ON notes (text)")
+    for query in ("CREATE TEMP TABLE scratch (a)", "PRAGMA query_only = ON",
+                  "ATTACH DATABASE ':memory:' AS other", "PRAGMA writable_schema = ON"):
+        with pytest.raises(Exception):
+            run(conn, query)
+
+
+def test_sandbox_write_does_not_touch_shared_pool(sandboxes, pools):
+    assert sandboxes.execute('beach', 's1', "PRAGMA query_only = OFF")['success'] is False
+    result = sandboxes.execute('beach', 's1', "DROP TABLE survivors")
+    assert result['success'], result['error']
+    assert sandboxes.execute('beach', 's1', "SELECT * FROM survivors")['success'] is False
+    # Other players still read the untouched zone from the pool
+    other = sandboxes.execute('beach', 's2', "SELECT COUNT(*) AS n FROM survivors")
+    assert other['success'] and other['result'][0]['n'] > 0
+    with pools['beach'].connection() as conn:
+        assert run(conn, "SELECT COUNT(*) FROM survivors")[0][0] > 0
+
+
+def test_denied_non_write_does_not_create_sandbox(sandboxes):
+    result = sandboxes.execute('beach', 's3', "ATTACH DATABASE ':memory:' AS other")
+    assert result['success'] is False
+    assert sandboxes.stats()['created'] == 0
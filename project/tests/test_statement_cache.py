@@ -0,0 +1,46 @@
+import pytest
+
+from content import load_game_content
+from grading import Grader
+from sql_engine import StatementCache, ZonePool, build_zone_images, normalize_sql
+
+
+@pytest.mark.parametrize('query, normalized', [
+    ("SELECT *\n  FROM survivors;", "SELECT * FROM survivors"),
+    ("  SELECT name FROM survivors ;  ", "SELECT name FROM survivors"),
+    ("SELECT 'a  b' -- keep me\nFROM t", "SELECT 'a  b' -- keep me\nFROM t"),
+    ("SELECT \"two  words\"\tFROM t", "SELECT \"two  words\" FROM t"),
+])
+def test_spacing_and_trailing_semicolons_do_not_change_the_key(query, normalized):
+    assert normalize_sql(query) == normalized
+
+
+def test_statement_cache_counts_like_an_lru():
+    cache = StatementCache(capacity=2)
+    for sql in ('a', 'b', 'a', 'c', 'b', 'a'):
+        cache.record(sql)
+    # c evicted b, then b evicted a
+    assert (cache.hits, cache.misses, len(cache)) == (1, 5, 2)
+
+
+def counters(grader):
+    return [stats for zone in grader.statement_stats().values() for stats in zone.values()]
+
+
+def test_reference_queries_are_compiled_before_the_first_grade():
+    images = build_zone_images()
+    tasks = load_game_content()['gameTasks']
+    pools = {zone: ZonePool(zone, images[zone], size=2) for zone in tasks}
+    grader = Grader(tasks, pools, variant_count=2, max_workers=2)
+    try:
+        # Expected results were computed from the warmed statements
+        assert all(stats['misses'] == 0 for stats in counters(grader))
+        for zone, zone_tasks in tasks.items():
+            for task in zone_tasks:
+                # Reformatted, but normalized to the warmed text
+                assert grader.grade(zone, task['level'], f"  {task['expectedQuery']}  ;")['correct']
+        assert all(stats['misses'] == 0 and stats['hits'] > 0 for stats in counters(grader))
+    finally:
+        grader.close()
+        for pool in pools.values():
+            pool.close()
@@ -0,0 +1,108 @@
+import time
+
+import pytest
+
+import index_challenge
+from content import load_game_content
+from grading import Grader
+from index_challenge import IndexChallengeLab
+from sql_engine import (
+    QUERY_TOO_EXPENSIVE,
+    ZonePool,
+    build_zone_images,
+    count_vm_steps,
+    create_zone_database,
+    execute_user_query,
+)
+
+
+RUNAWAY = "WITH RECURSIVE r(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM r) SELECT count(*) FROM r"
+
+
+@pytest.fixture(scope='module')
+def images():
+    return build_zone_images()
+
+
+@pytest.fixture(scope='module')
+def grader(images):
+    pools = {zone: ZonePool(zone, images[zone], size=1) for zone in ('beach',)}
+    tasks = {'beach': load_game_content()['gameTasks']['beach']}
+    grader = Grader(tasks, pools, variant_count=1, max_workers=1)
+    yield grader
+    grader.close()
+    for pool in pools.values():
+        pool.close()
+
+
+def test_budget_interrupts_runaway_query(images):
+    conn = create_zone_database(images['beach'], read_only=True)
+    with count_vm_steps(conn, budget=100_000) as counter:
+        result = execute_user_query(RUNAWAY, conn)
+    assert result == {'success': False, 'result': None, 'error': QUERY_TOO_EXPENSIVE}
+    assert counter.exhausted
+    # The connection stays usable after an interrupt
+    assert execute_user_query("SELECT COUNT(*) AS n FROM survivors", conn)['success']
+
+
+def test_counting_without_budget_does_not_interrupt(images):
+    conn = create_zone_database(images['beach'], read_only=True)
+    query = "WITH RECURSIVE r(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM r LIMIT 50000) SELECT count(*) FROM r"
+    with count_vm_steps(conn) as counter:
+        result = execute_user_query(query, conn)
+    assert result['success'] and counter.steps > 0 and not counter.exhausted
+
+
+def test_grader_stops_runaway_submission(grader):
+    started_at = time.perf_counter()
+    result = grader.grade('beach', 1, RUNAWAY)
+    assert time.perf_counter() - started_at < 10
+    assert result['correct'] is False
+    assert result['error'] == QUERY_TOO_EXPENSIVE
+    assert result['steps'] > 0
+    # The pooled connection is released and still grades
+    expected = grader.tasks['beach'][0]['expectedQuery']
+    assert grader.grade('beach', 1, expected)['correct'] is True
+
+
+@pytest.fixture(scope='module')
+def index_lab(images):
+    return IndexChallengeLab(images)
+
+
+def test_index_build_past_the_budget_is_rejected(index_lab, monkeypatch):
+    monkeypatch.setattr(index_challenge, 'QUERY_STEP_BUDGET', 1000)
+    with pytest.raises(ValueError, match=QUERY_TOO_EXPENSIVE):
+        index_lab.attempt('logbook-by-author', ["CREATE INDEX by_author ON logbook_entries(author_id, entry_date)"])
+
+
+def test_index_attempt_within_budget_is_scored(index_lab):
+    result = index_lab.attempt('logbook-by-author', ["CREATE INDEX by_author ON logbook_entries(author_id, entry_date)"])
+    assert result['speedup'] > 1
+
+
+@pytest.mark.parametrize('query, error', [
+    ("SELECT length(zeroblob(1000000000))", 'too big'),
+    ("SELECT length(replace(hex(randomblob(40000)), 'A', 'AAAA'))", 'too big'),
+    ("SELECT '" + 'x' * 70000 + "' AS long", 'too large'),
+])
+def test_player_connections_cap_value_and_sql_length(images, query, error):
+    for conn in (create_zone_database(images['beach'], read_only=True),
+                 create_zone_database(images['beach'], sandbox=True)):
+        result = execute_user_query(query, conn)
+        assert not result['success'] and error in result['error']
+
+
+def test_sandbox_database_size_is_capped(images):
+    conn = create_zone_database(images['beach'], sandbox=True)
+    execute_user_query("CREATE TABLE filler (x)", conn)
+    result = execute_user_query(
+        "INSERT INTO filler WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n) "
+        "SELECT randomblob(60000) FROM n", conn,
+    )
+    assert result == {'success': False, 'result': None, 'error': 'database or disk is full'}
+
+
+def test_expression_index_cannot_build_huge_keys(index_lab):
+    with pytest.raises(ValueError, match='too big'):
+        index_lab.attempt('logbook-by-author', ["CREATE INDEX blobs ON logbook_entries(zeroblob(1000000))"])
@@ -0,0 +1,72 @@
+import sqlite3
+
+import pytest
+
+from sql_engine import ZonePool
+from table_browser import MAX_PAGE_SIZE, TableBrowser
+
+
+@pytest.fixture(scope='module')
+def browser():
+    conn = sqlite3.connect(':memory:')
+    conn.executescript("""
+        CREATE TABLE survivors (survivor_id INTEGER PRIMARY KEY, name TEXT);
+        CREATE TABLE codes (code TEXT PRIMARY KEY, meaning TEXT);
+        CREATE TABLE log (entry TEXT);
+        CREATE TABLE shifts (survivor_id INTEGER, day INTEGER, PRIMARY KEY (survivor_id, day));
+    """)
+    # Keys out of insertion order, with gaps
+    conn.executemany("INSERT INTO survivors VALUES (?, ?)", [(id * 3 % 101, f"S{id}") for id in range(1, 101)])
+    conn.executemany("INSERT INTO codes VALUES (?, ?)", [(f"c{id:03}", str(id)) for id in range(250, 0, -1)])
+    conn.executemany("INSERT INTO log VALUES (?)", [(f"e{id}",) for id in range(50)])
+    conn.executemany("INSERT INTO shifts VALUES (?, ?)", [(id % 7, id) for id in range(30)])
+    conn.commit()
+    pool = ZonePool('test', conn.serialize(), size=1)
+    yield TableBrowser(pool)
+    pool.close()
+
+
+def browse_all(browser, table, limit):
+    rows, pages, after = [], 0, None
+    while True:
+        page = browser.page(table, after, limit)
+        rows.extend(page['rows'])
+        pages += 1
+        after = page['next_after']
+        if after is None:
+            return rows, pages
+        # Cursors round-trip through the query string
+        after = str(after)
+
+
+@pytest.mark.parametrize('table, key, count', [
+    ('survivors', 'survivor_id', 100),
+    ('codes', 'code', 250),
+    ('log', 'rowid', 50),
+    ('shifts', 'rowid', 30),
+])
+def test_pages_join_up_without_gaps_or_repeats(browser, table, key, count):
+    with browser.pool.connection() as conn:
+        expected = [row[0] for row in conn.execute(f"SELECT {table}.* FROM {table} ORDER BY {'rowid' if key == 'rowid' else key}")]
+
+    rows, pages = browse_all(browser, table, limit=7)
+    assert [next(iter(row.values())) for row in rows] == expected
+    assert pages == -(-count // 7)
+    assert browser.tables[table].describe()['key'] == key
+
+
+def test_page_size_is_capped(browser):
+    assert len(browser.page('codes', limit=10_000)['rows']) == MAX_PAGE_SIZE
+    assert len(browser.page('codes', limit=0)['rows']) == 1
+
+
+def test_row_counts_are_estimated(browser):
+    assert browser.tables['codes'].estimated_rows == 250
+    assert browser.tables['survivors'].describe()['estimated_rows'] > 0
+
+
+def test_unknown_table_and_bad_cursor(browser):
+    with pytest.raises(KeyError):
+        browser.page('sqlite_master')
+    with pytest.raises(ValueError):
+        browser.page('survivors', after='3; DROP TABLE survivors')
@@ -0,0 +1,55 @@
+import json
+import time
+
+from analytics import RollupWriter, level_rollup_id
+from classroom import ClassKeys, ClassroomHub
+from telemetry import EventWriter, parse_events
+
+
+def batch(*event_types, **fields):
+    now_ms = time.time() * 1000
+    lines = [
+        json.dumps({'type': event_type, 'zone': 'beach', 'level': 4, 'ts': now_ms, 'player_id': 'p1', **fields})
+        for event_type in event_types
+    ]
+    documents, rejected = parse_events('\n'.join(lines).encode(), now_ms)
+    assert not rejected
+    return documents
+
+
+def test_query_events_do_not_count_submissions_again():
+    rollups = RollupWriter(collection=None)
+    events = EventWriter(collection=None, rollups=rollups)
+    assert events.accept(batch('query', 'query', 'hint', 'skip', correct=True)) == 4
+
+    # /api/grade counts the submission, with the grader's verdict
+    rollups.record_submission('beach', 4, correct=False)
+    counts = rollups._pending[level_rollup_id('beach', 4)]
+    assert counts == {'submissions': 1, 'correct': 0, 'hints': 1, 'skips': 1}
+
+
+def test_classroom_attempts_come_from_grading_only():
+    hub = ClassroomHub(ClassKeys(b'secret'))
+    class_id, _ = hub.keys.mint()
+    hub.record_events(batch('query', 'completion', correct=True, class_id=class_id))
+    hub.record(class_id, 'p1', 'beach', 4, 'failed')
+
+    student = hub.snapshot(class_id)['students'][0]
+    assert (student['attempts'], student['failures'], student['levels_completed']) == (1, 1, 1)
+
+
+def test_events_outside_the_known_levels_and_clock_are_rejected():
+    now_ms = time.time() * 1000
+    good = {'type': 'hint', 'zone': 'beach', 'level': 4, 'ts': now_ms}
+    lines = [
+        json.dumps(good),
+        json.dumps({**good, 'level': 2 ** 63}),
+        json.dumps({**good, 'level': 0}),
+        json.dumps({**good, 'level': 16}),
+        json.dumps({**good, 'zone': 'x' * 32}),
+        json.dumps({**good, 'ts': float('nan')}),
+        json.dumps({**good, 'ts': 10 ** 400}),
+    ]
+    documents, rejected = parse_events('\n'.join(lines).encode(), now_ms)
+    assert len(documents) == 1
+    assert rejected == [1, 2, 3, 4, 5, 6]